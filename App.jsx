@@ -10,6 +10,17 @@ import { Label } from '@/components/ui/label.jsx'
 import { Upload, FileAudio, Download, CheckCircle, XCircle, AlertTriangle, Mic, FileText, BarChart3, Scissors, Clock, Type, AlignLeft } from 'lucide-react'
 import './App.css'
 
+// Approximate progress after each processing stage (mirrors STAGE_PROGRESS in jobs.py)
+const STAGE_PROGRESS = {
+  decoding: 0.02,
+  decoded: 0.1,
+  quality_assessed: 0.15,
+  transcribing: 0.2,
+  transcribed: 0.8,
+  segmented: 0.9,
+  exported: 1.0
+}
+
 function App() {
   const [files, setFiles] = useState([])
   const [processing, setProcessing] = useState(false)
@@ -17,6 +28,10 @@ function App() {
   const [dragActive, setDragActive] = useState(false)
   const [uploadProgress, setUploadProgress] = useState(0)
   const [segmentationType, setSegmentationType] = useState('sentence')
+  const [jobId, setJobId] = useState(null)
+  // Kept after the job finishes so its results can still be downloaded
+  const [lastJobId, setLastJobId] = useState(null)
+  const [jobStatus, setJobStatus] = useState(null)
 
   const handleDrag = useCallback((e) => {
     e.preventDefault()
@@ -50,11 +65,93 @@ function App() {
     setFiles(prev => prev.filter((_, i) => i !== index))
   }
 
+  // fetch() cannot report upload progress, so the upload itself goes through XMLHttpRequest
+  const uploadWithProgress = (formData) => new Promise((resolve, reject) => {
+    const xhr = new XMLHttpRequest()
+    xhr.open('POST', '/api/audio/upload')
+    xhr.responseType = 'json'
+    xhr.upload.onprogress = (event) => {
+      if (event.lengthComputable) {
+        setUploadProgress(Math.round((event.loaded * 100) / event.total))
+      }
+    }
+    xhr.onload = () => {
+      if (xhr.status >= 200 && xhr.status < 300) {
+        resolve(xhr.response)
+      } else {
+        reject(new Error((xhr.response && xhr.response.error) || 'Upload failed'))
+      }
+    }
+    xhr.onerror = () => reject(new Error('Upload failed'))
+    xhr.send(formData)
+  })
+
+  const applyJobEvent = (event) => {
+    if (event.type === 'file_finished') {
+      setResults(prev => [...prev, event.result])
+    }
+    if (event.file_index === undefined || event.type === 'segment') return
+    setJobStatus(prev => {
+      if (!prev) return prev
+      const files = prev.files.map((file, index) => {
+        if (index !== event.file_index) return file
+        if (event.type === 'file_finished') {
+          return { ...file, status: event.status, progress: 1 }
+        }
+        if (event.type === 'file_started') {
+          return { ...file, status: 'running' }
+        }
+        return {
+          ...file,
+          stage: event.type,
+          progress: STAGE_PROGRESS[event.type] ?? file.progress,
+          timings: { ...file.timings, [event.type]: event.elapsed }
+        }
+      })
+      const filesDone = files.filter(file => ['success', 'error'].includes(file.status)).length
+      const progress = files.reduce((sum, file) => sum + file.progress, 0) / Math.max(1, files.length)
+      return { ...prev, files, files_done: filesDone, progress }
+    })
+  }
+
+  // Read the NDJSON event stream until the job has finished
+  const followJob = async (jobId) => {
+    const statusResponse = await fetch(`/api/audio/jobs/${jobId}`)
+    if (!statusResponse.ok) {
+      throw new Error('Status request failed')
+    }
+    setJobStatus(await statusResponse.json())
+
+    const response = await fetch(`/api/audio/jobs/${jobId}/events`, {
+      headers: { 'Accept': 'application/x-ndjson' }
+    })
+    if (!response.ok) {
+      throw new Error('Event stream failed')
+    }
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+      const lines = buffer.split('\n')
+      buffer = lines.pop()
+      for (const line of lines) {
+        if (line.trim()) {
+          applyJobEvent(JSON.parse(line))
+        }
+      }
+    }
+  }
+
   const processFiles = async () => {
     if (files.length === 0) return
 
     setProcessing(true)
     setUploadProgress(0)
+    setResults([])
+    setJobStatus(null)
     
     const formData = new FormData()
     files.forEach(file => {
@@ -63,30 +160,30 @@ function App() {
     formData.append('segmentation_type', segmentationType)
 
     try {
-      const response = await fetch('/api/audio/upload', {
-        method: 'POST',
-        body: formData,
-        onUploadProgress: (progressEvent) => {
-          const progress = Math.round((progressEvent.loaded * 100) / progressEvent.total)
-          setUploadProgress(progress)
-        }
-      })
-
-      if (!response.ok) {
-        throw new Error('Upload failed')
-      }
-
-      const data = await response.json()
-      setResults(data.results)
+      // The upload only queues a job; results arrive incrementally on the event stream
+      const data = await uploadWithProgress(formData)
+      setJobId(data.job_id)
+      setLastJobId(data.job_id)
+      await followJob(data.job_id)
     } catch (error) {
       console.error('Error processing files:', error)
-      setResults([{
+      setResults(prev => [...prev, {
         status: 'error',
         error: 'Fehler beim Verarbeiten der Dateien: ' + error.message
       }])
     } finally {
       setProcessing(false)
       setUploadProgress(0)
+      setJobId(null)
+    }
+  }
+
+  const cancelJob = async () => {
+    if (!jobId) return
+    try {
+      await fetch(`/api/audio/jobs/${jobId}/cancel`, { method: 'POST' })
+    } catch (error) {
+      console.error('Error cancelling job:', error)
     }
   }
 
@@ -118,6 +215,18 @@ function App() {
     }
   }
 
+  const downloadArchive = () => {
+    // Navigate to the streaming endpoint so the browser writes the ZIP to disk as it arrives
+    // instead of buffering the whole archive in a Blob
+    const a = document.createElement('a')
+    a.style.display = 'none'
+    a.href = `/api/audio/jobs/${lastJobId}/archive`
+    a.download = `results_${lastJobId}.zip`
+    document.body.appendChild(a)
+    a.click()
+    document.body.removeChild(a)
+  }
+
   const getStatusIcon = (status) => {
     switch (status) {
       case 'success':
@@ -292,10 +401,24 @@ function App() {
                 
                 {processing && (
                   <div className="space-y-2">
-                    <Progress value={uploadProgress} className="w-full" />
+                    <Progress
+                      value={jobStatus ? Math.round(jobStatus.progress * 100) : uploadProgress}
+                      className="w-full"
+                    />
                     <p className="text-sm text-gray-600 text-center">
-                      Upload: {uploadProgress}%
+                      {jobStatus
+                        ? `Fortschritt: ${Math.round(jobStatus.progress * 100)}% (${jobStatus.files_done}/${jobStatus.files_total} Dateien)`
+                        : `Upload: ${uploadProgress}%`}
                     </p>
+                    {jobStatus && jobStatus.files.map((file, index) => (
+                      <div key={index} className="flex items-center justify-between text-xs text-gray-600">
+                        <span className="truncate">{file.filename}</span>
+                        <span>{file.status === 'running' ? file.stage : file.status}</span>
+                      </div>
+                    ))}
+                    <Button variant="outline" onClick={cancelJob} disabled={!jobId} className="w-full">
+                      Abbrechen
+                    </Button>
                   </div>
                 )}
               </div>
@@ -348,10 +471,18 @@ function App() {
                   <FileText className="h-5 w-5" />
                   Verarbeitungsergebnisse
                 </CardTitle>
-                <Button onClick={downloadCSV} variant="outline">
-                  <Download className="h-4 w-4 mr-2" />
-                  CSV für TTS Kokei herunterladen
-                </Button>
+                <div className="flex gap-2">
+                  {lastJobId && (
+                    <Button onClick={downloadArchive} variant="outline">
+                      <Download className="h-4 w-4 mr-2" />
+                      Ergebnisse als ZIP
+                    </Button>
+                  )}
+                  <Button onClick={downloadCSV} variant="outline">
+                    <Download className="h-4 w-4 mr-2" />
+                    CSV für TTS Kokei herunterladen
+                  </Button>
+                </div>
               </div>
             </CardHeader>
             <CardContent>
@@ -53,6 +53,7 @@ a = Analysis(
         'soundfile',
         'numpy',
         'whisper',
+        'whisper_batch',
         'speech_recognition',
         'sklearn',
         'scipy',
@@ -89,7 +90,9 @@ a = Analysis(
         'safetensors',
         'pyyaml',
         'tqdm',
-        'more_itertools'
+        'more_itertools',
+        'faster_whisper',
+        'ctranslate2'
     ],
     hookspath=[],
     hooksconfig={},
@@ -0,0 +1,122 @@
+import numpy as np
+
+try:
+    from .vad import frame_energy_db
+except ImportError:
+    from vad import frame_energy_db
+
+# Feinere Rahmen als bei der VAD, damit Schnittpunkte auf 10ms genau liegen
+ALIGN_FRAME_MS = 10
+# So weit wird vor dem ersten bzw. hinter dem letzten Wort nach der leisesten Stelle gesucht
+ALIGN_SEARCH_SECONDS = 0.3
+# So viele Segmente werden im Strom gesammelt und mit einem refine()-Aufruf verfeinert
+ALIGN_WINDOW = 16
+
+
+class BoundaryAligner:
+    """Verfeinert Segmentgrenzen anhand von Wort-Zeitstempeln und der Signalenergie.
+
+    Die Rahmenenergie wird einmal vektorisiert für die ganze Aufnahme berechnet.
+    Pro Grenze wird im Suchbereich vor dem ersten bzw. hinter dem letzten Wort
+    der leiseste Rahmen gewählt (bei Gleichstand der dem Wort nächste), sodass
+    weder Wortanfänge abgeschnitten werden noch Rauschen am Ende stehen bleibt.
+    """
+
+    def __init__(self, samples, sample_rate, search_seconds=ALIGN_SEARCH_SECONDS, frame_ms=ALIGN_FRAME_MS):
+        self.energies = frame_energy_db(samples, sample_rate, frame_ms)
+        self.frame_seconds = frame_ms / 1000.0
+        self.duration = len(samples) / float(sample_rate)
+        self._offsets = np.arange(max(1, int(round(search_seconds / self.frame_seconds))) + 1)
+
+    def _quietest(self, frames, lower, upper):
+        """Wählt je Zeile den leisesten gültigen Rahmen; frames ist nach Nähe zum Wort sortiert."""
+        valid = (frames >= lower[:, None]) & (frames <= upper[:, None]) & (frames < len(self.energies))
+        energies = np.where(valid, self.energies[np.clip(frames, 0, max(0, len(self.energies) - 1))], np.inf)
+        best = frames[np.arange(len(frames)), np.argmin(energies, axis=1)]
+        return best, valid.any(axis=1)
+
+    def refine(self, starts, ends, lower=None, upper=None):
+        """Gibt verfeinerte (start, end)-Arrays in Sekunden zurück.
+
+        starts/ends sind Anfang des ersten und Ende des letzten Worts je Segment;
+        lower/upper begrenzen die Suche (z. B. Ende des vorigen bzw. Anfang des
+        nächsten Segments), damit sich benachbarte Segmente nicht überlappen.
+        """
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        lower = np.zeros_like(starts) if lower is None else np.maximum(np.asarray(lower, dtype=np.float64), 0.0)
+        upper = np.full_like(ends, self.duration) if upper is None else np.minimum(np.asarray(upper, dtype=np.float64),
+                                                                                 self.duration)
+        if len(self.energies) == 0 or len(starts) == 0:
+            return starts, ends
+
+        fs = self.frame_seconds
+        start_frames = np.floor(starts / fs).astype(np.int64)
+        end_frames = np.floor(ends / fs).astype(np.int64)
+        lower_frames = np.ceil(lower / fs).astype(np.int64)
+        upper_frames = np.floor(upper / fs).astype(np.int64) - 1
+
+        # Anfang: Rahmen vor dem ersten Wort, rückwärts; Ende: Rahmen nach dem letzten Wort, vorwärts
+        best_start, has_start = self._quietest(start_frames[:, None] - self._offsets[None, :], lower_frames, start_frames)
+        best_end, has_end = self._quietest(end_frames[:, None] + self._offsets[None, :], end_frames, upper_frames)
+        new_starts = np.where(has_start, best_start * fs, starts)
+        new_ends = np.where(has_end, (best_end + 1) * fs, ends)
+        return np.maximum(new_starts, lower), np.minimum(np.maximum(new_ends, new_starts), upper)
+
+
+def word_timings(words):
+    """Wort-Zeitstempel in der Form, in der sie in Ergebnis und CSV stehen."""
+    return [{"word": word["word"].strip(), "start": round(word["start"], 3), "end": round(word["end"], 3)}
+            for word in words]
+
+
+def iter_aligned_segments(samples, sample_rate, segments, search_seconds=ALIGN_SEARCH_SECONDS, window=ALIGN_WINDOW):
+    """Verfeinert die Grenzen eines Segmentstroms fensterweise.
+
+    Segmente mit "words" werden an Anfang des ersten und Ende des letzten Worts
+    ausgerichtet, alle anderen an ihren bisherigen Grenzen. Je window Segmente
+    werden mit einem vektorisierten refine()-Aufruf verfeinert, sobald das
+    nächste Segment bekannt ist. Ein Segment endet nie nach dem Anfang des
+    nächsten und beginnt nie vor dem Ende des vorigen.
+    """
+    aligner = BoundaryAligner(samples, sample_rate, search_seconds)
+    previous_end = 0.0
+    pending = []
+    for seg in segments:
+        if len(pending) >= window:
+            previous_end = _align(aligner, pending, previous_end, _first_word_start(seg))
+            yield from pending
+            pending = []
+        pending.append(seg)
+    if pending:
+        _align(aligner, pending, previous_end, None)
+        yield from pending
+
+
+def _first_word_start(seg):
+    return seg["words"][0]["start"] if seg.get("words") else seg["start_time"]
+
+
+def _last_word_end(seg):
+    return seg["words"][-1]["end"] if seg.get("words") else seg["end_time"]
+
+
+def _align(aligner, segs, lower, upper):
+    """Verfeinert aufeinanderfolgende Segmente mit einem refine()-Aufruf; gibt das letzte Ende zurück.
+
+    lower ist das Ende des vorigen, upper der Anfang des nächsten Segments (None am Ende).
+    Jede Grenze sucht zwischen den Wörtern der Nachbarn; danach wird jeder Anfang
+    auf das verfeinerte Ende davor begrenzt, damit sich Segmente nicht überlappen.
+    """
+    starts = np.array([_first_word_start(seg) for seg in segs], dtype=np.float64)
+    ends = np.array([_last_word_end(seg) for seg in segs], dtype=np.float64)
+    lowers = np.minimum(np.concatenate(([lower], ends[:-1])), starts)
+    uppers = np.maximum(np.append(starts[1:], np.inf if upper is None else upper), ends)
+    new_starts, new_ends = aligner.refine(starts, ends, lowers, uppers)
+    previous_ends = np.minimum(np.concatenate(([lower], new_ends[:-1])), starts)
+    new_starts = np.maximum(new_starts, previous_ends)
+    new_ends = np.maximum(new_ends, new_starts)
+    for seg, start, end in zip(segs, new_starts, new_ends):
+        seg["start_time"] = round(float(start), 3)
+        seg["end_time"] = round(float(end), 3)
+    return segs[-1]["end_time"]
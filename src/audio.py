@@ -1,32 +1,38 @@
-from flask import Blueprint, request, jsonify, send_file, make_response
+from flask import Blueprint, request, jsonify, send_file, make_response, url_for, Response, stream_with_context, g
 from werkzeug.utils import secure_filename
 import os
 import tempfile
 import uuid
-from pydub import AudioSegment
-import librosa
-import soundfile as sf
-import numpy as np
 from datetime import datetime
 import json
-import whisper
-import speech_recognition as sr
 import csv
 import io
+import time
+
+from audio_buffer import SUPPORTED_FORMATS
+from jobs import get_job_manager
+from zip_stream import iter_zip_chunks
+from metrics import span
 
 audio_bp = Blueprint('audio', __name__)
 
-# Load Whisper model (using base model for balance of speed and accuracy)
-whisper_model = None
+@audio_bp.before_request
+def _start_request_span():
+    # stream_with_context keeps the request context, so streamed responses are timed until the stream ends
+    g.metrics_span = span('http_request', endpoint=request.endpoint or 'unknown').__enter__()
+    g.metrics_span.add(bytes_read=request.content_length)
+
+@audio_bp.teardown_request
+def _finish_request_span(error=None):
+    request_span = g.pop('metrics_span', None)
+    if request_span is not None:
+        request_span.__exit__(type(error) if error else None, error, None)
 
-def get_whisper_model():
-    global whisper_model
-    if whisper_model is None:
-        whisper_model = whisper.load_model("base")
-    return whisper_model
+# Seconds between heartbeat events on an idle event stream
+EVENT_HEARTBEAT_SECONDS = 15
 
-# Allowed file extensions
-ALLOWED_EXTENSIONS = {"mp3", "wav", "opus", "ogg", "flac", "m4a", "aac", "wma"}
+# Allowed file extensions: whatever the shared decoder (audio_buffer.load_audio) accepts
+ALLOWED_EXTENSIONS = set(SUPPORTED_FORMATS)
 
 def allowed_file(filename):
     if not filename or "." not in filename:
@@ -36,18 +42,155 @@ def allowed_file(filename):
         return False
     return name_parts[1].lower() in ALLOWED_EXTENSIONS
 
-def convert_to_wav(input_path, output_path):
-    """Convert audio file to high-quality WAV format"""
-    try:
-        # Load audio with pydub
-        audio = AudioSegment.from_file(input_path)
-        
-        # Convert to high quality WAV (44.1kHz, 16-bit)
-        audio = audio.set_frame_rate(44100).set_channels(1).set_sample_width(2)
-        
-        # Export as WAV
-        audio.export(output_path, format="wav")
-        return True
-    except Exception as e:
-        print(f"Error converting to WAV: {e}")
-        return False
+@audio_bp.route('/upload', methods=['POST'])
+def upload_files():
+    """Store the uploaded files and queue them as a job; returns the job ID immediately"""
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+
+    segmentation_type = request.form.get('segmentation_type', 'sentence')
+    if segmentation_type not in ('sentence', 'paragraph', 'time'):
+        return jsonify({'error': f'Invalid segmentation type: {segmentation_type}'}), 400
+
+    manager = get_job_manager()
+    job_dir = manager.create_job_dir()
+    saved = []
+    rejected = []
+    for index, file in enumerate(files):
+        filename = secure_filename(file.filename)
+        if not allowed_file(filename):
+            rejected.append(file.filename)
+            continue
+        # One directory per file so identical names in one upload don't collide
+        file_dir = os.path.join(job_dir, 'uploads', str(index))
+        os.makedirs(file_dir)
+        path = os.path.join(file_dir, filename)
+        file.save(path)
+        saved.append(path)
+
+    if not saved:
+        return jsonify({'error': 'No supported audio files', 'rejected': rejected}), 400
+
+    job = manager.submit(job_dir, saved, segmentation_type)
+    return jsonify({
+        'job_id': job.id,
+        'status_url': url_for('audio.job_status', job_id=job.id),
+        'rejected': rejected
+    }), 202
+
+def _get_job_or_404(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return None, (jsonify({'error': 'Job not found'}), 404)
+    return job, None
+
+@audio_bp.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Job status with per-file stage and progress"""
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+    return jsonify(job.to_dict())
+
+@audio_bp.route('/jobs/<job_id>/results', methods=['GET'])
+def job_results(job_id):
+    """Results finished so far; pass ?since=N to fetch only results after the first N"""
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+    since = request.args.get('since', 0, type=int)
+    results = job.results_since(since)
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'since': since,
+        'next': since + len(results),
+        'results': results
+    })
+
+@audio_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream per-file stage events with timings as NDJSON, or as SSE for Accept: text/event-stream
+
+    Each event has a type (file_started, decoded, quality_assessed, transcribed,
+    segmented, exported, segment, file_finished, job_finished), the seconds since
+    job creation ("time") and, for stages, the seconds the stage took ("elapsed").
+    file_finished carries the complete result. Idle streams get heartbeat events
+    reporting how long the job has been silent, which makes stalls visible.
+    Pass ?since=N to resume after the first N events; SSE clients resume via Last-Event-ID.
+    """
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    since = request.args.get('since', last_event_id + 1 if last_event_id is not None else 0, type=int)
+    use_sse = request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+
+    def format_event(event):
+        payload = json.dumps(event, ensure_ascii=False, default=float)
+        if use_sse:
+            return f"id: {event.get('seq', '')}\nevent: {event['type']}\ndata: {payload}\n\n"
+        return payload + "\n"
+
+    def generate():
+        position = since
+        last_event = time.time()
+        while True:
+            events = job.wait_events(position, timeout=EVENT_HEARTBEAT_SECONDS)
+            for event in events:
+                yield format_event(event)
+            position += len(events)
+            if events:
+                last_event = time.time()
+            elif job.finished is not None:
+                break
+            else:
+                yield format_event({'type': 'heartbeat', 'status': job.status,
+                                    'idle': round(time.time() - last_event, 1)})
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson'
+    )
+    # Keep proxies from buffering the stream
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@audio_bp.route('/jobs/<job_id>/archive', methods=['GET'])
+def job_archive(job_id):
+    """Stream the job's results as a ZIP (CSV, segment WAVs, result.json per file)
+
+    The archive is written while it is sent and grows as files finish, so the
+    download can start before the job is done. WAV files are stored uncompressed.
+    """
+    job, error = _get_job_or_404(job_id)
+    if error:
+        return error
+
+    def finished_results():
+        position = 0
+        events = 0
+        while True:
+            # Check before fetching so results added just before finishing aren't missed
+            finished = job.finished is not None
+            results = job.results_since(position)
+            position += len(results)
+            yield from results
+            if finished:
+                break
+            events += len(job.wait_events(events, timeout=EVENT_HEARTBEAT_SECONDS))
+
+    response = Response(stream_with_context(iter_zip_chunks(finished_results())), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename="results_{job.id}.zip"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@audio_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a job; the current file stops at its next stage boundary"""
+    job = get_job_manager().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
@@ -0,0 +1,572 @@
+import io
+import mmap
+import os
+import struct
+import subprocess
+import tempfile
+import wave
+import weakref
+
+import numpy as np
+
+try:
+    from .metrics import span
+except ImportError:
+    from metrics import span
+
+# Whisper erwartet 16kHz Mono-Audio, alle Stufen arbeiten auf dieser Rate
+SAMPLE_RATE = 16000
+SUPPORTED_FORMATS = ["opus", "ogg", "mp3", "wav", "m4a", "aac", "flac", "wma"]
+# Formate, die libsndfile ohne ffmpeg-Subprozess dekodieren kann (MP3 ab libsndfile 1.1)
+SOUNDFILE_FORMATS = {"opus", "ogg", "mp3", "wav", "flac"}
+# Ausgabeformate für Segmente: Dateiendung, libsndfile-Format und -Subtyp (WAV ohne libsndfile)
+SEGMENT_FORMATS = {
+    "wav": (".wav", None, None),
+    "flac": (".flac", "FLAC", None),
+    "opus": (".opus", "OGG", "OPUS"),
+}
+# Abtastraten, die Opus kodieren kann; andere werden auf 48 kHz resampelt
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+# libsndfile-Subtypen für rohe PCM-Daten nach Bytes pro Sample (8 Bit ist in WAV vorzeichenlos)
+_RAW_SUBTYPES = {1: "PCM_U8", 2: "PCM_16", 3: "PCM_24", 4: "PCM_32"}
+# numpy-Typen für PCM-Daten nach Bytes pro Sample; 24 Bit hat keinen eigenen Typ
+_PCM_DTYPES = {1: "u1", 2: "<i2", 4: "<i4"}
+# Blockgrößen für die Dekodierung mit Speichergrenze (in Sekunden Eingangsaudio)
+MIN_DECODE_BLOCK_SECONDS = 1.0
+MAX_DECODE_BLOCK_SECONDS = 30.0
+
+
+def _env_memory_limit():
+    value = os.environ.get("VOICE_MEMORY_LIMIT_MB")
+    return int(float(value) * 1024 * 1024) if value else None
+
+
+# Obergrenze in Bytes für Audio, das eine Stufe auf einmal im Speicher halten darf (None = unbegrenzt)
+_memory_limit = _env_memory_limit()
+
+
+def set_memory_limit(megabytes):
+    """Setzt die Speichergrenze für alle Stufen (None hebt sie auf).
+
+    Größere Aufnahmen werden blockweise dekodiert und als Datei eingeblendet statt
+    im Speicher gehalten, die Transkription läuft dann fensterweise.
+    """
+    global _memory_limit
+    _memory_limit = None if megabytes is None else int(megabytes * 1024 * 1024)
+
+
+def get_memory_limit():
+    """Aktuelle Speichergrenze in Bytes oder None."""
+    return _memory_limit
+
+
+def exceeds_memory_limit(n_bytes):
+    return _memory_limit is not None and n_bytes > _memory_limit
+
+
+def _decode_block_frames(sample_rate, bytes_per_frame):
+    """Blockgröße, bei der ein Dekodierblock samt Zwischenpuffern nur einen Bruchteil der Grenze belegt."""
+    frames = (_memory_limit or 0) // (16 * bytes_per_frame)
+    return int(min(max(frames, MIN_DECODE_BLOCK_SECONDS * sample_rate), MAX_DECODE_BLOCK_SECONDS * sample_rate))
+
+
+class AudioBuffer:
+    """Einmal dekodiertes Audio (16kHz, mono, int16), das alle Verarbeitungsstufen teilen.
+
+    Die Samples liegen im Speicher oder, bei Aufnahmen über der Speichergrenze, in
+    einer per mmap eingeblendeten Datei (siehe from_file); für die Stufen macht das
+    keinen Unterschied. Nur wenn der Export eine höhere Abtastrate verlangt (Voice
+    Cloning), hängt unter export_audio eine zweite Fassung in dieser Rate.
+    """
+
+    def __init__(self, samples, sample_rate=SAMPLE_RATE, source_path=None, source_sample_rate=None):
+        self.samples = np.ascontiguousarray(samples, dtype=np.int16)
+        self.sample_rate = sample_rate
+        self.source_path = source_path
+        # Abtastrate der Originaldatei, relevant für die Qualitätsbewertung
+        self.source_sample_rate = source_sample_rate or sample_rate
+        self._float32 = None
+        # (Pfad, Byte-Offset, Anzahl Samples) der eingeblendeten Datei
+        self._backing = None
+        # Hochaufgelöste Fassung für den Segmentexport (AudioBuffer) oder None
+        self.export_audio = None
+
+    @classmethod
+    def from_file(cls, path, offset=0, length=None, owned=False, **kwargs):
+        """Blendet int16-PCM aus einer Datei ein, ohne sie zu lesen.
+
+        Mit owned=True wird die (temporäre) Datei gelöscht, sobald der Puffer freigegeben ist.
+        """
+        if length is None:
+            length = (os.path.getsize(path) - offset) // 2
+        if not length:
+            # Leere Dateien lassen sich nicht einblenden
+            if owned:
+                _remove_file(path)
+            return cls(np.zeros(0, dtype=np.int16), **kwargs)
+        audio = cls(np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(length,)), **kwargs)
+        audio._backing = (path, offset, length)
+        if owned:
+            weakref.finalize(audio, _remove_file, path)
+        return audio
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getstate__(self):
+        # Den float32-Cache nicht mit an Worker-Prozesse schicken; eingeblendete Dateien nur per Pfad
+        state = self.__dict__.copy()
+        state["_float32"] = None
+        if self._backing is not None:
+            state["samples"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.samples is None:
+            path, offset, length = self._backing
+            self.samples = np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(length,))
+
+    @property
+    def duration(self):
+        return len(self.samples) / float(self.sample_rate)
+
+    def as_float32(self):
+        """Gibt die Samples als float32 im Bereich [-1, 1] zurück (wird zwischengespeichert)."""
+        if self._float32 is None:
+            self._float32 = self.samples.astype(np.float32) / 32768.0
+        return self._float32
+
+    def slice(self, start_time, end_time):
+        """Gibt die int16-Samples zwischen zwei Zeitpunkten (Sekunden) als View zurück."""
+        start = max(0, int(start_time * self.sample_rate))
+        end = min(len(self.samples), int(end_time * self.sample_rate))
+        return self.samples[start:max(start, end)]
+
+    def iter_blocks(self, block_seconds=10.0):
+        """Liefert die Samples blockweise als Views, z. B. für die Qualitätsanalyse."""
+        block = max(1, int(block_seconds * self.sample_rate))
+        for start in range(0, len(self.samples), block):
+            yield self.samples[start:start + block]
+
+    def segment_bytes(self, start_time, end_time):
+        """Rohdaten (PCM) eines Segments als memoryview, ohne Kopie."""
+        return memoryview(self.slice(start_time, end_time)).cast("B")
+
+    @property
+    def channels(self):
+        return 1
+
+    @property
+    def sampwidth(self):
+        return 2
+
+    def to_wav(self, output_path):
+        """Schreibt den Puffer als 16-bit-Mono-WAV."""
+        write_wav(output_path, self.samples, self.sample_rate)
+
+
+class WavSource:
+    """Per mmap eingeblendete PCM-WAV-Datei.
+
+    Segmente werden als Byte-Bereiche direkt aus der Datei gelesen, ohne das
+    Audio zu dekodieren oder in den Speicher zu kopieren. Das Originalformat
+    (Abtastrate, Kanäle, Bittiefe) bleibt erhalten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._parse_header()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _parse_header(self):
+        data = self._mmap
+        if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+            raise ValueError(f"Keine WAV-Datei: {self.path}")
+        position = 12
+        fmt = None
+        while position + 8 <= len(data):
+            chunk_id, chunk_size = struct.unpack("<4sI", data[position:position + 8])
+            body = position + 8
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", data[body:body + 16])
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV ohne fmt-Chunk: {self.path}")
+                audio_format, self.channels, self.sample_rate, _, block_align, bits = fmt
+                if audio_format not in (1, 0xFFFE):
+                    raise ValueError(f"Nur PCM-WAV wird unterstützt: {self.path}")
+                self.sampwidth = bits // 8
+                self._block_align = block_align
+                self._data_start = body
+                # Manche Encoder schreiben eine zu große oder 0 als Länge, daher auf die Datei begrenzen
+                self._data_end = min(len(data), body + chunk_size) if chunk_size else len(data)
+                self.n_frames = (self._data_end - self._data_start) // block_align
+                return
+            position = body + chunk_size + (chunk_size & 1)
+        raise ValueError(f"WAV ohne data-Chunk: {self.path}")
+
+    @property
+    def source_path(self):
+        return self.path
+
+    @property
+    def duration(self):
+        return self.n_frames / float(self.sample_rate)
+
+    @property
+    def data_offset(self):
+        """Byte-Offset des ersten Frames im data-Chunk der Datei (z. B. für np.memmap)."""
+        return self._data_start
+
+    def segment_bytes(self, start_time, end_time):
+        """Rohdaten eines Segments als memoryview auf die eingeblendete Datei."""
+        return self.frame_bytes(int(start_time * self.sample_rate), int(end_time * self.sample_rate))
+
+    def frame_bytes(self, start, end):
+        """Rohdaten der Frames start bis end (exklusiv) als memoryview."""
+        start = min(self.n_frames, max(0, start))
+        end = min(self.n_frames, max(start, end))
+        return memoryview(self._mmap)[self._data_start + start * self._block_align:
+                                      self._data_start + end * self._block_align]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def wav_header(data_size, sample_rate, channels=1, sampwidth=2):
+    """44-Byte-Header einer PCM-WAV-Datei mit data_size Bytes Audiodaten."""
+    block_align = channels * sampwidth
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sampwidth * 8,
+        b"data", data_size
+    )
+
+
+def write_wav_bytes(output_path, data, sample_rate, channels=1, sampwidth=2):
+    """Schreibt bereits kodierte PCM-Daten mit einem 44-Byte-Header als WAV."""
+    with open(output_path, "wb") as f:
+        f.write(wav_header(len(data), sample_rate, channels, sampwidth))
+        f.write(data)
+
+
+def pcm_samples(data, sampwidth=2):
+    """PCM-Daten als Array in ihrer Bittiefe: uint8, int16, int32 (24 Bit vorzeichenerweitert) bzw. int32.
+
+    Außer bei 24 Bit ist das Ergebnis eine Ansicht auf data ohne Kopie.
+    """
+    if sampwidth in _PCM_DTYPES:
+        return np.frombuffer(data, dtype=_PCM_DTYPES[sampwidth])
+    if sampwidth != 3:
+        raise ValueError(f"Nicht unterstützte Sample-Breite: {sampwidth} Bytes")
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    return (samples << 8) >> 8
+
+
+def write_segment(output_path, data, sample_rate, channels=1, sampwidth=2, segment_format="wav"):
+    """Schreibt die PCM-Daten eines Segments als WAV, FLAC (verlustfrei) oder Opus.
+
+    FLAC und Opus kodiert libsndfile im Prozess statt eines ffmpeg-Aufrufs pro
+    Segment; die GIL ist dabei freigegeben, mehrere Segmente lassen sich also in
+    Threads parallel kodieren. FLAC behält die Bittiefe (höchstens 24 Bit).
+    """
+    if segment_format == "wav":
+        write_wav_bytes(output_path, data, sample_rate, channels, sampwidth)
+        return
+    import soundfile as sf
+
+    _, container, subtype = SEGMENT_FORMATS[segment_format]
+    if sampwidth == 2:
+        samples = np.frombuffer(data, dtype="<i2").reshape(-1, channels)
+    else:
+        samples, _ = sf.read(io.BytesIO(data), format="RAW", subtype=_RAW_SUBTYPES[sampwidth], samplerate=sample_rate,
+                             channels=channels, dtype="int32", always_2d=True)
+    if subtype is None:
+        subtype = "PCM_16" if sampwidth <= 2 else "PCM_24"
+    elif sample_rate not in OPUS_SAMPLE_RATES:
+        import soxr
+        scale = 32768.0 if samples.dtype == np.int16 else 2147483648.0
+        samples = soxr.resample(samples.astype(np.float32) / scale, sample_rate, 48000)
+        sample_rate = 48000
+    sf.write(output_path, samples, sample_rate, format=container, subtype=subtype)
+
+
+def write_wav(output_path, samples, sample_rate=SAMPLE_RATE, block_samples=SAMPLE_RATE * 60):
+    """Schreibt int16-Samples blockweise als Mono-WAV ohne Umweg über pydub."""
+    with wave.open(output_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        for start in range(0, len(samples), block_samples):
+            wf.writeframesraw(np.ascontiguousarray(samples[start:start + block_samples], dtype="<i2"))
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class _PcmSpool:
+    """Sammelt dekodierte Blöcke als int16 in einer temporären Datei, die anschließend eingeblendet wird."""
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(prefix="voice_pcm_", suffix=".raw")
+        self._file = os.fdopen(fd, "wb")
+        self.length = 0
+
+    def write_float(self, block):
+        self.write(_float_to_int16(block))
+
+    def write(self, samples):
+        self._file.write(memoryview(samples).cast("B"))
+        self.length += len(samples)
+
+    def to_buffer(self, **kwargs):
+        self._file.close()
+        return AudioBuffer.from_file(self.path, length=self.length, owned=True, **kwargs)
+
+    def discard(self):
+        self._file.close()
+        _remove_file(self.path)
+
+
+def _float_to_int16(samples):
+    return np.clip(np.rint(samples * 32768.0), -32768, 32767).astype("<i2")
+
+
+def _export_rate(export_sample_rate, source_sample_rate):
+    """Abtastrate der Exportfassung oder None, wenn die 16-kHz-Fassung genügt.
+
+    export_sample_rate ist eine Rate in Hz oder "source" für die Originalrate;
+    höher als das Original wird nie resampelt.
+    """
+    if not export_sample_rate:
+        return None
+    rate = source_sample_rate if export_sample_rate == "source" else min(int(export_sample_rate), source_sample_rate)
+    return rate if rate > SAMPLE_RATE else None
+
+
+def _read_native_wav(path):
+    """Liest eine WAV-Datei direkt, wenn sie bereits im Zielformat vorliegt, sonst None.
+
+    Liegt sie über der Speichergrenze, wird der data-Chunk nur eingeblendet und
+    gleich ein AudioBuffer zurückgegeben.
+    """
+    if exceeds_memory_limit(os.path.getsize(path)):
+        try:
+            with WavSource(path) as source:
+                if source.channels != 1 or source.sampwidth != 2 or source.sample_rate != SAMPLE_RATE:
+                    return None
+                offset, length = source.data_offset, source.n_frames
+        except ValueError:
+            return None
+        return AudioBuffer.from_file(path, offset, length, source_path=path)
+    try:
+        with wave.open(path, "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getframerate() != SAMPLE_RATE:
+                return None
+            frames = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    return np.frombuffer(frames, dtype="<i2")
+
+
+def _decode_with_soundfile(path, export_sample_rate=None):
+    """Dekodiert im Prozess über libsndfile und resampelt mit soxr; None, wenn das nicht möglich ist.
+
+    Aus demselben Dekodiervorgang entsteht bei Bedarf auch die Exportfassung.
+    """
+    try:
+        import soundfile as sf
+        import soxr
+    except ImportError:
+        return None
+    try:
+        info = sf.info(path)
+        # float32 in Originalrate und Kanalzahl plus resampeltes Ergebnis
+        if exceeds_memory_limit(info.frames * info.channels * 4 * 2):
+            return _stream_with_soundfile(path, info, _export_rate(export_sample_rate, info.samplerate))
+        data, source_sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    except (RuntimeError, sf.SoundFileError):
+        # z. B. ältere libsndfile ohne Opus/MP3 – dann übernimmt ffmpeg
+        return None
+    mono = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+    del data
+    analysis = soxr.resample(mono, source_sample_rate, SAMPLE_RATE) if source_sample_rate != SAMPLE_RATE else mono
+    audio = AudioBuffer(_float_to_int16(analysis), source_path=path, source_sample_rate=source_sample_rate)
+    export_rate = _export_rate(export_sample_rate, source_sample_rate)
+    if export_rate is not None:
+        if export_rate != source_sample_rate:
+            mono = soxr.resample(mono, source_sample_rate, export_rate)
+        audio.export_audio = AudioBuffer(_float_to_int16(mono), sample_rate=export_rate, source_path=path,
+                                         source_sample_rate=source_sample_rate)
+    return audio
+
+
+def _stream_with_soundfile(path, info, export_rate=None):
+    """Dekodiert und resampelt blockweise in eine eingeblendete Datei (konstanter Speicherbedarf).
+
+    Mit export_rate wird im selben Durchlauf eine zweite Datei in dieser Rate gefüllt.
+    """
+    import soundfile as sf
+    import soxr
+
+    outputs = []
+    for rate in (SAMPLE_RATE, export_rate) if export_rate else (SAMPLE_RATE,):
+        resampler = soxr.ResampleStream(info.samplerate, rate, 1, dtype="float32") if rate != info.samplerate else None
+        outputs.append((rate, resampler, _PcmSpool()))
+    try:
+        blocksize = _decode_block_frames(info.samplerate, info.channels * 4)
+        for block in sf.blocks(path, blocksize=blocksize, dtype="float32", always_2d=True):
+            mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+            for _, resampler, spool in outputs:
+                spool.write_float(resampler.resample_chunk(mono) if resampler is not None else mono)
+        for _, resampler, spool in outputs:
+            if resampler is not None:
+                spool.write_float(resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+    except BaseException:
+        for _, _, spool in outputs:
+            spool.discard()
+        raise
+    buffers = [spool.to_buffer(sample_rate=rate, source_path=path, source_sample_rate=info.samplerate)
+               for rate, _, spool in outputs]
+    if len(buffers) > 1:
+        buffers[0].export_audio = buffers[1]
+    return buffers[0]
+
+
+def _stream_with_ffmpeg(path, sample_rate=SAMPLE_RATE):
+    """Lässt ffmpeg direkt Mono-PCM in sample_rate ausgeben und schreibt sie blockweise in eine eingeblendete Datei.
+
+    Anders als pydub wird die Datei dabei nie vollständig im Speicher gehalten.
+    """
+    from pydub.utils import get_encoder_name, mediainfo
+
+    source_sample_rate = int(mediainfo(path).get("sample_rate") or SAMPLE_RATE)
+    command = [get_encoder_name(), "-v", "error", "-i", path, "-f", "s16le", "-acodec", "pcm_s16le",
+               "-ac", "1", "-ar", str(sample_rate), "-"]
+    spool = _PcmSpool()
+    try:
+        with subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+            chunk_bytes = _decode_block_frames(sample_rate, 2) * 2
+            for chunk in iter(lambda: process.stdout.read(chunk_bytes), b""):
+                spool.write(np.frombuffer(chunk[:len(chunk) - len(chunk) % 2], dtype="<i2"))
+            error = process.stderr.read()
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg konnte {path} nicht dekodieren: {error.decode(errors='replace').strip()}")
+    except BaseException:
+        spool.discard()
+        raise
+    return spool.to_buffer(sample_rate=sample_rate, source_path=path, source_sample_rate=source_sample_rate)
+
+
+def load_audio(input_path, export_sample_rate=None):
+    """Dekodiert eine Audiodatei genau einmal in einen AudioBuffer (16kHz, mono, int16).
+
+    Opus/OGG, MP3, FLAC und WAV werden im Prozess mit libsndfile dekodiert und mit
+    soxr resampelt; alle anderen Formate (und der Fehlerfall) laufen über pydub/ffmpeg.
+    Mit export_sample_rate (Hz oder "source") entsteht zusätzlich eine Fassung in
+    dieser Rate für den Segmentexport (export_audio), sofern das Original sie hergibt.
+    """
+    ext = os.path.splitext(input_path)[1][1:].lower()
+    if ext not in SUPPORTED_FORMATS:
+        raise ValueError(f"Nicht unterstütztes Format: {ext}")
+    with span("decode", format=ext) as decode_span:
+        audio = _decode(input_path, ext, export_sample_rate)
+        decode_span.add(audio_seconds=audio.duration, bytes_read=os.path.getsize(input_path))
+    return audio
+
+
+def _decode(input_path, ext, export_sample_rate=None):
+    if ext == "wav":
+        samples = _read_native_wav(input_path)
+        # Eine 16-kHz-WAV braucht keine Exportfassung
+        if isinstance(samples, AudioBuffer):
+            return samples
+        if samples is not None:
+            return AudioBuffer(samples, source_path=input_path)
+
+    if ext in SOUNDFILE_FORMATS:
+        audio = _decode_with_soundfile(input_path, export_sample_rate)
+        if audio is not None:
+            return audio
+
+    if _memory_limit is not None:
+        # Die Größe des Ergebnisses ist vorab unbekannt, daher mit Speichergrenze immer streamen
+        audio = _stream_with_ffmpeg(input_path)
+        export_rate = _export_rate(export_sample_rate, audio.source_sample_rate)
+        if export_rate is not None:
+            audio.export_audio = _stream_with_ffmpeg(input_path, export_rate)
+        return audio
+
+    from pydub import AudioSegment
+    segment = AudioSegment.from_file(input_path, format=ext if ext != "wav" else None)
+    source_sample_rate = segment.frame_rate
+    buffers = []
+    for rate in (SAMPLE_RATE, _export_rate(export_sample_rate, source_sample_rate)):
+        if rate is None:
+            continue
+        converted = segment.set_frame_rate(rate).set_channels(1).set_sample_width(2)
+        buffers.append(AudioBuffer(np.frombuffer(converted.raw_data, dtype="<i2"), sample_rate=rate,
+                                   source_path=input_path, source_sample_rate=source_sample_rate))
+    if len(buffers) > 1:
+        buffers[0].export_audio = buffers[1]
+    return buffers[0]
+
+
+def open_segment_source(audio):
+    """Quelle für den Segmentexport: WAV-Dateien werden per mmap gelesen, alles andere dekodiert.
+
+    Trägt ein AudioBuffer eine Exportfassung, werden die Segmente aus ihr geschnitten.
+    """
+    if isinstance(audio, AudioBuffer):
+        return audio.export_audio if audio.export_audio is not None else audio
+    if audio.lower().endswith(".wav"):
+        try:
+            return WavSource(audio)
+        except ValueError:
+            pass
+    return load_audio(audio)
+
+
+def as_audio_buffer(audio):
+    """Nimmt einen Pfad oder einen AudioBuffer entgegen und liefert immer einen AudioBuffer."""
+    if isinstance(audio, AudioBuffer):
+        return audio
+    return load_audio(audio)
+
+
+def get_duration(audio):
+    """Ermittelt die Dauer in Sekunden, möglichst ohne die Datei komplett zu dekodieren."""
+    if isinstance(audio, AudioBuffer):
+        return audio.duration
+    if audio.lower().endswith(".wav"):
+        try:
+            with wave.open(audio, "rb") as wf:
+                return wf.getnframes() / float(wf.getframerate())
+        except (wave.Error, EOFError):
+            pass
+    if os.path.splitext(audio)[1][1:].lower() in SOUNDFILE_FORMATS:
+        try:
+            import soundfile as sf
+            return sf.info(audio).duration
+        except (ImportError, RuntimeError):
+            pass
+    return load_audio(audio).duration
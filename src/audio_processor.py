@@ -1,121 +1,376 @@
 import csv
+import json
 
-def save_segments_and_csv(original_filename, wav_path, segments, error_list=None, output_root=None):
-    """Speichert Audiosegmente als WAV und erzeugt eine CSV mit allen Informationen."""
+def _export_segment(segment_path, data, source, segment_format):
+    # Die memoryview sofort freigeben, damit die mmap-Quelle danach geschlossen werden kann
+    with data:
+        write_segment(segment_path, data, source.sample_rate, source.channels, source.sampwidth, segment_format)
+
+def save_segments_and_csv(original_filename, wav_path, segments, error_list=None, output_root=None, max_workers=None,
+                          packed=None, segment_format=None):
+    """Speichert Audiosegmente als WAV, FLAC oder Opus und erzeugt eine CSV mit allen Informationen.
+
+    wav_path kann ein Pfad oder ein bereits dekodierter AudioBuffer sein. WAV-Dateien
+    werden per mmap gelesen und jedes Segment als Byte-Bereich mit eigenem Header
+    geschrieben, ohne die Datei zu dekodieren. Mit max_workers > 1 werden die
+    Segmente parallel in Threads geschrieben.
+
+    segment_format ("wav", "flac" oder "opus", Standard: EXPORT_CONFIG) wählt das
+    Format der Segmentdateien; FLAC/Opus werden ohne Angabe von max_workers mit
+    EXPORT_CONFIG["encode_workers"] Threads kodiert.
+
+    Mit packed=True (Standard: EXPORT_CONFIG) landen alle Segmente in einem Paket
+    (segment_pack) statt in je einer Datei; audio_file verweist dann als
+    "segments.pack.wav#<Nummer>" auf das Segment. Pakete sind immer PCM.
+    """
+    if packed is None:
+        packed = EXPORT_CONFIG["packed"]
+    if segment_format is None:
+        segment_format = EXPORT_CONFIG["format"]
+    if segment_format not in SEGMENT_FORMATS:
+        raise ValueError(f"Unbekanntes Segmentformat: {segment_format}")
+    with span("export", format=segment_format) as export_span:
+        return _save_segments_and_csv(original_filename, wav_path, segments, error_list, output_root, max_workers,
+                                      packed, segment_format, export_span)
+
+def _save_segments_and_csv(original_filename, wav_path, segments, error_list, output_root, max_workers, packed,
+                           segment_format, export_span):
     import os
-    from pydub import AudioSegment
+    from concurrent.futures import ThreadPoolExecutor
     if error_list is None:
         error_list = []
-    if output_root is None:
-        output_root = os.path.dirname(wav_path)
-
-    # Ergebnisordner anlegen
-    base_name = os.path.splitext(os.path.basename(original_filename))[0]
-    result_dir = os.path.join(output_root, base_name)
-    os.makedirs(result_dir, exist_ok=True)
-
-    # Original-Audio laden
-    audio = AudioSegment.from_wav(wav_path)
-
-    # CSV vorbereiten
-    csv_path = os.path.join(result_dir, f"{base_name}_segments.csv")
-    csv_header = ["original_filename","segment_number","audio_file","transcript","start_time","end_time","duration","error"]
-    rows = []
-
-    for i, seg in enumerate(segments, 1):
-        start_ms = int(seg["start_time"] * 1000)
-        end_ms = int(seg["end_time"] * 1000)
-        segment_audio = audio[start_ms:end_ms]
-        segment_filename = f"segment_{i:02d}.wav"
-        segment_path = os.path.join(result_dir, segment_filename)
-        segment_audio.export(segment_path, format="wav")
+    if max_workers is None and segment_format != "wav":
+        max_workers = EXPORT_CONFIG["encode_workers"] or os.cpu_count()
+    source = open_segment_source(wav_path)
+    executor = None
+    if max_workers and max_workers > 1 and not packed:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    pack = None
+    try:
+        if output_root is None:
+            output_root = os.path.dirname(source.source_path or original_filename)
 
+        # Ergebnisordner anlegen
+        base_name = os.path.splitext(os.path.basename(original_filename))[0]
+        result_dir = os.path.join(output_root, base_name)
+        os.makedirs(result_dir, exist_ok=True)
+        if packed:
+            pack = SegmentPackWriter(result_dir, source.sample_rate, source.channels, source.sampwidth)
+
+        # CSV vorbereiten; Zeilen werden sofort geschrieben, damit auch Segment-Generatoren
+        # (Streaming-Transkription) inkrementell verarbeitet werden können
+        csv_path = os.path.join(result_dir, f"{base_name}_segments.csv")
+        csv_header = ["original_filename","segment_number","audio_file","transcript","start_time","end_time","duration","error","words"]
         error = "; ".join(error_list) if error_list else ""
-        rows.append([
-            base_name,
-            i,
-            segment_filename,
-            seg["text"],
-            seg["start_time"],
-            seg["end_time"],
-            seg["end_time"]-seg["start_time"],
-            error
-        ])
-
-    # Schreibe CSV
-    with open(csv_path, "w", newline='', encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(csv_header)
-        writer.writerows(rows)
+        pending = []
+
+        with open(csv_path, "w", newline='', encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(csv_header)
+
+            for i, seg in enumerate(segments, 1):
+                data = source.segment_bytes(seg["start_time"], seg["end_time"])
+                export_span.add(audio_seconds=seg["end_time"] - seg["start_time"],
+                                bytes_written=len(data) + (16 if pack is not None else 44))
+                if pack is not None:
+                    with data:
+                        audio_file = pack_reference(pack.add(data))
+                else:
+                    audio_file = segment_filename(i, segment_format)
+                    segment_path = os.path.join(result_dir, audio_file)
+                    if executor is not None:
+                        pending.append(executor.submit(_export_segment, segment_path, data, source, segment_format))
+                    else:
+                        _export_segment(segment_path, data, source, segment_format)
+
+                writer.writerow([
+                    base_name,
+                    i,
+                    audio_file,
+                    seg["text"],
+                    seg["start_time"],
+                    seg["end_time"],
+                    seg["end_time"]-seg["start_time"],
+                    error,
+                    json.dumps(seg["words"], ensure_ascii=False) if seg.get("words") else ""
+                ])
+
+        for future in pending:
+            future.result()
+    finally:
+        if pack is not None:
+            pack.close()
+        if executor is not None:
+            executor.shutdown()
+        if isinstance(source, WavSource):
+            source.close()
 
     return result_dir, csv_path
+import hashlib
 import os
-from pydub import AudioSegment
-import sys
-import librosa
+import time
 import numpy as np
-import whisper
 
-# Globales Whisper-Modell, um es nur einmal zu laden
-whisper_model = None
+try:
+    from .audio_buffer import (SAMPLE_RATE, AudioBuffer, WavSource, as_audio_buffer, exceeds_memory_limit,
+                               get_duration, get_memory_limit, load_audio, open_segment_source, set_memory_limit,
+                               SEGMENT_FORMATS, write_segment)
+except ImportError:
+    from audio_buffer import (SAMPLE_RATE, AudioBuffer, WavSource, as_audio_buffer, exceeds_memory_limit,
+                              get_duration, get_memory_limit, load_audio, open_segment_source, set_memory_limit,
+                              SEGMENT_FORMATS, write_segment)
+try:
+    from .transcription_cache import get_transcription_cache, make_cache_key
+except ImportError:
+    from transcription_cache import get_transcription_cache, make_cache_key
+try:
+    from .audio_quality import analyze_quality
+except ImportError:
+    from audio_quality import analyze_quality
+try:
+    from .vad import compact_speech, detect_speech_regions, find_window_boundaries, pause_gaps
+except ImportError:
+    from vad import compact_speech, detect_speech_regions, find_window_boundaries, pause_gaps
+try:
+    from .transcription_backends import DEFAULT_BACKEND, DEFAULT_MODEL_SIZE, create_backend
+except ImportError:
+    from transcription_backends import DEFAULT_BACKEND, DEFAULT_MODEL_SIZE, create_backend
+try:
+    from .model_server import connect_model_server
+except ImportError:
+    from model_server import connect_model_server
+try:
+    from .segmentation import TIME_WINDOW_OVERLAP, TIME_WINDOW_SECONDS, iter_time_windows
+except ImportError:
+    from segmentation import TIME_WINDOW_OVERLAP, TIME_WINDOW_SECONDS, iter_time_windows
+try:
+    from .alignment import iter_aligned_segments, word_timings
+except ImportError:
+    from alignment import iter_aligned_segments, word_timings
+try:
+    from .metrics import span
+except ImportError:
+    from metrics import span
+try:
+    from .segment_pack import SegmentPackWriter, pack_reference, segment_filename
+except ImportError:
+    from segment_pack import SegmentPackWriter, pack_reference, segment_filename
+
+# Aktives Transkriptions-Backend, wird nur einmal erzeugt und geladen
+transcription_backend = None
+# 'base' ist ein guter Kompromiss zwischen Geschwindigkeit und Genauigkeit
+# vad=True: Stille vor der Transkription entfernen (schneller, weniger Halluzinationen)
+# model_server=True: einen laufenden Modell-Server (model_server.py) verwenden, falls vorhanden
+# word_timestamps=True: Wort-Zeitstempel anfordern und Segmentgrenzen daran und an der Signalenergie ausrichten
+TRANSCRIPTION_CONFIG = {"backend": DEFAULT_BACKEND, "model_size": DEFAULT_MODEL_SIZE, "threads": None, "vad": True,
+                        "model_server": True, "word_timestamps": False}
+# packed=True: Segmente in ein Paket pro Eingabedatei statt in je eine WAV-Datei schreiben (siehe segment_pack)
+# format: "wav", "flac" (verlustfrei, etwa halb so groß) oder "opus" (verlustbehaftet, sehr klein)
+# encode_workers: Threads für die FLAC/Opus-Kodierung (None = Anzahl der Kerne)
+# sample_rate: Abtastrate der Segmentdateien in Hz oder "source" (Originalrate, z. B. für Voice Cloning);
+#   None = 16kHz wie für die Analyse, dann wird keine zweite Fassung dekodiert
+EXPORT_CONFIG = {"packed": False, "format": "wav", "encode_workers": None, "sample_rate": None}
+# Ab dieser Sprechpause beginnt im Absatzmodus ein neuer Absatz
+PARAGRAPH_PAUSE_SECONDS = 2.0
+# Fensterlänge für die Streaming-Transkription (entspricht Whispers 30s-Kontext)
+STREAM_WINDOW_SECONDS = 30.0
+
+def configure_transcription(backend=None, model_size=None, threads=None, vad=None, model_server=None,
+                            word_timestamps=None):
+    """Wählt Backend, Modellgröße, Thread-Anzahl, VAD und Wortausrichtung; ein bereits geladenes Modell wird verworfen."""
+    global transcription_backend
+    if word_timestamps is not None:
+        TRANSCRIPTION_CONFIG["word_timestamps"] = word_timestamps
+    if model_server is not None:
+        TRANSCRIPTION_CONFIG["model_server"] = model_server
+    if vad is not None:
+        TRANSCRIPTION_CONFIG["vad"] = vad
+    if backend is not None:
+        TRANSCRIPTION_CONFIG["backend"] = backend
+    if model_size is not None:
+        TRANSCRIPTION_CONFIG["model_size"] = model_size
+    if threads is not None:
+        TRANSCRIPTION_CONFIG["threads"] = threads
+    transcription_backend = None
+
+def configure_export(packed=None, segment_format=None, encode_workers=None, sample_rate=None):
+    """Wählt Ausgabelayout, Format, Kodier-Threads und Abtastrate der Segmente für save_segments_and_csv.
+
+    sample_rate=0 setzt die Exportrate auf 16kHz (keine hochaufgelöste Fassung) zurück.
+    """
+    if sample_rate is not None:
+        if sample_rate != "source" and (not isinstance(sample_rate, int) or sample_rate < 0):
+            raise ValueError(f"Ungültige Export-Abtastrate: {sample_rate}")
+        EXPORT_CONFIG["sample_rate"] = sample_rate or None
+    if segment_format is not None:
+        if segment_format not in SEGMENT_FORMATS:
+            raise ValueError(f"Unbekanntes Segmentformat: {segment_format}")
+        EXPORT_CONFIG["format"] = segment_format
+    if packed is not None:
+        EXPORT_CONFIG["packed"] = packed
+    if encode_workers is not None:
+        EXPORT_CONFIG["encode_workers"] = encode_workers
+
+class PipelineConfig:
+    """Einstellungen der gesamten Verarbeitungskette, die alle Frontends gleich anwenden.
+
+    Web-App (main.py), GUI und Stapelverarbeitung bauen eine PipelineConfig und rufen
+    apply() auf; im Prozess-Pool wird dieselbe Instanz an jeden Worker geschickt.
+    Nicht gesetzte Felder (None) lassen die aktuelle Einstellung unverändert.
+    """
+
+    FIELDS = ("backend", "model_size", "threads", "vad", "model_server", "word_timestamps",
+              "packed", "segment_format", "encode_workers", "export_sample_rate", "memory_limit_mb")
+
+    def __init__(self, **settings):
+        unknown = set(settings) - set(self.FIELDS)
+        if unknown:
+            raise TypeError(f"Unbekannte Einstellungen: {', '.join(sorted(unknown))}")
+        for field in self.FIELDS:
+            setattr(self, field, settings.get(field))
+
+    @classmethod
+    def from_env(cls, environ=None, **overrides):
+        """Liest TRANSCRIPTION_BACKEND, TRANSCRIPTION_MODEL_SIZE, SEGMENT_FORMAT und EXPORT_SAMPLE_RATE.
+
+        EXPORT_SAMPLE_RATE ist eine Rate in Hz oder "source"; die Speichergrenze
+        (VOICE_MEMORY_LIMIT_MB) liest audio_buffer bereits beim Import.
+        """
+        environ = os.environ if environ is None else environ
+        export_sample_rate = environ.get("EXPORT_SAMPLE_RATE", "").strip().lower() or None
+        if export_sample_rate is not None and export_sample_rate != "source":
+            export_sample_rate = int(export_sample_rate)
+        settings = {
+            "backend": environ.get("TRANSCRIPTION_BACKEND") or None,
+            "model_size": environ.get("TRANSCRIPTION_MODEL_SIZE") or None,
+            "segment_format": (environ.get("SEGMENT_FORMAT") or "").lower() or None,
+            "export_sample_rate": export_sample_rate,
+        }
+        settings.update(overrides)
+        return cls(**settings)
+
+    def apply(self):
+        """Überträgt die Einstellungen in TRANSCRIPTION_CONFIG, EXPORT_CONFIG und die Speichergrenze."""
+        configure_transcription(backend=self.backend, model_size=self.model_size, threads=self.threads, vad=self.vad,
+                                model_server=self.model_server, word_timestamps=self.word_timestamps)
+        configure_export(packed=self.packed, segment_format=self.segment_format, encode_workers=self.encode_workers,
+                         sample_rate=self.export_sample_rate)
+        if self.memory_limit_mb is not None:
+            set_memory_limit(self.memory_limit_mb)
+        return self
+
+    # Einstellungen, die das Ergebnis verändern (Threads, Modell-Server und Speichergrenze nicht)
+    OUTPUT_FIELDS = ("backend", "model_size", "vad", "word_timestamps", "packed", "segment_format",
+                     "export_sample_rate")
+
+    def effective_settings(self):
+        """Die Ergebniseinstellungen nach apply(): nicht gesetzte Felder aus der aktuellen Konfiguration."""
+        current = {
+            "backend": TRANSCRIPTION_CONFIG["backend"],
+            "model_size": TRANSCRIPTION_CONFIG["model_size"],
+            "vad": TRANSCRIPTION_CONFIG["vad"],
+            "word_timestamps": TRANSCRIPTION_CONFIG["word_timestamps"],
+            "packed": EXPORT_CONFIG["packed"],
+            "segment_format": EXPORT_CONFIG["format"],
+            "export_sample_rate": EXPORT_CONFIG["sample_rate"],
+        }
+        for field in self.OUTPUT_FIELDS:
+            if getattr(self, field) is not None:
+                current[field] = getattr(self, field)
+        current["export_sample_rate"] = current["export_sample_rate"] or None
+        current["segment_format"] = current["segment_format"].lower()
+        return current
+
+    def fingerprint(self):
+        """Kurzer Hash der Ergebniseinstellungen, z. B. für die Schlüssel im BatchManifest."""
+        settings = json.dumps(self.effective_settings(), sort_keys=True)
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+
+    def __repr__(self):
+        settings = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.FIELDS
+                             if getattr(self, field) is not None)
+        return f"PipelineConfig({settings})"
+
+def get_transcription_backend():
+    """Erzeugt das konfigurierte Backend einmal und gibt es zurück (das Modell lädt es erst bei Bedarf).
+
+    Läuft ein Modell-Server mit derselben Konfiguration, wird er statt eines
+    eigenen Modells verwendet.
+    """
+    global transcription_backend
+    if transcription_backend is None and TRANSCRIPTION_CONFIG["model_server"]:
+        transcription_backend = connect_model_server(
+            TRANSCRIPTION_CONFIG["backend"],
+            TRANSCRIPTION_CONFIG["model_size"],
+            TRANSCRIPTION_CONFIG["threads"]
+        )
+    if transcription_backend is None:
+        transcription_backend = create_backend(
+            TRANSCRIPTION_CONFIG["backend"],
+            TRANSCRIPTION_CONFIG["model_size"],
+            TRANSCRIPTION_CONFIG["threads"]
+        )
+    return transcription_backend
 
 def get_whisper_model():
-    """Lädt das Whisper-Modell einmal und gibt es zurück."""
-    global whisper_model
-    if whisper_model is None:
-        # Bestimmt den Pfad für das Modell, abhängig davon, ob die App als .exe läuft
-        if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-            # Die Anwendung wird als PyInstaller-Bundle ausgeführt.
-            # Das Modell liegt im temporären Ordner _MEIPASS in einem 'models'-Unterverzeichnis.
-            model_root = os.path.join(sys._MEIPASS, "models")
-        else:
-            # Die Anwendung wird als normales Python-Skript ausgeführt.
-            # Das Modell wird im 'models'-Unterverzeichnis des Skript-Verzeichnisses erwartet.
-            model_root = os.path.join(os.path.dirname(__file__), "models")
-
-        print(f"Lade Whisper-Modell (base) aus '{model_root}'... Dies kann einen Moment dauern.")
-        # 'base' ist ein guter Kompromiss zwischen Geschwindigkeit und Genauigkeit
-        whisper_model = whisper.load_model("base", download_root=model_root)
-        print("Whisper-Modell geladen.")
-    return whisper_model
+    """Lädt das Modell des aktiven Backends einmal und gibt es zurück."""
+    return get_transcription_backend().load()
+
+def warm_up(load_model=True):
+    """Bereitet die Verarbeitung vor, bevor die erste Datei kommt.
+
+    Importiert die Decoder-Bibliotheken, lässt VAD und Qualitätsanalyse einmal über
+    eine Sekunde Rauschen laufen (numpy/FFT-Initialisierung) und lädt optional das
+    Modell. Gibt die Dauer jedes Schritts in Sekunden zurück.
+    """
+    timings = {}
+    started = time.perf_counter()
+    try:
+        import soundfile
+        import soxr
+    except ImportError:
+        pass
+    timings["decoder_import"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    samples = (np.random.default_rng(0).standard_normal(SAMPLE_RATE) * 1000).astype(np.int16)
+    detect_speech_regions(samples, SAMPLE_RATE)
+    analyze_quality([samples], SAMPLE_RATE)
+    timings["analysis"] = time.perf_counter() - started
+
+    if load_model:
+        started = time.perf_counter()
+        get_whisper_model()
+        timings["model_load"] = time.perf_counter() - started
+    return timings
 
 def convert_to_wav(input_path, output_path):
     """Konvertiert eine Audiodatei in ein hochwertiges WAV-Format (16kHz, 16-bit, mono)."""
     try:
-        # Unterstützte Formate
-        supported_formats = ["opus", "mp3", "wav", "m4a", "aac", "flac"]
-        ext = os.path.splitext(input_path)[1][1:].lower()
-        if ext not in supported_formats:
-            print(f"Nicht unterstütztes Format: {ext}")
-            return False
-
-        audio = AudioSegment.from_file(input_path, format=ext if ext != "wav" else None)
-        # Whisper erwartet 16kHz Mono-Audio für optimale Ergebnisse
-        audio = audio.set_frame_rate(16000).set_channels(1).set_sample_width(2)
-        audio.export(output_path, format="wav")
+        with span("convert") as convert_span:
+            audio = load_audio(input_path)
+            audio.to_wav(output_path)
+            convert_span.add(audio_seconds=audio.duration, bytes_read=os.path.getsize(input_path),
+                             bytes_written=os.path.getsize(output_path))
         return True
     except Exception as e:
         print(f"Fehler bei der Konvertierung zu WAV: {e}")
         return False
 
 def assess_audio_quality(wav_path):
-    """Bewertet die Qualität einer WAV-Audiodatei."""
+    """Bewertet die Qualität einer WAV-Audiodatei oder eines AudioBuffers.
+
+    Alle Metriken (Pegel, Rauschboden/SNR, Übersteuerung, Nulldurchgangsrate,
+    spektraler Schwerpunkt) werden in einem Durchlauf blockweise berechnet.
+    """
     try:
-        y, sr = librosa.load(wav_path, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr)
-
-        # Signal-Rausch-Verhältnis (SNR, grobe Schätzung)
-        # librosa.effects.deemphasize existiert nicht in librosa.
-        # Die SNR-Berechnung wird vorerst deaktiviert, um Fehler zu vermeiden.
-        # Eine korrekte Rauschschätzung müsste hier implementiert werden.
-        # rms_signal = np.sqrt(np.mean(y**2))
-        # noise = y - librosa.effects.deemphasize(y) # Diese Zeile verursacht einen Fehler
-        # rms_noise = np.sqrt(np.mean(noise**2)) if np.any(noise) else 1e-10
-        # snr = 20 * np.log10(rms_signal / rms_noise) if rms_noise > 0 else 0
-        snr = 0 # Standardwert, da SNR-Berechnung deaktiviert ist
-
-        # Klarheit (Spektraler Schwerpunkt)
-        spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+        audio = as_audio_buffer(wav_path)
+        with span("assess") as assess_span:
+            metrics = analyze_quality(audio.iter_blocks(), audio.sample_rate)
+            assess_span.add(audio_seconds=audio.duration)
+        sr = audio.source_sample_rate
+        duration = metrics["duration"]
+        snr = metrics["snr"]
 
         # Schwellenwerte und Fehlerdokumentation
         issues = []
@@ -127,17 +382,8 @@ def assess_audio_quality(wav_path):
             issues.append(f"SNR zu niedrig ({snr:.2f}dB). Mindestwert für Transkription: 20dB.")
         elif snr < 30:
             issues.append(f"SNR unter 30dB. Für Voice Cloning empfohlen: >= 30dB.")
-
-        # Rückgabe: SNR, Dauer, Abtastrate, Klarheit, Fehlerliste
-        return {
-            "snr": snr,
-            "duration": duration,
-            "sample_rate": sr,
-            "spectral_centroid": spectral_centroid,
-            "issues": issues
-        }
-        if snr < 20:
-            issues.append(f"Geringe Signalstärke (SNR: {snr:.2f} dB).")
+        if metrics["clipping_ratio"] > 0.001:
+            issues.append(f"Übersteuerung ({metrics['clipping_ratio'] * 100:.2f}% der Samples).")
 
         # Punktzahl-Berechnung
         score = 100
@@ -158,7 +404,11 @@ def assess_audio_quality(wav_path):
                 "duration": round(duration, 2),
                 "sample_rate": sr,
                 "signal_to_noise_ratio": round(snr, 2),
-                "spectral_centroid": round(spectral_centroid, 2)
+                "noise_floor_db": round(metrics["noise_floor_db"], 2),
+                "rms_db": round(metrics["rms_db"], 2),
+                "clipping_ratio": round(metrics["clipping_ratio"], 5),
+                "zero_crossing_rate": round(metrics["zero_crossing_rate"], 4),
+                "spectral_centroid": round(metrics["spectral_centroid"], 2)
             }
         }
     except Exception as e:
@@ -170,76 +420,342 @@ def assess_audio_quality(wav_path):
             "metrics": {}
         }
 
-def transcribe_audio(wav_path):
-    """Transkribiert eine Audiodatei mit Whisper."""
+def _transcription_options(backend):
+    options = dict(backend.options, vad=TRANSCRIPTION_CONFIG["vad"])
+    if TRANSCRIPTION_CONFIG["word_timestamps"]:
+        options["word_timestamps"] = True
+    return options
+
+def _shift_segment(seg, shift, shift_end=None):
+    """Rechnet Start, Ende und ggf. Wort-Zeitstempel eines Segments mit shift(t) um.
+
+    Enden werden mit shift_end umgerechnet, falls angegeben (sonst ebenfalls mit shift).
+    """
+    shift_end = shift_end or shift
+    seg["start"] = shift(seg["start"])
+    seg["end"] = shift_end(seg["end"])
+    for word in seg.get("words") or []:
+        word["start"] = shift(word["start"])
+        word["end"] = shift_end(word["end"])
+    return seg
+
+def _transcription_request(samples, sample_rate, language=None, initial_prompt=None, float_samples=None):
+    """Bereitet int16-Samples für das Backend vor; mit VAD werden nur die Sprachregionen übergeben.
+
+    Gibt (Anfrage, finish) zurück: die Anfrage (Dict mit samples, language,
+    initial_prompt, word_timestamps) geht an backend.transcribe() bzw.
+    transcribe_batch(), finish(Ergebnis) rechnet die Zeitstempel auf die
+    Originalzeitachse zurück. Ohne Sprache ist die Anfrage None und finish(None)
+    liefert das leere Ergebnis.
+    """
+    request = {"language": language, "initial_prompt": initial_prompt,
+               "word_timestamps": TRANSCRIPTION_CONFIG["word_timestamps"]}
+    if not TRANSCRIPTION_CONFIG["vad"]:
+        if float_samples is None:
+            float_samples = samples.astype(np.float32) / 32768.0
+        return dict(request, samples=float_samples), lambda result: result
+
+    speech_regions = detect_speech_regions(samples, sample_rate)
+    if not speech_regions:
+        # Keine Sprache: das Modell wird gar nicht erst aufgerufen
+        return None, lambda result: {"text": "", "language": language, "segments": [], "speech_regions": []}
+
+    speech, timeline = compact_speech(samples, sample_rate, speech_regions)
+
+    def finish(result):
+        for seg in result["segments"]:
+            _shift_segment(seg, timeline.to_original, lambda t: timeline.to_original(t, end=True))
+        result["speech_regions"] = [list(region) for region in speech_regions]
+        return result
+
+    return dict(request, samples=speech.astype(np.float32) / 32768.0), finish
+
+def _transcribe_samples(backend, samples, sample_rate, language=None, initial_prompt=None, float_samples=None):
+    """Transkribiert int16-Samples; mit VAD werden nur die Sprachregionen an das Modell gegeben.
+
+    Die Zeitstempel der Segmente werden auf die Originalzeitachse zurückgerechnet,
+    die erkannten Sprachregionen stehen unter "speech_regions" im Ergebnis.
+    """
+    request, finish = _transcription_request(samples, sample_rate, language, initial_prompt, float_samples)
+    if request is None:
+        return finish(None)
+    return finish(backend.transcribe(request["samples"], language=language, initial_prompt=initial_prompt,
+                                     word_timestamps=request["word_timestamps"]))
+
+def transcribe_audio(wav_path, use_cache=True):
+    """Transkribiert eine Audiodatei oder einen AudioBuffer mit dem aktiven Backend.
+
+    Ergebnisse werden anhand eines Hashs des dekodierten Audios zwischengespeichert;
+    bei einem Treffer wird das Modell gar nicht erst geladen. Würde die float32-Kopie
+    der Aufnahme die Speichergrenze überschreiten, wird fensterweise transkribiert.
+    """
     try:
-        model = get_whisper_model()
-        # fp16=False ist für die CPU-Nutzung erforderlich/stabiler
-        result = model.transcribe(wav_path, fp16=False)
-        return {
-            "text": result["text"],
-            "language": result["language"],
-            "segments": result["segments"]
-        }
+        audio = as_audio_buffer(wav_path)
+        if exceeds_memory_limit(audio.samples.nbytes * 2):
+            return _transcribe_windowed(audio, use_cache)
+        backend = get_transcription_backend()
+        cache_key = None
+        if use_cache:
+            cache_key = make_cache_key(audio.samples, backend.cache_id, _transcription_options(backend))
+            cached = get_transcription_cache().get(cache_key)
+            if cached is not None:
+                return cached
+
+        # Das Backend bekommt den dekodierten Puffer direkt, statt die Datei erneut per ffmpeg zu lesen.
+        with span("transcribe", backend=backend.name) as transcribe_span:
+            transcription = _transcribe_samples(backend, audio.samples, audio.sample_rate,
+                                                float_samples=audio.as_float32())
+            transcribe_span.add(audio_seconds=audio.duration)
+        if cache_key is not None:
+            get_transcription_cache().put(cache_key, backend.cache_id, transcription)
+        return transcription
     except Exception as e:
         print(f"Transkription fehlgeschlagen: {e}")
         return None
 
-def segment_audio_intelligent(wav_path, transcription_result, segmentation_type):
-    """Segmentiert Audio basierend auf der Transkription und dem Segmentierungstyp."""
+def transcribe_audio_batch(audios, use_cache=True):
+    """Transkribiert mehrere Aufnahmen mit einem Aufruf von backend.transcribe_batch().
+
+    Cache und VAD wie bei transcribe_audio(); alle Cache-Fehlschläge gehen
+    gemeinsam an das Backend, das (openai-whisper) ihre 30s-Fenster zusammen
+    dekodiert. Aufnahmen über der Speichergrenze laufen einzeln fensterweise.
+    Gibt pro Aufnahme die Transkription oder None (Fehler) zurück.
+    """
+    audios = [as_audio_buffer(audio) for audio in audios]
+    results = [None] * len(audios)
+    try:
+        backend = get_transcription_backend()
+    except Exception as e:
+        print(f"Transkription fehlgeschlagen: {e}")
+        return results
+    pending = []
+    for index, audio in enumerate(audios):
+        if exceeds_memory_limit(audio.samples.nbytes * 2):
+            results[index] = transcribe_audio(audio, use_cache)
+            continue
+        cache_key = None
+        if use_cache:
+            cache_key = make_cache_key(audio.samples, backend.cache_id, _transcription_options(backend))
+            cached = get_transcription_cache().get(cache_key)
+            if cached is not None:
+                results[index] = cached
+                continue
+        request, finish = _transcription_request(audio.samples, audio.sample_rate, float_samples=audio.as_float32())
+        if request is None:
+            results[index] = finish(None)
+            continue
+        pending.append((index, request, finish, cache_key))
+    if not pending:
+        return results
+
+    with span("transcribe", backend=backend.name) as transcribe_span:
+        try:
+            outputs = backend.transcribe_batch([request for _, request, _, _ in pending])
+        except Exception as e:
+            outputs = [e] * len(pending)
+        transcribe_span.add(audio_seconds=sum(audios[index].duration for index, _, _, _ in pending))
+    for (index, _, finish, cache_key), output in zip(pending, outputs):
+        if isinstance(output, Exception):
+            print(f"Transkription fehlgeschlagen: {output}")
+            continue
+        results[index] = finish(output)
+        if cache_key is not None:
+            get_transcription_cache().put(cache_key, backend.cache_id, results[index])
+    return results
+
+def _transcribe_windowed(audio, use_cache):
+    speech_regions = [] if TRANSCRIPTION_CONFIG["vad"] else None
+    segments = list(transcribe_audio_stream(audio, use_cache=use_cache, speech_regions=speech_regions))
+    result = {
+        "text": "".join(seg["text"] for seg in segments),
+        "language": segments[0]["language"] if segments else None,
+        "segments": segments
+    }
+    if speech_regions is not None:
+        result["speech_regions"] = speech_regions
+    return result
+
+def transcribe_audio_stream(wav_path, window_seconds=STREAM_WINDOW_SECONDS, use_cache=True, speech_regions=None):
+    """Transkribiert lange Aufnahmen fensterweise und liefert Whisper-Segmente, sobald sie fertig sind.
+
+    Die Fenster werden an der leisesten Stelle vor dem Fensterende geschnitten, damit
+    keine Wörter zerteilt werden. Pro Fenster wird nur dieser Ausschnitt nach float32
+    gewandelt. Jedes Segment trägt die erkannte Sprache unter "language"; die Zeitstempel
+    beziehen sich auf die gesamte Aufnahme.
+
+    Ist speech_regions eine Liste, werden dort mit VAD die Sprachregionen (ebenfalls
+    auf der gesamten Aufnahme) angehängt, jeweils bevor die Segmente des Fensters
+    geliefert werden; so kann iter_segments_intelligent schon während des Stroms an
+    echten Pausen trennen.
+    """
+    audio = as_audio_buffer(wav_path)
+    backend = get_transcription_backend()
+    options = dict(_transcription_options(backend), stream_window=window_seconds)
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(audio.samples, backend.cache_id, options)
+        cached = get_transcription_cache().get(cache_key)
+        # Einträge ohne Sprachregionen (mit VAD) stammen von älteren Versionen und werden neu berechnet
+        if cached is not None and (not TRANSCRIPTION_CONFIG["vad"] or "speech_regions" in cached):
+            if speech_regions is not None:
+                speech_regions.extend(cached.get("speech_regions") or [])
+            for seg in cached["segments"]:
+                yield seg
+            return
+
+    language = None
+    previous_text = ""
+    all_segments = []
+    all_regions = []
+    for start, end in find_window_boundaries(audio.samples, audio.sample_rate, window_seconds):
+        offset = start / float(audio.sample_rate)
+        # Die Sprache des ersten Fensters gilt für alle weiteren, der vorige Text dient als Kontext
+        with span("transcribe_window", backend=backend.name) as window_span:
+            result = _transcribe_samples(backend, audio.samples[start:end], audio.sample_rate,
+                                         language=language, initial_prompt=previous_text or None)
+            window_span.add(audio_seconds=(end - start) / float(audio.sample_rate))
+        language = language or result["language"]
+        regions = [[region_start + offset, region_end + offset]
+                   for region_start, region_end in result.get("speech_regions") or []]
+        all_regions.extend(regions)
+        if speech_regions is not None:
+            speech_regions.extend(regions)
+        for seg in result["segments"]:
+            seg = _shift_segment(dict(seg, id=len(all_segments), language=language), lambda t: t + offset)
+            all_segments.append(seg)
+            yield seg
+        if result["segments"]:
+            previous_text = result["text"][-200:]
+
+    if cache_key is not None:
+        entry = {
+            "text": "".join(seg["text"] for seg in all_segments),
+            "language": language,
+            "segments": all_segments
+        }
+        if TRANSCRIPTION_CONFIG["vad"]:
+            entry["speech_regions"] = all_regions
+        get_transcription_cache().put(cache_key, backend.cache_id, entry)
+
+def segment_audio_intelligent(wav_path, transcription_result, segmentation_type,
+                              window_seconds=TIME_WINDOW_SECONDS, overlap_seconds=TIME_WINDOW_OVERLAP, align=None):
+    """Segmentiert Audio basierend auf der Transkription und dem Segmentierungstyp.
+
+    window_seconds und overlap_seconds gelten nur für die zeitbasierte Segmentierung,
+    align siehe iter_segments_intelligent.
+    """
     if not transcription_result or "segments" not in transcription_result:
         return []
+    with span("segment", type=segmentation_type):
+        return list(iter_segments_intelligent(wav_path, transcription_result["segments"], segmentation_type,
+                                              transcription_result.get("speech_regions"),
+                                              window_seconds=window_seconds, overlap_seconds=overlap_seconds,
+                                              align=align))
+
+class _ParagraphBreaks:
+    """Prüft, ob zwischen zwei Whisper-Segmenten eine lange Sprechpause liegt.
+
+    Mit VAD-Regionen zählt die tatsächliche Stille im Signal (deren Mitte zwischen
+    den Mitten der beiden Segmente liegt), sonst der Abstand der Zeitstempel. Die
+    Segmente kommen zeitlich geordnet, daher rückt ein Index über die Pausen vor,
+    statt für jedes Segment alle Pausen zu durchsuchen. Die Regionenliste darf
+    während des Stroms wachsen (siehe transcribe_audio_stream); neue Regionen werden
+    bei der nächsten Prüfung berücksichtigt.
+    """
 
-    whisper_segments = transcription_result["segments"]
-    final_segments = []
+    def __init__(self, speech_regions):
+        self._regions = speech_regions
+        self._midpoints = []
+        # Regionen bis hierhin sind nach Pausen durchsucht (die letzte davon bleibt für die nächste Lücke)
+        self._scanned = 1
+        self._index = 0
 
+    def __call__(self, previous, seg):
+        if self._regions is None:
+            return seg["start"] - previous["end"] > PARAGRAPH_PAUSE_SECONDS
+        if len(self._regions) > self._scanned:
+            gaps = pause_gaps(self._regions[self._scanned - 1:], PARAGRAPH_PAUSE_SECONDS)
+            self._midpoints.extend((gap_start + gap_end) / 2 for gap_start, gap_end in gaps)
+            self._scanned = len(self._regions)
+        left = (previous["start"] + previous["end"]) / 2
+        right = (seg["start"] + seg["end"]) / 2
+        while self._index < len(self._midpoints) and self._midpoints[self._index] < left:
+            self._index += 1
+        return self._index < len(self._midpoints) and self._midpoints[self._index] <= right
+
+def _with_words(segment, words):
+    if words:
+        segment["words"] = word_timings(words)
+    return segment
+
+def iter_segments_intelligent(wav_path, whisper_segments, segmentation_type, speech_regions=None,
+                              window_seconds=TIME_WINDOW_SECONDS, overlap_seconds=TIME_WINDOW_OVERLAP, align=None):
+    """Wie segment_audio_intelligent, verarbeitet die Whisper-Segmente aber als Strom.
+
+    Segmente werden geliefert, sobald sie feststehen, sodass z. B. die Ausgabe von
+    transcribe_audio_stream direkt an save_segments_and_csv gehen kann. Sind
+    VAD-Sprachregionen bekannt, trennt der Absatzmodus an echten Pausen im Signal.
+    Die Dauer für Zeitfenster stammt aus dem Puffer bzw. den Dateimetadaten.
+
+    Tragen die Whisper-Segmente Wort-Zeitstempel, erhalten Satz- und Absatzsegmente
+    sie unter "words". Mit align=True (Standard: TRANSCRIPTION_CONFIG["word_timestamps"])
+    werden deren Grenzen zusätzlich an Wörtern und Signalenergie ausgerichtet.
+    """
+    segments = _iter_segments(wav_path, whisper_segments, segmentation_type, speech_regions,
+                              window_seconds, overlap_seconds)
+    if align is None:
+        align = TRANSCRIPTION_CONFIG["word_timestamps"]
+    if align and segmentation_type in ("sentence", "paragraph"):
+        audio = as_audio_buffer(wav_path)
+        segments = iter_aligned_segments(audio.samples, audio.sample_rate, segments)
+    return segments
+
+def _iter_segments(wav_path, whisper_segments, segmentation_type, speech_regions, window_seconds, overlap_seconds):
     if segmentation_type == "sentence":
         for seg in whisper_segments:
-            final_segments.append({
+            yield _with_words({
                 "start_time": seg["start"],
                 "end_time": seg["end"],
                 "text": seg["text"].strip(),
                 "type": "sentence"
-            })
+            }, seg.get("words"))
 
     elif segmentation_type == "paragraph":
         current_paragraph = ""
-        para_start_time = whisper_segments[0]["start"] if whisper_segments else 0
+        para_start_time = None
+        para_end_time = None
+        para_words = []
+        previous = None
+        is_paragraph_break = _ParagraphBreaks(speech_regions)
 
-        for i, seg in enumerate(whisper_segments):
-            current_paragraph += seg["text"]
-            
-            is_last_segment = (i == len(whisper_segments) - 1)
-            pause_duration = 0
-            if not is_last_segment:
-                pause_duration = whisper_segments[i+1]["start"] - seg["end"]
-
-            if pause_duration > 2.0 or is_last_segment:
-                final_segments.append({
+        for seg in whisper_segments:
+            # Pause > 2s zum vorherigen Segment beendet den Absatz
+            if previous is not None and is_paragraph_break(previous, seg):
+                yield _with_words({
                     "start_time": para_start_time,
-                    "end_time": seg["end"],
+                    "end_time": para_end_time,
                     "text": current_paragraph.strip(),
                     "type": "paragraph"
-                })
+                }, para_words)
                 current_paragraph = ""
-                if not is_last_segment:
-                    para_start_time = whisper_segments[i+1]["start"]
+                para_start_time = None
+                para_words = []
+
+            if para_start_time is None:
+                para_start_time = seg["start"]
+            current_paragraph += seg["text"]
+            para_end_time = seg["end"]
+            para_words.extend(seg.get("words") or [])
+            previous = seg
+
+        if para_end_time is not None:
+            yield _with_words({
+                "start_time": para_start_time,
+                "end_time": para_end_time,
+                "text": current_paragraph.strip(),
+                "type": "paragraph"
+            }, para_words)
 
     elif segmentation_type == "time":
-        audio = AudioSegment.from_wav(wav_path)
-        duration_ms = len(audio)
-        segment_length_ms = 30 * 1000
-        for i in range(0, duration_ms, segment_length_ms):
-            start_ms = i
-            end_ms = min(i + segment_length_ms, duration_ms)
-            
-            segment_text = "".join([s['text'] for s in whisper_segments if s['start'] < end_ms / 1000 and s['end'] > start_ms / 1000])
-
-            final_segments.append({
-                "start_time": start_ms / 1000.0,
-                "end_time": end_ms / 1000.0,
-                "text": segment_text.strip(),
-                "type": "time"
-            })
-
-    return final_segments
\ No newline at end of file
+        for window in iter_time_windows(whisper_segments, get_duration(wav_path), window_seconds, overlap_seconds):
+            yield window
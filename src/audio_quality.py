@@ -0,0 +1,100 @@
+import numpy as np
+
+# 32ms-Rahmen bei 16kHz
+FRAME_LENGTH = 512
+# Rahmen pro Block: begrenzt den Speicherbedarf unabhängig von der Dateilänge (~16s bei 16kHz)
+FRAMES_PER_BLOCK = 500
+# Histogramm der Rahmenenergie in 0,5-dB-Schritten für die Perzentile
+_DB_BINS = np.arange(-120.0, 0.5, 0.5)
+_CLIP_LEVEL = 32767
+
+
+class QualityAnalyzer:
+    """Berechnet Qualitätsmetriken in einem Durchlauf über Blöcke von int16-Samples.
+
+    Pro Rahmen werden RMS, Nulldurchgangsrate, spektraler Schwerpunkt und
+    Übersteuerung vektorisiert bestimmt. Für die SNR-Schätzung wird nur ein
+    Histogramm der Rahmenenergie gehalten, sodass der Speicherbedarf auch bei
+    stundenlangen Aufnahmen konstant bleibt: der Rauschboden ist das 10., der
+    Sprachpegel das 90. Perzentil der Rahmenenergie.
+    """
+
+    def __init__(self, sample_rate, frame_length=FRAME_LENGTH):
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self._window = np.hanning(frame_length).astype(np.float32)
+        self._freqs = np.fft.rfftfreq(frame_length, d=1.0 / sample_rate).astype(np.float32)
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._histogram = np.zeros(len(_DB_BINS) - 1, dtype=np.int64)
+        self.n_samples = 0
+        self.n_frames = 0
+        self._clipped = 0
+        self._sum_squares = 0.0
+        self._zcr_sum = 0.0
+        self._centroid_sum = 0.0
+        self._centroid_frames = 0
+
+    def update(self, samples):
+        """Verarbeitet den nächsten Block; unvollständige Rahmen werden mit dem Folgeblock verbunden."""
+        samples = np.asarray(samples, dtype=np.int16)
+        self.n_samples += len(samples)
+        self._clipped += int(np.count_nonzero((samples >= _CLIP_LEVEL) | (samples <= -_CLIP_LEVEL)))
+        if len(self._remainder):
+            samples = np.concatenate([self._remainder, samples])
+
+        block = self.frame_length * FRAMES_PER_BLOCK
+        usable = len(samples) - len(samples) % self.frame_length
+        for start in range(0, usable, block):
+            self._analyze_frames(samples[start:min(start + block, usable)])
+        self._remainder = samples[usable:].copy()
+
+    def _analyze_frames(self, samples):
+        frames = samples.reshape(-1, self.frame_length).astype(np.float32) / 32768.0
+        self.n_frames += len(frames)
+
+        energy = np.mean(frames ** 2, axis=1)
+        self._sum_squares += float(energy.sum()) * self.frame_length
+        rms_db = 10 * np.log10(np.maximum(energy, 1e-12))
+        self._histogram += np.histogram(np.clip(rms_db, _DB_BINS[0], _DB_BINS[-1]), bins=_DB_BINS)[0]
+
+        signs = np.signbit(frames)
+        self._zcr_sum += float(np.mean(signs[:, 1:] != signs[:, :-1], axis=1).sum())
+
+        magnitude = np.abs(np.fft.rfft(frames * self._window, axis=1))
+        total = magnitude.sum(axis=1)
+        voiced = total > 1e-6
+        if np.any(voiced):
+            centroids = (magnitude[voiced] @ self._freqs) / total[voiced]
+            self._centroid_sum += float(centroids.sum())
+            self._centroid_frames += int(voiced.sum())
+
+    def _percentile_db(self, q):
+        counts = np.cumsum(self._histogram)
+        if counts[-1] == 0:
+            return _DB_BINS[0]
+        index = int(np.searchsorted(counts, q / 100.0 * counts[-1]))
+        return float(_DB_BINS[min(index, len(_DB_BINS) - 2)])
+
+    def finish(self):
+        """Gibt die Metriken zurück (der Rest unter einer Rahmenlänge fließt nur in RMS/Clipping ein)."""
+        noise_floor_db = self._percentile_db(10)
+        speech_level_db = self._percentile_db(90)
+        rms = np.sqrt(self._sum_squares / max(1, self.n_frames * self.frame_length))
+        return {
+            "duration": self.n_samples / float(self.sample_rate),
+            "rms_db": float(20 * np.log10(max(rms, 1e-6))),
+            "noise_floor_db": noise_floor_db,
+            "speech_level_db": speech_level_db,
+            "snr": max(0.0, speech_level_db - noise_floor_db) if self.n_frames else 0.0,
+            "clipping_ratio": self._clipped / float(max(1, self.n_samples)),
+            "zero_crossing_rate": self._zcr_sum / max(1, self.n_frames),
+            "spectral_centroid": self._centroid_sum / max(1, self._centroid_frames),
+        }
+
+
+def analyze_quality(blocks, sample_rate):
+    """Analysiert eine Folge von int16-Blöcken in einem Durchlauf."""
+    analyzer = QualityAnalyzer(sample_rate)
+    for block in blocks:
+        analyzer.update(block)
+    return analyzer.finish()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+def default_manifest_path():
+    """Pfad des gemeinsamen Manifests im Benutzerverzeichnis (neben dem Transkriptions-Cache)."""
+    return os.path.join(os.path.expanduser("~"), ".cache", "whatsapp_voice_processor", "batch_manifest.db")
+
+
+def file_key(file_path, segmentation_type, fingerprint=""):
+    """Schlüssel einer Eingabedatei: Hash des Inhalts plus Segmentierungsart und Einstellungen.
+
+    fingerprint ist der Fingerabdruck der Verarbeitungseinstellungen
+    (PipelineConfig.fingerprint). Umbenannte oder verschobene Dateien werden so
+    wiedererkannt, geänderte Dateien, eine andere Segmentierung oder andere
+    Einstellungen (Backend, Modell, Format, ...) dagegen neu verarbeitet.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    digest.update(segmentation_type.encode("utf-8"))
+    digest.update(fingerprint.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _is_within(path, directory):
+    path, directory = os.path.realpath(path), os.path.realpath(directory)
+    try:
+        return os.path.commonpath([path, directory]) == directory
+    except ValueError:
+        # Verschiedene Laufwerke (Windows)
+        return False
+
+
+class BatchManifest:
+    """Fortschrittsprotokoll eines Stapellaufs (SQLite), damit abgebrochene Läufe fortgesetzt werden können.
+
+    Pro Eingabedatei werden die zuletzt abgeschlossene Stufe, die Zwischenergebnisse
+    (Qualitätsbewertung, Transkription, Segmente), das Endergebnis mit den
+    Ausgabepfaden und die Dauer jeder Stufe gespeichert. Die Instanz enthält nur
+    den Pfad und kann daher an Worker-Prozesse übergeben werden.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "key TEXT PRIMARY KEY, path TEXT, stage TEXT, data TEXT, timings TEXT, updated REAL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Eine Verbindung pro Zugriff, damit Threads und Worker-Prozesse das Manifest teilen können
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Gibt den Eintrag (path, stage, data, timings) zurück oder None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, stage, data, timings FROM files WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"path": row[0], "stage": row[1], "data": json.loads(row[2]), "timings": json.loads(row[3])}
+
+    def record(self, key, file_path, stage, seconds=None, **data):
+        """Vermerkt eine abgeschlossene Stufe samt Dauer und Zwischenergebnissen."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT data, timings FROM files WHERE key = ?", (key,)).fetchone()
+            stored, timings = (json.loads(row[0]), json.loads(row[1])) if row else ({}, {})
+            stored.update(data)
+            if seconds is not None:
+                timings[stage] = round(seconds, 3)
+            conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (key, file_path, stage, json.dumps(stored, ensure_ascii=False, default=float),
+                 json.dumps(timings), time.time())
+            )
+
+    def resume_state(self, key):
+        """Zwischenergebnisse eines früheren Laufs, mit denen die Verarbeitung fortgesetzt werden kann."""
+        entry = self.get(key)
+        return entry["data"] if entry else {}
+
+    def completed_result(self, key, output_root=None):
+        """Ergebnis einer bereits vollständig verarbeiteten Datei, sofern ihre Ausgaben noch existieren.
+
+        Mit output_root zählt das Ergebnis nur, wenn es in diesem Ordner liegt; sonst
+        würde ein Lauf Ausgaben an fremder Stelle (z. B. in einem Web-Job) zurückgeben.
+        """
+        entry = self.get(key)
+        if entry is None or entry["stage"] != "exported":
+            return None
+        result = entry["data"].get("result")
+        if not result or not os.path.exists(result.get("csv_path", "")):
+            return None
+        if output_root is not None and not _is_within(result.get("result_dir", ""), output_root):
+            return None
+        return result
+
+    def stats(self):
+        """Anzahl der Dateien pro erreichter Stufe."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT stage, COUNT(*) FROM files GROUP BY stage").fetchall())
+
+
+if __name__ == "__main__":
+    # Verwendung: python batch_manifest.py [manifest.db]
+    print(json.dumps(BatchManifest(sys.argv[1] if len(sys.argv) > 1 else default_manifest_path()).stats(), indent=2))
@@ -0,0 +1,501 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from . import audio_processor
+    from .batch_manifest import BatchManifest, file_key
+    from .dataset_manifest import DatasetManifest
+    from .transcription_backends import default_worker_count
+except ImportError:
+    import audio_processor
+    from batch_manifest import BatchManifest, file_key
+    from dataset_manifest import DatasetManifest
+    from transcription_backends import default_worker_count
+
+# Ab dieser Dauer wird fensterweise transkribiert und Zwischenergebnisse werden gemeldet
+STREAM_MIN_SECONDS = 120.0
+
+
+def _init_worker(config):
+    """Initialisiert einen Worker-Prozess mit der PipelineConfig des BatchProcessors.
+
+    Das Modell wird erst beim ersten Cache-Fehlschlag geladen und danach vom
+    Worker für alle weiteren Dateien wiederverwendet.
+    """
+    config.apply()
+
+
+def _notify(on_stage, stage, **info):
+    if on_stage is not None:
+        on_stage(stage, **info)
+
+
+class _StageTracker:
+    """Meldet Stufen an on_stage und vermerkt abgeschlossene Stufen samt Dauer im Manifest."""
+
+    def __init__(self, file_path, on_stage=None, manifest=None, key=None):
+        self.file_path = file_path
+        self.on_stage = on_stage
+        self.manifest = manifest
+        self.key = key
+        self._last = time.perf_counter()
+
+    def __call__(self, stage, data=None, **info):
+        now = time.perf_counter()
+        seconds, self._last = now - self._last, now
+        if self.manifest is not None and data is not None:
+            self.manifest.record(self.key, self.file_path, stage, seconds, **data)
+        _notify(self.on_stage, stage, **info)
+
+
+def _warm_up_worker():
+    """Lädt Bibliotheken und Modell in einem Worker-Prozess vor."""
+    return os.getpid(), audio_processor.warm_up()
+
+
+def _prepare_file(file_path, on_stage=None, manifest=None, key=None, export_sample_rate=None):
+    """Stufe 1: Dekodierung und Qualitätsbewertung (läuft im Hauptprozess vor).
+
+    Die Datei wird genau einmal dekodiert; der AudioBuffer wird an den Worker
+    weitergereicht, eine temporäre WAV-Datei ist nicht nötig. Verlangt der Export
+    eine höhere Abtastrate (export_sample_rate, Standard: EXPORT_CONFIG), entsteht
+    im selben Durchlauf die Exportfassung. Mit einem Manifest werden die
+    Zwischenergebnisse eines früheren Laufs übernommen.
+    """
+    if export_sample_rate is None:
+        export_sample_rate = audio_processor.EXPORT_CONFIG["sample_rate"]
+    resume = manifest.resume_state(key) if manifest is not None else {}
+    stages = _StageTracker(file_path, on_stage, manifest, key)
+    stages("decoding")
+    audio = audio_processor.load_audio(file_path, export_sample_rate)
+    stages("decoded", duration=audio.duration)
+    quality_assessment = resume.get("quality_assessment")
+    if quality_assessment is None:
+        quality_assessment = audio_processor.assess_audio_quality(audio)
+        stages("quality_assessed", {"quality_assessment": quality_assessment},
+               quality_score=quality_assessment.get("quality_score"))
+    else:
+        stages("quality_assessed", quality_score=quality_assessment.get("quality_score"), resumed=True)
+    return {
+        "file_path": file_path,
+        "audio": audio,
+        "quality_assessment": quality_assessment,
+        "manifest": manifest,
+        "manifest_key": key,
+        "resume": resume,
+    }
+
+
+def _stream_and_save(file_path, audio, segmentation_type, error_list, output_root, on_segment):
+    """Streaming-Variante für lange Aufnahmen: Segmente laufen direkt bis in die CSV durch."""
+    whisper_segments = []
+    segments = []
+    # Wächst mit jedem Fenster, damit der Absatzmodus schon im Strom an VAD-Pausen trennt
+    speech_regions = [] if audio_processor.TRANSCRIPTION_CONFIG["vad"] else None
+
+    def whisper_stream():
+        for seg in audio_processor.transcribe_audio_stream(audio, speech_regions=speech_regions):
+            whisper_segments.append(seg)
+            if on_segment is not None:
+                on_segment(seg)
+            yield seg
+
+    def segment_stream():
+        for seg in audio_processor.iter_segments_intelligent(audio, whisper_stream(), segmentation_type,
+                                                             speech_regions):
+            segments.append(seg)
+            yield seg
+
+    result_dir, csv_path = audio_processor.save_segments_and_csv(
+        original_filename=file_path,
+        wav_path=audio,
+        segments=segment_stream(),
+        error_list=error_list,
+        output_root=output_root
+    )
+    transcription_result = {
+        "text": "".join(seg["text"] for seg in whisper_segments),
+        "language": whisper_segments[0]["language"] if whisper_segments else None,
+        "segments": whisper_segments
+    }
+    if speech_regions is not None:
+        transcription_result["speech_regions"] = speech_regions
+    return transcription_result, segments, result_dir, csv_path
+
+
+def _segment_summary(segment):
+    summary = {
+        "start_time": segment["start_time"],
+        "end_time": segment["end_time"],
+        "text": segment["text"],
+        "type": segment["type"]
+    }
+    if segment.get("words"):
+        summary["words"] = segment["words"]
+    return summary
+
+
+def _finish_file(prepared, segmentation_type, output_root, progress_queue=None, on_stage=None):
+    """Stufe 2: Transkription, Segmentierung und Export (läuft im Worker-Prozess).
+
+    Zwischenergebnisse langer Aufnahmen gehen an progress_queue (Prozess-Pool)
+    bzw. als Stufe "segment" an on_stage (im selben Prozess). Liegen aus einem
+    früheren Lauf Transkription oder Segmente vor, wird dort fortgesetzt; eine im
+    Batch-Modus vorab erstellte Transkription steht unter prepared["transcription"].
+    """
+    file_path = prepared["file_path"]
+    audio = prepared["audio"]
+    quality_assessment = prepared["quality_assessment"]
+    resume = prepared.get("resume") or {}
+    error_list = quality_assessment.get("issues", [])
+    output_root = _output_root(file_path, output_root)
+    stages = _StageTracker(file_path, on_stage, prepared.get("manifest"), prepared.get("manifest_key"))
+
+    transcription_result = resume.get("transcription")
+    batched = prepared.get("transcription")
+    segments = resume.get("segments")
+    stages("transcribing")
+    if transcription_result is None and batched is None and audio.duration >= STREAM_MIN_SECONDS:
+        def on_segment(seg):
+            if progress_queue is not None:
+                progress_queue.put((os.path.basename(file_path), seg["start"], seg["end"], seg["text"].strip()))
+            _notify(on_stage, "segment", start=seg["start"], end=seg["end"], text=seg["text"].strip())
+
+        transcription_result, segments, result_dir, csv_path = _stream_and_save(
+            file_path, audio, segmentation_type, error_list, output_root, on_segment
+        )
+        stages("transcribed", {"transcription": transcription_result}, language=transcription_result["language"])
+        stages("segmented", {"segments": segments}, segments=len(segments))
+    else:
+        if transcription_result is None:
+            # Ist die Datei im Batch fehlgeschlagen, wird sie einzeln wiederholt
+            transcription_result = batched or audio_processor.transcribe_audio(audio)
+            if transcription_result is None:
+                raise Exception("Transkription fehlgeschlagen")
+            stages("transcribed", {"transcription": transcription_result}, language=transcription_result["language"])
+        else:
+            stages("transcribed", language=transcription_result["language"], resumed=True)
+        if segments is None:
+            segments = audio_processor.segment_audio_intelligent(audio, transcription_result, segmentation_type)
+            stages("segmented", {"segments": segments}, segments=len(segments))
+        else:
+            stages("segmented", segments=len(segments), resumed=True)
+
+        result_dir, csv_path = audio_processor.save_segments_and_csv(
+            original_filename=file_path,
+            wav_path=audio,
+            segments=segments,
+            error_list=error_list,
+            output_root=output_root
+        )
+
+    result = {
+        "original_filename": os.path.basename(file_path),
+        "status": "success",
+        "quality_assessment": quality_assessment,
+        "transcription": transcription_result,
+        "segments": [_segment_summary(s) for s in segments],
+        "result_dir": result_dir,
+        "csv_path": csv_path,
+        "packed": audio_processor.EXPORT_CONFIG["packed"],
+        "segment_format": audio_processor.EXPORT_CONFIG["format"]
+    }
+    stages("exported", {"result": result}, csv_path=csv_path)
+    return result
+
+
+def _output_root(file_path, output_root):
+    # Ohne Angabe landen die Ergebnisse neben der Eingabedatei
+    return output_root or os.path.dirname(os.path.abspath(file_path))
+
+
+def _finish_batch(batch, segmentation_type, output_root, progress_queue=None):
+    """Stufe 2 für mehrere Dateien: gemeinsame Transkription, danach Segmentierung und Export je Datei.
+
+    Gibt pro Datei das Ergebnis oder ein Fehlerergebnis zurück.
+    """
+    transcriptions = audio_processor.transcribe_audio_batch([prepared["audio"] for prepared in batch])
+    results = []
+    for prepared, transcription in zip(batch, transcriptions):
+        try:
+            results.append(_finish_file(dict(prepared, transcription=transcription), segmentation_type, output_root,
+                                        progress_queue))
+        except Exception as e:
+            results.append(_error_result(prepared["file_path"], e))
+    return results
+
+
+def _open_manifest(manifest):
+    if manifest is None or isinstance(manifest, BatchManifest):
+        return manifest
+    return BatchManifest(manifest)
+
+
+def process_file(file_path, segmentation_type="sentence", output_root=None, on_stage=None, manifest=None):
+    """Verarbeitet eine Datei vollständig im aktuellen Prozess.
+
+    on_stage(stage, **info) wird nach jeder Stufe aufgerufen (decoded,
+    quality_assessed, transcribed, segmented, exported, bei langen Aufnahmen
+    zusätzlich "segment" pro Zwischenergebnis). Löst der Callback eine Ausnahme
+    aus, wird die Verarbeitung an dieser Stelle abgebrochen.
+
+    Mit einem Manifest (BatchManifest oder Pfad) werden bereits fertige Dateien
+    übersprungen und abgebrochene ab der letzten abgeschlossenen Stufe fortgesetzt.
+    Übersprungen wird nur bei gleichen Einstellungen (PipelineConfig.fingerprint)
+    und wenn das frühere Ergebnis unter output_root liegt.
+    """
+    manifest = _open_manifest(manifest)
+    key = None
+    if manifest is not None:
+        key = file_key(file_path, segmentation_type, audio_processor.PipelineConfig().fingerprint())
+        completed = manifest.completed_result(key, _output_root(file_path, output_root))
+        if completed is not None:
+            _notify(on_stage, "skipped", csv_path=completed["csv_path"])
+            return dict(completed, skipped=True)
+    prepared = _prepare_file(file_path, on_stage, manifest, key)
+    return _finish_file(prepared, segmentation_type, output_root, on_stage=on_stage)
+
+
+def _error_result(file_path, error):
+    return {
+        "original_filename": os.path.basename(file_path),
+        "status": "error",
+        "error": str(error)
+    }
+
+
+class BatchProcessor:
+    """Verarbeitet viele Audiodateien parallel.
+
+    Dekodierung und Qualitätsbewertung laufen in einem Thread-Pool im
+    Hauptprozess vor, Transkription, Segmentierung und Export in einem
+    Prozess-Pool, dessen Worker das Whisper-Modell jeweils einmal laden.
+    So überlappt die Vorbereitung von Datei N+1 mit der Transkription von
+    Datei N. Ergebnisse werden in der Reihenfolge geliefert, in der sie
+    fertig werden; bei langen Aufnahmen meldet on_progress(name, start, end, text)
+    jedes transkribierte Segment schon während der Verarbeitung.
+
+    Mit dataset_manifest (Pfad auf .parquet oder .jsonl) werden die Segmente
+    aller Dateien eines Laufs zusätzlich in eine Datensatzdatei geschrieben,
+    mit packed=True landen die Segmente jeder Datei in einem Paket (segment_pack),
+    segment_format ("wav", "flac", "opus") wählt das Format der Segmentdateien und
+    export_sample_rate (Hz oder "source") ihre Abtastrate.
+
+    Die Einstellungen der Verarbeitungskette werden als PipelineConfig (self.config)
+    an die Worker übergeben.
+
+    Mit batch_size > 1 (Batch-Modus) sammelt der Hauptprozess vorbereitete Dateien
+    und gibt sie gruppenweise an einen Worker, der sie mit einem Aufruf von
+    backend.transcribe_batch() transkribiert (openai-whisper dekodiert die Fenster
+    aller Dateien gemeinsam). Lange Aufnahmen und fortgesetzte Dateien laufen weiter
+    einzeln, damit ihre Zwischenergebnisse gemeldet werden.
+    """
+
+    def __init__(self, segmentation_type="sentence", workers=None, prefetch=None, output_root=None, on_progress=None,
+                 backend=None, model_size=None, threads=None, vad=None, manifest=None, word_timestamps=None,
+                 dataset_manifest=None, packed=None, segment_format=None, export_sample_rate=None, batch_size=None):
+        self.segmentation_type = segmentation_type
+        # Dateien pro gemeinsamer Transkription im Batch-Modus (None/1 = jede Datei einzeln)
+        self.batch_size = batch_size or 1
+        # Optionales Manifest (BatchManifest oder Pfad) zum Überspringen/Fortsetzen früherer Läufe
+        self.manifest = _open_manifest(manifest)
+        self.dataset_manifest = dataset_manifest
+        self.on_progress = on_progress
+        self.workers = workers or default_worker_count()
+        # Anzahl der Dateien, die vorab dekodiert werden dürfen
+        self.prefetch = prefetch or self.workers
+        self.output_root = output_root
+        # Threads pro Worker für das Backend, standardmäßig die Kerne gleichmäßig aufgeteilt
+        self.threads = threads or max(1, (os.cpu_count() or 1) // self.workers)
+        memory_limit = audio_processor.get_memory_limit()
+        # Dieselbe Begrenzung gilt für die Threads der FLAC/Opus-Kodierung; die Speichergrenze
+        # des Hauptprozesses gilt auch in den Workern
+        self.config = audio_processor.PipelineConfig(
+            backend=backend, model_size=model_size, threads=self.threads, vad=vad, word_timestamps=word_timestamps,
+            packed=packed, segment_format=segment_format, encode_workers=self.threads,
+            export_sample_rate=export_sample_rate,
+            memory_limit_mb=memory_limit / (1024 * 1024) if memory_limit is not None else None)
+        self._pool = None
+
+    def _create_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.config,))
+        # Beim ersten submit() forkt der Pool alle Worker. Das muss passieren, bevor Threads
+        # Dateien dekodieren: ein Worker, der mitten in einem subprocess-Start (ffmpeg über
+        # pydub) geforkt wird, erbt dessen Fehler-Pipe, und der Start wartet dann ewig.
+        pool.submit(os.getpid).result()
+        return pool
+
+    def _export_sample_rate(self):
+        # Die Exportfassung entsteht beim Dekodieren im Hauptprozess
+        if self.config.export_sample_rate is not None:
+            return self.config.export_sample_rate
+        return audio_processor.EXPORT_CONFIG["sample_rate"]
+
+    def start(self):
+        """Startet den Prozess-Pool vorab und lädt in jedem Worker Bibliotheken und Modell.
+
+        Gibt die Futures der Vorbereitung zurück (Ergebnis: (pid, Dauer pro Schritt)).
+        Der Pool bleibt bis close() bestehen und wird von iter_results() wiederverwendet.
+        """
+        if self._pool is None:
+            self._pool = self._create_pool()
+        return [self._pool.submit(_warm_up_worker) for _ in range(self.workers)]
+
+    def close(self):
+        """Beendet einen mit start() gestarteten Prozess-Pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _prepare_or_skip(self, file_path):
+        export_sample_rate = self._export_sample_rate()
+        if self.manifest is None:
+            return _prepare_file(file_path, export_sample_rate=export_sample_rate)
+        key = file_key(file_path, self.segmentation_type, self.config.fingerprint())
+        completed = self.manifest.completed_result(key, _output_root(file_path, self.output_root))
+        if completed is not None:
+            return {"completed": dict(completed, skipped=True)}
+        return _prepare_file(file_path, manifest=self.manifest, key=key, export_sample_rate=export_sample_rate)
+
+    def iter_results(self, files):
+        """Verarbeitet die Dateien und liefert jedes Ergebnis, sobald es fertig ist.
+
+        Mit Manifest werden bereits fertige Dateien sofort (mit "skipped": True)
+        geliefert und abgebrochene ab der letzten abgeschlossenen Stufe fortgesetzt.
+        Übersprungene Dateien landen trotzdem im Datensatz-Manifest, das so immer
+        den ganzen Lauf enthält.
+        """
+        files = list(files)
+        if not files:
+            return
+        dataset = DatasetManifest(self.dataset_manifest) if self.dataset_manifest else None
+
+        done = queue.Queue()
+        # Begrenzt, wie viele dekodierte Puffer gleichzeitig im Speicher liegen; im Batch-Modus
+        # muss jeder Worker einen ganzen Batch halten können
+        slots = threading.BoundedSemaphore(self.workers * self.batch_size + self.prefetch)
+        batch_lock = threading.Lock()
+        batch = []
+        unprepared = [len(files)]
+
+        def finish(result):
+            slots.release()
+            done.put(result)
+
+        progress_queue = None
+        if self.on_progress:
+            # Manager-Queue, da die Zwischenergebnisse aus den Worker-Prozessen kommen
+            manager = multiprocessing.Manager()
+            progress_queue = manager.Queue()
+
+            def forward_progress():
+                for event in iter(progress_queue.get, None):
+                    self.on_progress(*event)
+
+            progress_thread = threading.Thread(target=forward_progress, daemon=True)
+            progress_thread.start()
+
+        # Ein mit start() vorgewärmter Pool wird weiterverwendet, sonst ein eigener für diesen Lauf
+        pool = self._pool or self._create_pool()
+        with ThreadPoolExecutor(max_workers=self.prefetch) as prepare_pool:
+
+            def on_finished(future, file_path):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = _error_result(file_path, e)
+                finish(result)
+
+            def on_batch_finished(future, file_paths):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [_error_result(file_path, e) for file_path in file_paths]
+                for result in results:
+                    finish(result)
+
+            def submit_batch(ready):
+                file_paths = [prepared["file_path"] for prepared in ready]
+                try:
+                    job = pool.submit(_finish_batch, ready, self.segmentation_type, self.output_root, progress_queue)
+                except Exception as e:
+                    for file_path in file_paths:
+                        finish(_error_result(file_path, e))
+                    return
+                job.add_done_callback(lambda f: on_batch_finished(f, file_paths))
+
+            def collect(prepared):
+                # Batch abschicken, sobald er voll ist oder keine Datei mehr vorbereitet wird
+                with batch_lock:
+                    unprepared[0] -= 1
+                    if prepared is not None:
+                        batch.append(prepared)
+                    if len(batch) < self.batch_size and unprepared[0] > 0 or not batch:
+                        return
+                    ready = batch[:]
+                    del batch[:]
+                submit_batch(ready)
+
+            def batchable(prepared):
+                return (self.batch_size > 1 and prepared["audio"].duration < STREAM_MIN_SECONDS
+                        and not prepared["resume"].get("transcription"))
+
+            def on_prepared(future, file_path):
+                try:
+                    prepared = future.result()
+                    if "completed" in prepared:
+                        finish(prepared["completed"])
+                        collect(None)
+                        return
+                    if batchable(prepared):
+                        collect(prepared)
+                        return
+                    job = pool.submit(_finish_file, prepared, self.segmentation_type, self.output_root, progress_queue)
+                except Exception as e:
+                    finish(_error_result(file_path, e))
+                    collect(None)
+                    return
+                collect(None)
+                job.add_done_callback(lambda f: on_finished(f, file_path))
+
+            def feed():
+                for file_path in files:
+                    slots.acquire()
+                    future = prepare_pool.submit(self._prepare_or_skip, file_path)
+                    future.add_done_callback(lambda f, p=file_path: on_prepared(f, p))
+
+            threading.Thread(target=feed, daemon=True).start()
+            try:
+                for _ in range(len(files)):
+                    result = done.get()
+                    if dataset is not None:
+                        dataset.add_result(result)
+                    yield result
+            finally:
+                if dataset is not None:
+                    dataset.close()
+                if pool is not self._pool:
+                    pool.shutdown()
+                if progress_queue is not None:
+                    progress_queue.put(None)
+                    progress_thread.join()
+                    manager.shutdown()
+
+    def run(self, files, on_result=None):
+        """Verarbeitet alle Dateien und gibt die Ergebnisliste zurück."""
+        all_results = []
+        for result in self.iter_results(files):
+            all_results.append(result)
+            if on_result:
+                on_result(result)
+        return all_results
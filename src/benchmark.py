@@ -0,0 +1,284 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+try:
+    from . import audio_processor
+except ImportError:
+    import audio_processor
+
+# Länge der Testaufnahmen in Sekunden (kurze, mittlere und lange Sprachnachricht)
+CORPUS_SIZES = {"short": 15, "medium": 120, "long": 900}
+CORPUS_FORMATS = ["wav", "opus", "m4a"]
+STAGES = ["convert", "assess", "transcribe", "segment", "export"]
+# Eine Stufe gilt als langsamer, wenn sie mehr als 20% und mindestens MIN_REGRESSION_SECONDS länger braucht
+REGRESSION_TOLERANCE = 0.2
+MIN_REGRESSION_SECONDS = 0.05
+# Abtastrate der erzeugten Aufnahmen (wie WhatsApp-Opus)
+CORPUS_SAMPLE_RATE = 48000
+
+
+def synthesize_note(seconds, sample_rate=CORPUS_SAMPLE_RATE, seed=0):
+    """Erzeugt eine sprachähnliche Aufnahme: Silben aus Obertönen mit Pausen über leisem Rauschen.
+
+    Mit festem seed ist das Signal reproduzierbar, sodass Läufe vergleichbar bleiben.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(seconds * sample_rate)
+    audio = rng.standard_normal(n).astype(np.float32) * 0.002
+    position = 0
+    while position < n:
+        # Silbe 80-300ms, danach kurze Pause bzw. alle paar Sekunden eine Sprechpause
+        length = int(rng.uniform(0.08, 0.3) * sample_rate)
+        end = min(n, position + length)
+        t = np.arange(end - position) / sample_rate
+        pitch = rng.uniform(100, 220)
+        syllable = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 5))
+        audio[position:end] += (syllable * np.hanning(end - position) * 0.2).astype(np.float32)
+        position = end + int(rng.uniform(0.03, 0.12) * sample_rate)
+        if rng.random() < 0.05:
+            position += int(rng.uniform(0.5, 2.0) * sample_rate)
+    return np.clip(audio, -1.0, 1.0)
+
+
+def _write_note(path, audio, sample_rate):
+    fmt = os.path.splitext(path)[1][1:].lower()
+    if fmt == "m4a":
+        from pydub import AudioSegment
+        pcm = (audio * 32767).astype("<i2").tobytes()
+        AudioSegment(pcm, frame_rate=sample_rate, sample_width=2, channels=1).export(path, format="ipod", codec="aac")
+        return
+    import soundfile as sf
+    if fmt == "opus":
+        # Opus nur mit 48kHz im OGG-Container
+        sf.write(path, audio, sample_rate, format="OGG", subtype="OPUS")
+    else:
+        sf.write(path, audio, sample_rate, subtype="PCM_16")
+
+
+def build_corpus(corpus_dir, sizes=None, formats=None):
+    """Legt den Testkorpus an (bereits vorhandene Dateien werden wiederverwendet).
+
+    Gibt die erzeugten Pfade zurück; Formate, die hier nicht kodiert werden können
+    (z. B. M4A ohne ffmpeg), werden mit einer Meldung übersprungen.
+    """
+    sizes = sizes or list(CORPUS_SIZES)
+    formats = formats or CORPUS_FORMATS
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = []
+    for size in sizes:
+        audio = None
+        for fmt in formats:
+            path = os.path.join(corpus_dir, f"{size}.{'ogg' if fmt == 'opus' else fmt}")
+            if not os.path.exists(path):
+                if audio is None:
+                    audio = synthesize_note(CORPUS_SIZES[size], seed=CORPUS_SIZES[size])
+                try:
+                    _write_note(path, audio, CORPUS_SAMPLE_RATE)
+                except Exception as e:
+                    print(f"Überspringe {os.path.basename(path)}: {e}")
+                    if os.path.exists(path):
+                        os.remove(path)
+                    continue
+            paths.append(path)
+    return paths
+
+
+def peak_rss_mb():
+    """Höchster Speicherverbrauch des Prozesses in MB (None, wenn nicht ermittelbar)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux meldet KB, macOS Bytes
+    return round(peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0, 1)
+
+
+def _reset_peak_rss():
+    """Setzt den Spitzenwert unter Linux zurück, damit er pro Datei gemessen wird."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _current_peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def fake_transcription(duration, segment_seconds=4.0):
+    """Whisper-ähnliches Ergebnis ohne Modell, um die übrigen Stufen allein zu messen."""
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + segment_seconds)
+        segments.append({"id": len(segments), "start": start, "end": end, "text": f" Satz {len(segments) + 1}."})
+        start = end
+    return {"text": "".join(seg["text"] for seg in segments), "language": "de", "segments": segments}
+
+
+def benchmark_file(file_path, output_root, transcribe=True, segmentation_type="sentence"):
+    """Misst die Stufen einer Datei einzeln und gibt Dauer, Echtzeitfaktor und Speicher zurück."""
+    _reset_peak_rss()
+    timings = {}
+
+    started = time.perf_counter()
+    audio = audio_processor.load_audio(file_path)
+    timings["convert"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    audio_processor.assess_audio_quality(audio)
+    timings["assess"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if transcribe:
+        # Ohne Cache, sonst würde ab dem zweiten Lauf nur der Cache gemessen
+        transcription = audio_processor.transcribe_audio(audio, use_cache=False)
+        if transcription is None:
+            raise RuntimeError(f"Transkription fehlgeschlagen: {file_path}")
+    else:
+        transcription = fake_transcription(audio.duration)
+    timings["transcribe"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    segments = audio_processor.segment_audio_intelligent(audio, transcription, segmentation_type)
+    timings["segment"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    audio_processor.save_segments_and_csv(file_path, audio, segments, output_root=output_root)
+    timings["export"] = time.perf_counter() - started
+
+    total = sum(timings.values())
+    return {
+        "file": os.path.basename(file_path),
+        "audio_seconds": round(audio.duration, 3),
+        "segments": len(segments),
+        "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()},
+        "total_seconds": round(total, 4),
+        "real_time_factor": round(total / audio.duration, 5) if audio.duration else None,
+        "peak_rss_mb": _current_peak_rss_mb(),
+    }
+
+
+def run_benchmark(files, transcribe=True, segmentation_type="sentence", repeat=1):
+    """Führt den Benchmark für alle Dateien aus; bei repeat > 1 zählt der schnellste Lauf je Datei."""
+    results = []
+    started = time.perf_counter()
+    with tempfile.TemporaryDirectory() as output_root:
+        for file_path in files:
+            runs = [benchmark_file(file_path, output_root, transcribe, segmentation_type) for _ in range(repeat)]
+            results.append(min(runs, key=lambda run: run["total_seconds"]))
+    wall = time.perf_counter() - started
+
+    audio_seconds = sum(result["audio_seconds"] for result in results)
+    processing_seconds = sum(result["total_seconds"] for result in results)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "transcription": dict(audio_processor.TRANSCRIPTION_CONFIG) if transcribe else "fake",
+        },
+        "files": results,
+        "summary": {
+            "stages": {stage: round(sum(r["stages"][stage] for r in results), 4) for stage in STAGES},
+            "audio_seconds": round(audio_seconds, 3),
+            "processing_seconds": round(processing_seconds, 4),
+            "wall_seconds": round(wall, 4),
+            "real_time_factor": round(processing_seconds / audio_seconds, 5) if audio_seconds else None,
+            "throughput_audio_seconds_per_second": round(audio_seconds / processing_seconds, 2) if processing_seconds else None,
+            "peak_rss_mb": peak_rss_mb(),
+        },
+    }
+
+
+def compare_results(current, baseline, tolerance=REGRESSION_TOLERANCE, min_seconds=MIN_REGRESSION_SECONDS):
+    """Vergleicht zwei Benchmark-Ergebnisse und gibt die Regressionen als Textliste zurück.
+
+    Verglichen werden die Stufen jeder Datei, die in beiden Läufen vorkommt, sowie
+    der Spitzenspeicher pro Datei.
+    """
+    baseline_files = {result["file"]: result for result in baseline["files"]}
+    regressions = []
+    for result in current["files"]:
+        previous = baseline_files.get(result["file"])
+        if previous is None:
+            continue
+        for stage, seconds in result["stages"].items():
+            before = previous["stages"].get(stage)
+            if before is not None and seconds > before * (1 + tolerance) and seconds - before >= min_seconds:
+                regressions.append(f"{result['file']} {stage}: {before:.3f}s -> {seconds:.3f}s")
+        before_rss, rss = previous.get("peak_rss_mb"), result.get("peak_rss_mb")
+        if before_rss and rss and rss > before_rss * (1 + tolerance):
+            regressions.append(f"{result['file']} Speicher: {before_rss:.0f}MB -> {rss:.0f}MB")
+    return regressions
+
+
+def _print_report(results):
+    print(f"{'Datei':<14}{'Audio':>8}" + "".join(f"{stage:>11}" for stage in STAGES) + f"{'RTF':>9}{'RSS MB':>9}")
+    for result in results["files"]:
+        print(f"{result['file']:<14}{result['audio_seconds']:>7.0f}s"
+              + "".join(f"{result['stages'][stage]:>10.3f}s" for stage in STAGES)
+              + f"{result['real_time_factor']:>9.3f}{(result['peak_rss_mb'] or 0):>9.0f}")
+    summary = results["summary"]
+    print(f"Echtzeitfaktor {summary['real_time_factor']}, Durchsatz "
+          f"{summary['throughput_audio_seconds_per_second']} s Audio/s, Spitzenspeicher {summary['peak_rss_mb']} MB")
+
+
+def main(argv=None):
+    # Verwendung: python benchmark.py --output bench.json [--baseline vorher.json] [--fake-transcription]
+    parser = argparse.ArgumentParser(description="Benchmark der Audio-Pipeline mit Zeiten pro Stufe")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "whatsapp_voice_benchmark"))
+    parser.add_argument("--sizes", nargs="+", choices=list(CORPUS_SIZES), default=list(CORPUS_SIZES))
+    parser.add_argument("--formats", nargs="+", choices=CORPUS_FORMATS, default=CORPUS_FORMATS)
+    parser.add_argument("--files", nargs="+", help="Eigene Aufnahmen statt des erzeugten Korpus")
+    parser.add_argument("--segmentation-type", choices=["sentence", "paragraph", "time"], default="sentence")
+    parser.add_argument("--fake-transcription", action="store_true", help="Modell nicht laden, Segmente erfinden")
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--model-size", default=None)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="Ergebnis als JSON speichern")
+    parser.add_argument("--baseline", help="Früheres JSON-Ergebnis; bei Regressionen ist der Exit-Code 1")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.backend or args.model_size:
+        audio_processor.configure_transcription(backend=args.backend, model_size=args.model_size)
+    files = args.files or build_corpus(args.corpus_dir, args.sizes, args.formats)
+    if not args.fake_transcription:
+        # Modell vorab laden, damit die Ladezeit nicht in die erste Datei eingeht
+        audio_processor.warm_up()
+    results = run_benchmark(files, transcribe=not args.fake_transcription,
+                            segmentation_type=args.segmentation_type, repeat=args.repeat)
+    _print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import json
+import os
+
+try:
+    from .segment_pack import pack_reference, segment_filename
+except ImportError:
+    from segment_pack import pack_reference, segment_filename
+
+# Dateiendung -> Format des Datensatz-Manifests
+DATASET_FORMATS = {".parquet": "parquet", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+# Zeilen pro Parquet-Zeilengruppe; bis dahin werden die Zeilen im Speicher gesammelt
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+def _parquet_schema(pa):
+    # Pro Datei bzw. Lauf wiederholte Felder werden dictionary-kodiert
+    repeated = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("original_filename", repeated),
+        ("segment_number", pa.int32()),
+        ("audio_file", pa.string()),
+        ("transcript", pa.string()),
+        ("start_time", pa.float64()),
+        ("end_time", pa.float64()),
+        ("duration", pa.float64()),
+        ("segment_type", repeated),
+        ("language", repeated),
+        ("quality_score", pa.float64()),
+        ("error", repeated),
+        ("words", pa.list_(pa.struct([("word", pa.string()), ("start", pa.float64()), ("end", pa.float64())]))),
+    ])
+
+
+def dataset_rows(result, base_dir=None):
+    """Eine Zeile pro Segment eines erfolgreichen Ergebnisses von process_file/BatchProcessor.
+
+    Mit base_dir stehen die Pfade der Segmentdateien relativ dazu; gepackte
+    Segmente werden als "<Paket>#<Nummer>" referenziert.
+    """
+    quality = result.get("quality_assessment") or {}
+    error = "; ".join(quality.get("issues", []))
+    language = (result.get("transcription") or {}).get("language")
+    for number, seg in enumerate(result["segments"], 1):
+        if result.get("packed"):
+            reference = pack_reference(number)
+        else:
+            reference = segment_filename(number, result.get("segment_format", "wav"))
+        audio_file = os.path.join(result["result_dir"], reference)
+        if base_dir is not None:
+            try:
+                audio_file = os.path.relpath(audio_file, base_dir)
+            except ValueError:
+                # Anderes Laufwerk (Windows): absoluten Pfad behalten
+                pass
+        yield {
+            "original_filename": result["original_filename"],
+            "segment_number": number,
+            "audio_file": audio_file,
+            "transcript": seg["text"],
+            "start_time": seg["start_time"],
+            "end_time": seg["end_time"],
+            "duration": seg["end_time"] - seg["start_time"],
+            "segment_type": seg.get("type"),
+            "language": language,
+            "quality_score": quality.get("quality_score"),
+            "error": error,
+            "words": seg.get("words") or None,
+        }
+
+
+class DatasetManifest:
+    """Sammelt die Segmente aller Dateien eines Stapellaufs in einer Datensatzdatei.
+
+    Statt tausende CSV-Dateien einzulesen, liegt der ganze Lauf typisiert in einer
+    Datei: Parquet (benötigt pyarrow, Dateiname, Sprache und Qualitätsprobleme
+    dictionary-kodiert) oder JSONL (eine Zeile pro Segment). Das Format ergibt sich
+    aus der Dateiendung; eine vorhandene Datei wird überschrieben. Die Pfade der
+    Segmentdateien stehen relativ zum Manifest.
+    """
+
+    def __init__(self, path, format=None):
+        self.path = path
+        self.format = format or DATASET_FORMATS.get(os.path.splitext(path)[1].lower())
+        if self.format not in ("parquet", "jsonl"):
+            raise ValueError(f"Unbekanntes Manifest-Format: {path} (erwartet .parquet oder .jsonl)")
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.rows_written = 0
+        self._pending = []
+        os.makedirs(self.base_dir, exist_ok=True)
+        if self.format == "parquet":
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Für Parquet-Manifeste muss das Paket pyarrow installiert sein.")
+            self._pa = pa
+            self._schema = _parquet_schema(pa)
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._writer = open(path, "w", encoding="utf-8")
+
+    def add_result(self, result):
+        """Hängt die Segmente eines Ergebnisses an; Fehlerergebnisse werden übergangen. Gibt die Zeilenzahl zurück."""
+        if result.get("status") != "success":
+            return 0
+        rows = list(dataset_rows(result, self.base_dir))
+        if self.format == "parquet":
+            self._pending.extend(rows)
+            if len(self._pending) >= PARQUET_ROW_GROUP_SIZE:
+                self._flush()
+        else:
+            self._writer.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            self._writer.flush()
+        self.rows_written += len(rows)
+        return len(rows)
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(self._pa.Table.from_pylist(self._pending, schema=self._schema))
+            self._pending = []
+
+    def close(self):
+        if self._writer is None:
+            return
+        if self.format == "parquet":
+            self._flush()
+        self._writer.close()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_dataset_manifest(path):
+    """Liest ein Datensatz-Manifest als Liste von Zeilen (dicts) ein."""
+    if DATASET_FORMATS.get(os.path.splitext(path)[1].lower()) == "parquet":
+        import pyarrow.parquet as pq
+        return pq.read_table(path).to_pylist()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -1,11 +1,24 @@
+import time
+
+# Bezugspunkt für die Startzeit-Messung (so früh wie möglich gesetzt)
+STARTUP_T0 = time.perf_counter()
+
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
+import sys
 import threading
 import json
-import shutil
-import tempfile
-from audio_processor import convert_to_wav, assess_audio_quality, transcribe_audio, segment_audio_intelligent, get_whisper_model
+import multiprocessing
+import queue
+# Nur leichte Module beim Start: die Verarbeitungskette (numpy, Decoder, Modell) lädt der Warm-up-Thread
+from transcription_backends import BACKENDS, DEFAULT_BACKEND, DEFAULT_MODEL_SIZE, MODEL_SIZES, default_worker_count
+
+STARTUP_TIMINGS = {"imports": time.perf_counter() - STARTUP_T0}
+# Wie audio_buffer.SEGMENT_FORMATS, hier fest, damit der Start ohne numpy auskommt
+SEGMENT_FORMAT_CHOICES = ["wav", "flac", "opus"]
+# So oft holt der Tk-Hauptthread Widget-Aktualisierungen aus den Hintergrund-Threads ab
+UI_POLL_MS = 50
 
 
 class WhatsAppVoiceProcessorGUI:
@@ -16,8 +29,100 @@ class WhatsAppVoiceProcessorGUI:
 
         self.files = []
         self.segmentation_type = tk.StringVar(value="sentence")
+        self.worker_count = tk.IntVar(value=default_worker_count())
+        self.backend = tk.StringVar(value=DEFAULT_BACKEND)
+        self.model_size = tk.StringVar(value=DEFAULT_MODEL_SIZE)
+        self.use_vad = tk.BooleanVar(value=True)
+        self.word_alignment = tk.BooleanVar(value=False)
+        self.packed_output = tk.BooleanVar(value=False)
+        self.segment_format = tk.StringVar(value="wav")
+        # Segmente in Originalrate statt 16kHz exportieren (Voice Cloning)
+        self.original_rate = tk.BooleanVar(value=False)
+        self.resume = tk.BooleanVar(value=True)
+        self.last_results = []
+
+        # Vorgewärmter BatchProcessor und die Einstellungen, mit denen er gestartet wurde
+        self._processor = None
+        self._processor_settings = None
+        self._processor_lock = threading.Lock()
+        # Tkinter ist nicht threadsicher: Hintergrund-Threads reichen Widget-Zugriffe hierüber ein
+        self._ui_calls = queue.Queue()
 
         self.create_widgets()
+        master.protocol("WM_DELETE_WINDOW", self.on_close)
+        master.after(UI_POLL_MS, self._run_ui_calls)
+        # Warm-up erst starten, wenn das Fenster gezeichnet ist
+        master.after_idle(self.start_warm_up)
+
+    def _ui(self, func, *args, **kwargs):
+        """Führt func im Tk-Hauptthread aus; aus Hintergrund-Threads nie direkt auf Widgets zugreifen."""
+        self._ui_calls.put((func, args, kwargs))
+
+    def _run_ui_calls(self):
+        while True:
+            try:
+                func, args, kwargs = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args, **kwargs)
+        self.master.after(UI_POLL_MS, self._run_ui_calls)
+
+    def _settings(self):
+        """Liest die Einstellungen aus den Tk-Variablen (nur im Hauptthread aufrufen)."""
+        return (self.worker_count.get(), self.backend.get(), self.model_size.get(), self.use_vad.get(),
+                self.word_alignment.get(), self.packed_output.get(), self.segment_format.get(),
+                self.original_rate.get())
+
+    def _get_processor(self, settings):
+        """Gibt den BatchProcessor für die Einstellungen zurück; bei Änderungen wird er neu gestartet."""
+        from batch_processor import BatchProcessor
+        with self._processor_lock:
+            if self._processor is None or settings != self._processor_settings:
+                if self._processor is not None:
+                    self._processor.close()
+                self._processor = BatchProcessor(
+                    workers=settings[0],
+                    on_progress=self._on_segment_progress,
+                    backend=settings[1],
+                    model_size=settings[2],
+                    vad=settings[3],
+                    word_timestamps=settings[4],
+                    packed=settings[5],
+                    segment_format=settings[6],
+                    export_sample_rate="source" if settings[7] else 0
+                )
+                self._processor_settings = settings
+                return self._processor, self._processor.start()
+            return self._processor, []
+
+    def start_warm_up(self):
+        STARTUP_TIMINGS["window"] = time.perf_counter() - STARTUP_T0
+        threading.Thread(target=self._warm_up_thread, args=(self._settings(),), daemon=True).start()
+
+    def _warm_up_thread(self, settings):
+        """Lädt Verarbeitungskette und Modell im Hintergrund, während Dateien ausgewählt werden."""
+        started = time.perf_counter()
+        import batch_processor
+        STARTUP_TIMINGS["pipeline_import"] = time.perf_counter() - started
+        try:
+            _, warm_ups = self._get_processor(settings)
+            for future in warm_ups:
+                _, timings = future.result()
+                for step, seconds in timings.items():
+                    # Langsamster Worker zählt, die Worker laden parallel
+                    STARTUP_TIMINGS[f"worker_{step}"] = max(STARTUP_TIMINGS.get(f"worker_{step}", 0.0), seconds)
+        except Exception as e:
+            print(f"Vorladen fehlgeschlagen: {e}")
+            return
+        finally:
+            STARTUP_TIMINGS["ready"] = time.perf_counter() - STARTUP_T0
+            print("Startzeiten: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in STARTUP_TIMINGS.items()))
+        self._ui(self.update_status, f"Modell vorgeladen ({STARTUP_TIMINGS['ready']:.1f}s nach Programmstart).")
+
+    def on_close(self):
+        if self._processor is not None:
+            self._processor.close()
+        self.master.destroy()
 
     def create_widgets(self):
         # Main frame
@@ -42,6 +147,23 @@ class WhatsAppVoiceProcessorGUI:
         ttk.Radiobutton(segmentation_frame, text="Absätze", variable=self.segmentation_type, value="paragraph").pack(anchor=tk.W)
         ttk.Radiobutton(segmentation_frame, text="Zeitbasiert (30s)", variable=self.segmentation_type, value="time").pack(anchor=tk.W)
 
+        # Worker-Pool
+        workers_frame = ttk.Frame(main_frame)
+        workers_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(workers_frame, text="Parallele Worker:").pack(side=tk.LEFT)
+        ttk.Spinbox(workers_frame, from_=1, to=max(1, os.cpu_count() or 1), width=5, textvariable=self.worker_count).pack(side=tk.LEFT, padx=5)
+        ttk.Label(workers_frame, text="Backend:").pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Combobox(workers_frame, values=list(BACKENDS), width=15, state="readonly", textvariable=self.backend).pack(side=tk.LEFT, padx=5)
+        ttk.Label(workers_frame, text="Modell:").pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Combobox(workers_frame, values=MODEL_SIZES, width=10, state="readonly", textvariable=self.model_size).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(workers_frame, text="Stille überspringen (VAD)", variable=self.use_vad).pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Checkbutton(workers_frame, text="Wortgenaue Schnitte", variable=self.word_alignment).pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Checkbutton(workers_frame, text="Segmente als Paket", variable=self.packed_output).pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Label(workers_frame, text="Format:").pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Combobox(workers_frame, values=SEGMENT_FORMAT_CHOICES, width=6, state="readonly", textvariable=self.segment_format).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(workers_frame, text="Originalrate (Voice Cloning)", variable=self.original_rate).pack(side=tk.LEFT, padx=(15, 0))
+        ttk.Checkbutton(workers_frame, text="Verarbeitete überspringen", variable=self.resume).pack(side=tk.LEFT, padx=(15, 0))
+
         # Process Button
         self.process_button = ttk.Button(main_frame, text="Dateien verarbeiten", command=self.process_files, state=tk.DISABLED)
         self.process_button.pack(pady=10)
@@ -50,6 +172,10 @@ class WhatsAppVoiceProcessorGUI:
         self.progress_bar = ttk.Progressbar(main_frame, orient="horizontal", length=400, mode="determinate")
         self.progress_bar.pack(pady=5)
 
+        # ZIP-Download Button
+        self.zip_button = ttk.Button(main_frame, text="Ergebnisse als ZIP herunterladen", command=self.zip_results, state=tk.DISABLED)
+        self.zip_button.pack(pady=5)
+
         # Results Section
         results_frame = ttk.LabelFrame(main_frame, text="Verarbeitungsergebnisse", padding="10")
         results_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -83,22 +209,23 @@ class WhatsAppVoiceProcessorGUI:
             return
 
         self.process_button.config(state=tk.DISABLED)
+        self.zip_button.config(state=tk.DISABLED)
         self.results_text.config(state=tk.NORMAL)
-        # ZIP-Download Button
-        self.zip_button = ttk.Button(main_frame, text="Ergebnisse als ZIP herunterladen", command=self.zip_results, state=tk.NORMAL)
-        self.zip_button.pack(pady=5)
         self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(tk.END, "Verarbeitung gestartet...\n")
+        self.results_text.config(state=tk.DISABLED)
+        self.progress_bar["value"] = 0
+        self.progress_bar["maximum"] = len(self.files)
+
+        # Run processing in a separate thread to keep GUI responsive
+        threading.Thread(target=self._process_files_thread,
+                         args=(self._settings(), self.segmentation_type.get(), self.resume.get())).start()
+
     def zip_results(self):
-        import zipfile
-        from tkinter import filedialog, messagebox
-        result_dirs = []
-        for file_path in self.files:
-            base_name = os.path.splitext(os.path.basename(file_path))[0]
-            result_dir = os.path.join(os.path.dirname(file_path), base_name)
-            if os.path.exists(result_dir):
-                result_dirs.append(result_dir)
-
-        if not result_dirs:
+        from zip_stream import ZipStreamWriter
+        # Ergebnisse des letzten Laufs kennen ihre Ausgabedateien, Ordner müssen nicht gesucht werden
+        results = [res for res in self.last_results if res["status"] == "success" and os.path.exists(res["csv_path"])]
+        if not results:
             messagebox.showinfo("Keine Ergebnisse", "Es wurden keine Ergebnisordner gefunden.")
             return
 
@@ -110,81 +237,46 @@ class WhatsAppVoiceProcessorGUI:
         if not zip_path:
             return
 
-        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-            for result_dir in result_dirs:
-                for root, _, files in os.walk(result_dir):
-                    for file in files:
-                        abs_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(abs_path, os.path.dirname(zip_path))
-                        zipf.write(abs_path, rel_path)
+        with open(zip_path, "wb") as f, ZipStreamWriter(f) as archive:
+            for res in results:
+                archive.add_result(res)
         messagebox.showinfo("ZIP erstellt", f"ZIP-Datei gespeichert: {zip_path}")
-        self.results_text.insert(tk.END, "Verarbeitung gestartet...\n")
-        self.results_text.config(state=tk.DISABLED)
-        self.progress_bar["value"] = 0
-        self.progress_bar["maximum"] = len(self.files)
 
-        # Run processing in a separate thread to keep GUI responsive
-        threading.Thread(target=self._process_files_thread).start()
-
-    def _process_files_thread(self):
+    def _process_files_thread(self, settings, segmentation_type, resume):
+        from batch_manifest import BatchManifest, default_manifest_path
         all_results = []
-        get_whisper_model() # Load model once
-        for i, file_path in enumerate(self.files):
-            self.update_status(f"Verarbeite Datei {i+1}/{len(self.files)}: {os.path.basename(file_path)}")
-            temp_dir = os.path.join(tempfile.gettempdir(), f"audio_processing_{os.getpid()}_{i}")
-            os.makedirs(temp_dir, exist_ok=True)
-            try:
-                wav_output_path = os.path.join(temp_dir, os.path.basename(file_path).rsplit(".", 1)[0] + ".wav")
-                if not convert_to_wav(file_path, wav_output_path):
-                    raise Exception("WAV conversion failed")
-
-                quality_assessment = assess_audio_quality(wav_output_path)
-                transcription_result = transcribe_audio(wav_output_path)
-                segments = segment_audio_intelligent(wav_output_path, transcription_result, self.segmentation_type.get())
-
-
-                # Ergebnisse speichern
-                from audio_processor import save_segments_and_csv
-                error_list = quality_assessment.get("issues", [])
-                result_dir, csv_path = save_segments_and_csv(
-                    original_filename=file_path,
-                    wav_path=wav_output_path,
-                    segments=segments,
-                    error_list=error_list
-                )
-
-                result = {
-                    "original_filename": os.path.basename(file_path),
-                    "status": "success",
-                    "quality_assessment": quality_assessment,
-                    "transcription": transcription_result,
-                    "segments": [{
-                        "start_time": s["start_time"],
-                        "end_time": s["end_time"],
-                        "text": s["text"],
-                        "type": s["type"]
-                    } for s in segments],
-                    "result_dir": result_dir,
-                    "csv_path": csv_path
-                }
+        message = "Verarbeitung abgeschlossen."
+        try:
+            processor, _ = self._get_processor(settings)
+            processor.segmentation_type = segmentation_type
+            # Manifest: bereits exportierte Dateien überspringen, abgebrochene Läufe fortsetzen
+            processor.manifest = BatchManifest(default_manifest_path()) if resume else None
+            self._ui(self.update_status, f"Starte {processor.workers} Worker für {len(self.files)} Dateien...")
+            for result in processor.iter_results(self.files):
                 all_results.append(result)
-
-            except Exception as e:
-                result = {
-                    "original_filename": os.path.basename(file_path),
-                    "status": "error",
-                    "error": str(e)
-                }
-                all_results.append(result)
-                self.update_status(f"Fehler bei {os.path.basename(file_path)}: {e}")
-            finally:
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
-                self.progress_bar["value"] = i + 1
-        
+                if result.get("skipped"):
+                    self._ui(self.update_status, f"Übersprungen (bereits verarbeitet): {result['original_filename']}")
+                elif result["status"] == "success":
+                    self._ui(self.update_status, f"Fertig: {result['original_filename']}")
+                else:
+                    self._ui(self.update_status, f"Fehler bei {result['original_filename']}: {result['error']}")
+                self._ui(self.progress_bar.config, value=len(all_results))
+        except Exception as e:
+            # z. B. ein defekter Prozess-Pool; die bisherigen Ergebnisse bleiben erhalten
+            message = f"Verarbeitung abgebrochen: {e}"
+        finally:
+            self._ui(self._processing_finished, all_results, message)
+
+    def _processing_finished(self, all_results, message):
+        self.last_results = all_results
         self.display_results(all_results)
         self.process_button.config(state=tk.NORMAL)
-        self.update_status("Verarbeitung abgeschlossen.")
+        self.zip_button.config(state=tk.NORMAL)
+        self.update_status(message)
+
+    def _on_segment_progress(self, filename, start, end, text):
+        # Zwischenergebnisse langer Aufnahmen anzeigen, während sie noch transkribiert werden (aus dem Weiterleitungs-Thread)
+        self._ui(self.update_status, f"  {filename} [{int(start // 60):02d}:{int(start % 60):02d}] {text}")
 
     def update_status(self, message):
         self.results_text.config(state=tk.NORMAL)
@@ -209,7 +301,18 @@ class WhatsAppVoiceProcessorGUI:
 
 
 if __name__ == "__main__":
+    # Notwendig für den Prozess-Pool in der PyInstaller-.exe
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = WhatsAppVoiceProcessorGUI(root)
+    if "--startup-profile" in sys.argv:
+        # Startzeiten messen: nach dem Vorladen als JSON ausgeben und beenden
+        def wait_for_ready():
+            if "ready" in STARTUP_TIMINGS:
+                print(json.dumps(STARTUP_TIMINGS, indent=2))
+                app.on_close()
+            else:
+                root.after(200, wait_for_ready)
+        root.after(200, wait_for_ready)
     root.mainloop()
 
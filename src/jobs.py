@@ -0,0 +1,271 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from . import audio_processor
+    from .batch_processor import _error_result, process_file
+except ImportError:
+    import audio_processor
+    from batch_processor import _error_result, process_file
+
+# Abgeschlossene Jobs werden nach dieser Zeit samt Upload-Verzeichnis entfernt
+JOB_RETENTION_SECONDS = 3600
+# Ungefährer Fortschritt (0..1) nach jeder Verarbeitungsstufe
+STAGE_PROGRESS = {
+    "queued": 0.0,
+    "decoding": 0.02,
+    "decoded": 0.1,
+    "quality_assessed": 0.15,
+    "transcribing": 0.2,
+    "transcribed": 0.8,
+    "segmented": 0.9,
+    "exported": 1.0,
+    "skipped": 1.0,
+}
+
+
+class JobCancelled(Exception):
+    """Wird im Stufen-Callback ausgelöst, wenn ein Job abgebrochen wurde."""
+
+
+class Job:
+    """Zustand eines Verarbeitungsauftrags: Dateistatus, bisherige Ergebnisse, Abbruchsignal.
+
+    Zusätzlich wird jede Stufe als Ereignis mit Zeitstempel protokolliert, damit
+    Clients den Fortschritt als Stream verfolgen und hängende Stufen erkennen können.
+    """
+
+    def __init__(self, job_id, job_dir, files, segmentation_type):
+        self.id = job_id
+        self.job_dir = job_dir
+        self.segmentation_type = segmentation_type
+        self.files = [{
+            "filename": os.path.basename(path),
+            "path": path,
+            "status": "queued",
+            "stage": "queued",
+            "progress": 0.0,
+            "timings": {},
+        } for path in files]
+        self.results = []
+        self.events = []
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def update_file(self, index, **changes):
+        with self._lock:
+            self.files[index].update(changes)
+
+    def add_result(self, result):
+        with self._lock:
+            self.results.append(result)
+
+    def add_event(self, event_type, file_index=None, **info):
+        """Hängt ein Ereignis an und weckt wartende Stream-Clients."""
+        event = {
+            "type": event_type,
+            "time": round(time.time() - self.created, 3),
+        }
+        if file_index is not None:
+            event["file_index"] = file_index
+            event["filename"] = self.files[file_index]["filename"]
+        event.update(info)
+        with self._changed:
+            event["seq"] = len(self.events)
+            self.events.append(event)
+            self._changed.notify_all()
+        return event
+
+    def wait_events(self, since=0, timeout=None):
+        """Gibt die Ereignisse ab since zurück; wartet höchstens timeout Sekunden auf neue."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > since or self.finished is not None, timeout)
+            return self.events[since:]
+
+    def finish(self, status):
+        """Schließt den Job ab; nicht verarbeitete Dateien gelten als abgebrochen."""
+        for index, entry in enumerate(self.files):
+            if entry["status"] in ("queued", "running"):
+                self.update_file(index, status="cancelled")
+        self.status = status
+        self.add_event("job_finished", status=status)
+        with self._changed:
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    def to_dict(self):
+        """Statusübersicht ohne die (großen) Ergebnisse."""
+        with self._lock:
+            files = [{key: value for key, value in entry.items() if key != "path"} for entry in self.files]
+            done = len(self.results)
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "segmentation_type": self.segmentation_type,
+            "created": self.created,
+            "finished": self.finished,
+            "files_total": len(files),
+            "files_done": done,
+            "progress": sum(entry["progress"] for entry in files) / max(1, len(files)),
+            "files": files,
+            "events": len(self.events),
+        }
+
+    def results_since(self, since=0):
+        """Ergebnisse ab Index since, damit der Client nur Neues abholen muss."""
+        with self._lock:
+            return self.results[since:]
+
+
+class JobManager:
+    """Verwaltet Jobs im Speicher und arbeitet sie in einem gemeinsamen Thread-Pool ab.
+
+    Standardmäßig läuft nur ein Job gleichzeitig, da das geladene Whisper-Modell
+    nicht threadsicher ist. Der Zustand liegt im Speicher des Serverprozesses,
+    der Server muss daher mit einem einzigen Prozess laufen.
+    """
+
+    def __init__(self, workers=1, retention=JOB_RETENTION_SECONDS, manifest=None):
+        self.retention = retention
+        # Mit Manifest werden abgebrochene Dateien fortgesetzt; übersprungen wird nur, was schon
+        # unter demselben Ergebnisordner liegt (bei neuen Jobs also nie)
+        self.manifest = manifest
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create_job_dir(self):
+        """Legt ein Verzeichnis für Uploads und Ergebnisse eines neuen Jobs an."""
+        return tempfile.mkdtemp(prefix="audio_job_")
+
+    def submit(self, job_dir, files, segmentation_type="sentence"):
+        """Registriert einen Job für bereits gespeicherte Dateien und stellt ihn in die Warteschlange."""
+        self._expire()
+        job = Job(uuid.uuid4().hex, job_dir, files, segmentation_type)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def warm_up(self):
+        """Lädt Bibliotheken und Modell im Job-Thread vor; Jobs, die vorher eintreffen, warten darauf."""
+        def run():
+            started = time.perf_counter()
+            try:
+                timings = audio_processor.warm_up()
+            except Exception as e:
+                print(f"Vorladen fehlgeschlagen: {e}")
+                return
+            print("Vorladen abgeschlossen in {:.2f}s ({})".format(
+                time.perf_counter() - started, ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items())))
+        return self._executor.submit(run)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Bricht einen Job ab; die laufende Datei stoppt an der nächsten Stufengrenze."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        return job
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.finish("cancelled")
+            return
+        job.status = "running"
+        job.add_event("job_started", files=len(job.files))
+        for index, entry in enumerate(job.files):
+            if job.cancel_event.is_set():
+                break
+            job.update_file(index, status="running")
+            job.add_event("file_started", index)
+            started = time.perf_counter()
+            output_root = os.path.join(job.job_dir, "results", str(index))
+            try:
+                result = process_file(
+                    entry["path"],
+                    job.segmentation_type,
+                    output_root=output_root,
+                    on_stage=self._stage_callback(job, index),
+                    manifest=self.manifest
+                )
+                result["original_filename"] = entry["filename"]
+                job.update_file(index, status="success", stage="skipped" if result.get("skipped") else "exported",
+                                progress=1.0)
+            except JobCancelled:
+                break
+            except Exception as e:
+                print(f"Fehler bei der Verarbeitung von {entry['filename']}: {e}")
+                result = _error_result(entry["filename"], e)
+                job.update_file(index, status="error", progress=1.0, error=str(e))
+            job.add_result(result)
+            job.add_event("file_finished", index, status=result["status"],
+                          duration=round(time.perf_counter() - started, 3), result=result)
+        job.finish("cancelled" if job.cancel_event.is_set() else "completed")
+
+    def _stage_callback(self, job, index):
+        duration = {}
+        last = {"time": time.perf_counter()}
+        timings = {}
+
+        def on_stage(stage, **info):
+            if job.cancel_event.is_set():
+                raise JobCancelled()
+            if stage == "decoded":
+                duration["value"] = info.get("duration") or 0.0
+            if stage == "segment":
+                # Zwischenstand langer Aufnahmen anhand der bereits transkribierten Zeit
+                fraction = info["end"] / duration["value"] if duration.get("value") else 0.0
+                progress = STAGE_PROGRESS["transcribing"] + fraction * (
+                    STAGE_PROGRESS["transcribed"] - STAGE_PROGRESS["transcribing"])
+                job.update_file(index, progress=min(progress, STAGE_PROGRESS["transcribed"]))
+                job.add_event(stage, index, **info)
+                return
+            # Dauer seit der vorherigen Stufe, z. B. "transcribed" = Zeit der Transkription
+            now = time.perf_counter()
+            elapsed = round(now - last["time"], 3)
+            last["time"] = now
+            timings[stage] = elapsed
+            job.update_file(index, stage=stage, progress=STAGE_PROGRESS.get(stage, 0.0), timings=dict(timings))
+            job.add_event(stage, index, elapsed=elapsed, **info)
+
+        return on_stage
+
+    def _expire(self):
+        """Entfernt abgeschlossene Jobs nach Ablauf der Aufbewahrungszeit."""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished is not None and now - job.finished > self.retention]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+
+
+_job_manager = None
+
+def get_job_manager():
+    """Gibt den gemeinsamen JobManager zurück (wird beim ersten Zugriff angelegt).
+
+    Web-Jobs verwenden kein Manifest: jeder Job schreibt in ein eigenes temporäres
+    Verzeichnis, das nach Ablauf gelöscht wird, frühere Ergebnisse sind also nie
+    wiederverwendbar. Das gemeinsame Manifest bleibt GUI und Stapelläufen vorbehalten.
+    """
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
@@ -1,15 +1,31 @@
 import os
+import time
 
-from flask import Flask, render_template
+# Bezugspunkt für die Startzeit-Messung
+STARTUP_T0 = time.perf_counter()
+
+from flask import Flask, Response, render_template
 from flask_cors import CORS
 # Imports an die flache Projektstruktur angepasst.
 from user import db, user_bp
 from audio import audio_bp
+from jobs import get_job_manager
+from metrics import configure_metrics, render_prometheus
+from audio_processor import PipelineConfig
+
+print(f"Importe geladen in {time.perf_counter() - STARTUP_T0:.2f}s")
 
 app = Flask(__name__, template_folder='templates')
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 
+# Per-stage metrics; VOICE_METRICS=0 switches them off, VOICE_METRICS_LOG=<path> adds a JSON span log
+configure_metrics(enabled=os.environ.get('VOICE_METRICS', '1').lower() not in ('0', 'false', 'no'))
+
+# Shared pipeline settings (same core as the GUI and batch runs): TRANSCRIPTION_BACKEND, TRANSCRIPTION_MODEL_SIZE,
+# SEGMENT_FORMAT=flac (lossless) or opus shrinks downloads, EXPORT_SAMPLE_RATE=source keeps the original rate for voice cloning
+PipelineConfig.from_env().apply()
+
 # Enable CORS for all routes
 CORS(app)
 
@@ -27,6 +43,15 @@ with app.app_context():
 def index():
     return render_template('index.html')
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of stage timings, bytes and cache counters"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 
 if __name__ == '__main__':
+    # Modell im Hintergrund laden, damit der erste Upload nicht auf den Kaltstart wartet.
+    # Mit debug=True nur im Kindprozess des Reloaders, der die Anfragen bedient.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        get_job_manager().warm_up()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+
+# Obergrenzen der Histogramm-Buckets für die Dauer einer Stufe in Sekunden
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+METRIC_PREFIX = "voice_processor"
+# Werte, die Spans über add() sammeln und die als Zähler exportiert werden
+SPAN_VALUES = ("audio_seconds", "bytes_read", "bytes_written")
+
+
+class Span:
+    """Misst eine Verarbeitungsstufe; weitere Mengen (Audio-Sekunden, Bytes) kommen über add() hinzu."""
+
+    __slots__ = ("stage", "labels", "values", "_started")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.values = {}
+        self._started = None
+
+    def add(self, **values):
+        for name, value in values.items():
+            if value is not None:
+                self.values[name] = self.values.get(name, 0) + value
+        return self
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        _registry.record(self, time.perf_counter() - self._started, exc_type is not None)
+        return False
+
+
+class _NullSpan:
+    """Ersatz bei abgeschalteter Instrumentierung: kein Zeitstempel, keine Sperre, keine Allokation."""
+
+    __slots__ = ()
+
+    def add(self, **values):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """Sammelt Spans und Zähler im Speicher des Prozesses und schreibt sie optional als JSON-Zeilen.
+
+    Jeder Prozess hat seine eigene Registry; Worker eines Prozess-Pools melden
+    also nur an ihr eigenes Protokoll, nicht an den /metrics-Endpunkt des Servers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._log = None
+
+    def set_json_log(self, path):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+            self._log = open(path, "a", encoding="utf-8", buffering=1) if path else None
+
+    def record(self, span, seconds, error=False):
+        key = (span.stage, tuple(sorted(span.labels.items())))
+        with self._lock:
+            stats = self._stages.get(key)
+            if stats is None:
+                stats = self._stages[key] = {"count": 0, "errors": 0, "seconds": 0.0,
+                                             "buckets": [0] * len(DURATION_BUCKETS), "values": {}}
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["seconds"] += seconds
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    stats["buckets"][index] += 1
+            for name, value in span.values.items():
+                stats["values"][name] = stats["values"].get(name, 0) + value
+            if self._log is not None:
+                entry = {"time": round(time.time(), 3), "stage": span.stage, "seconds": round(seconds, 6), "error": error}
+                entry.update(span.labels)
+                entry.update(span.values)
+                self._log.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self):
+        """Kopie aller Werte: {"stages": {stage: [...]}, "counters": {name: [...]}}."""
+        with self._lock:
+            stages = {}
+            for (stage, labels), stats in self._stages.items():
+                stages.setdefault(stage, []).append(dict(stats, labels=dict(labels), buckets=list(stats["buckets"]),
+                                                         values=dict(stats["values"])))
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {"stages": stages, "counters": counters}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+
+_registry = MetricsRegistry()
+# Per Umgebungsvariable auch in GUI/Workern einschaltbar, ohne Code zu ändern
+_enabled = os.environ.get("VOICE_METRICS", "").lower() in ("1", "true", "yes")
+if os.environ.get("VOICE_METRICS_LOG"):
+    _registry.set_json_log(os.environ["VOICE_METRICS_LOG"])
+
+
+def configure_metrics(enabled=None, json_log=None):
+    """Schaltet die Instrumentierung ein oder aus; json_log hängt jeden Span als JSON-Zeile an die Datei an."""
+    global _enabled
+    if enabled is not None:
+        _enabled = enabled
+    if json_log is not None:
+        _registry.set_json_log(json_log or None)
+
+
+def metrics_enabled():
+    return _enabled
+
+
+def span(stage, **labels):
+    """Kontextmanager für eine Stufe, z. B. ``with span("transcribe") as s: s.add(audio_seconds=d)``."""
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(stage, labels)
+
+
+def increment(name, value=1, **labels):
+    """Erhöht einen Zähler (z. B. Cache-Treffer); ohne Instrumentierung ein reiner Funktionsaufruf."""
+    if _enabled:
+        _registry.increment(name, value, **labels)
+
+
+def get_registry():
+    return _registry
+
+
+def _format_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+
+def render_prometheus(registry=None):
+    """Gibt alle Werte im Prometheus-Textformat (Version 0.0.4) zurück."""
+    snapshot = (registry or _registry).snapshot()
+    prefix = METRIC_PREFIX
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        if not samples:
+            return
+        lines.append(f"# HELP {prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        lines.extend(samples)
+
+    stages = [(dict(stats["labels"], stage=stage), stats)
+              for stage, entries in sorted(snapshot["stages"].items()) for stats in entries]
+    family("stage_calls_total", "counter", "Number of completed stage runs.",
+           [f"{prefix}_stage_calls_total{_format_labels(labels)} {stats['count']}" for labels, stats in stages])
+    family("stage_errors_total", "counter", "Number of stage runs that raised an exception.",
+           [f"{prefix}_stage_errors_total{_format_labels(labels)} {stats['errors']}" for labels, stats in stages])
+    histogram = []
+    for labels, stats in stages:
+        for bound, count in zip(DURATION_BUCKETS, stats["buckets"]):
+            histogram.append(f"{prefix}_stage_duration_seconds_bucket{_format_labels(labels, le=bound)} {count}")
+        histogram.append(f"{prefix}_stage_duration_seconds_bucket{_format_labels(labels, le='+Inf')} {stats['count']}")
+        histogram.append(f"{prefix}_stage_duration_seconds_sum{_format_labels(labels)} {stats['seconds']:.6f}")
+        histogram.append(f"{prefix}_stage_duration_seconds_count{_format_labels(labels)} {stats['count']}")
+    family("stage_duration_seconds", "histogram", "Wall-clock duration of pipeline stages.", histogram)
+    for value_name in SPAN_VALUES:
+        family(f"stage_{value_name}_total", "counter", f"Sum of {value_name.replace('_', ' ')} reported by stages.",
+               [f"{prefix}_stage_{value_name}_total{_format_labels(labels)} {stats['values'][value_name]}"
+                for labels, stats in stages if value_name in stats["values"]])
+    for name, entries in sorted(snapshot["counters"].items()):
+        family(f"{name}_total", "counter", f"Count of {name.replace('_', ' ')}.",
+               [f"{prefix}_{name}_total{_format_labels(entry['labels'])} {entry['value']}" for entry in entries])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,260 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+try:
+    from .transcription_backends import (BACKENDS, DEFAULT_BACKEND, DEFAULT_BATCH_SIZE, DEFAULT_MODEL_SIZE,
+                                         MODEL_SIZES, TranscriptionBackend, create_backend)
+except ImportError:
+    from transcription_backends import (BACKENDS, DEFAULT_BACKEND, DEFAULT_BATCH_SIZE, DEFAULT_MODEL_SIZE,
+                                        MODEL_SIZES, TranscriptionBackend, create_backend)
+
+# Höchstzahl gleichzeitig an das Modell übergebener Anfragen
+MAX_BATCH_SIZE = DEFAULT_BATCH_SIZE
+# So lange wird nach der ersten Anfrage auf weitere gewartet, um einen Batch zu füllen
+BATCH_WAIT_SECONDS = 0.05
+
+
+def _state_dir():
+    return os.path.join(os.path.expanduser("~"), ".cache", "whatsapp_voice_processor")
+
+
+def default_address():
+    """Adresse des Modell-Servers: Unix-Socket bzw. Named Pipe unter Windows (per MODEL_SERVER_ADDRESS änderbar)."""
+    if os.environ.get("MODEL_SERVER_ADDRESS"):
+        return os.environ["MODEL_SERVER_ADDRESS"]
+    if sys.platform == "win32":
+        return r"\\.\pipe\whatsapp_voice_processor_model"
+    return os.path.join(_state_dir(), "model.sock")
+
+
+def _authkey_path():
+    return os.path.join(_state_dir(), "model_server.key")
+
+
+def _read_authkey(create=False):
+    """Liest den gemeinsamen Schlüssel; nur der Server legt ihn an (lesbar nur für den Benutzer)."""
+    path = _authkey_path()
+    if not os.path.exists(path):
+        if not create:
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(os.urandom(32))
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class ModelServer:
+    """Lädt ein Transkriptions-Backend einmal und bedient Anfragen mehrerer Prozesse.
+
+    Jede Verbindung wird in einem eigenen Thread angenommen; die Anfragen landen in
+    einer gemeinsamen Warteschlange, aus der ein einziger Modell-Thread Batches von
+    bis zu MAX_BATCH_SIZE Anfragen an backend.transcribe_batch() übergibt. Die
+    Anfragen eines "transcribe_batch"-Kommandos kommen als Gruppe in die
+    Warteschlange und landen so gemeinsam in einem Batch.
+    """
+
+    def __init__(self, backend, address=None, max_batch_size=MAX_BATCH_SIZE, batch_wait=BATCH_WAIT_SECONDS):
+        self.backend = backend
+        self.address = address or default_address()
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self._requests = queue.Queue()
+        self._stopped = threading.Event()
+
+    def info(self):
+        return {
+            "backend": self.backend.name,
+            "model_size": self.backend.model_size,
+            "cache_id": self.backend.cache_id,
+            "options": self.backend.options,
+        }
+
+    def serve_forever(self):
+        if sys.platform != "win32" and os.path.exists(self.address):
+            # Verwaister Socket eines abgestürzten Servers
+            os.unlink(self.address)
+        self.backend.load()
+        threading.Thread(target=self._model_loop, daemon=True).start()
+        with Listener(self.address, authkey=_read_authkey(create=True)) as listener:
+            print(f"Modell-Server bereit ({self.backend.cache_id}) auf {self.address}")
+            while not self._stopped.is_set():
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    # z. B. falscher Schlüssel; der Server läuft weiter
+                    print(f"Verbindung abgelehnt: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        """Beendet serve_forever(); die blockierende accept()-Schleife wird per Verbindung geweckt."""
+        self._stopped.set()
+        try:
+            with Client(self.address, authkey=_read_authkey()):
+                pass
+        except (OSError, EOFError):
+            pass
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                while True:
+                    request = conn.recv()
+                    if request.get("command") == "info":
+                        conn.send({"ok": True, "result": self.info()})
+                        continue
+                    if request.get("command") == "transcribe_batch":
+                        responses = [self._response(slot) for slot in self._submit(request["requests"])]
+                        conn.send({"ok": True, "result": responses})
+                        continue
+                    conn.send(self._response(self._submit([request])[0]))
+            except (EOFError, OSError):
+                pass
+
+    def _submit(self, requests):
+        """Stellt die Anfragen als eine Gruppe in die Warteschlange und wartet auf ihre Ergebnisse."""
+        group = [{"request": request, "done": threading.Event()} for request in requests]
+        if group:
+            self._requests.put(group)
+        for slot in group:
+            slot["done"].wait()
+        return group
+
+    @staticmethod
+    def _response(slot):
+        if isinstance(slot["result"], Exception):
+            return {"ok": False, "error": str(slot["result"])}
+        return {"ok": True, "result": slot["result"]}
+
+    def _next_batch(self):
+        # Gruppen werden nie geteilt; eine große Gruppe teilt das Backend selbst in Batches auf
+        batch = list(self._requests.get())
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.extend(self._requests.get(timeout=self.batch_wait))
+            except queue.Empty:
+                break
+        return batch
+
+    def _model_loop(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.backend.transcribe_batch([slot["request"] for slot in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for slot, result in zip(batch, results):
+                slot["result"] = result
+                slot["done"].set()
+
+
+class RemoteBackend(TranscriptionBackend):
+    """Backend, das die Transkription an einen laufenden Modell-Server übergibt.
+
+    Pro Anfrage wird eine eigene Verbindung geöffnet, sodass die Instanz aus
+    beliebigen Threads genutzt werden kann; transcribe_batch() schickt alle Anfragen
+    in einer Nachricht, damit der Server sie gemeinsam dekodiert. Ist der Server
+    nicht mehr erreichbar, wird auf ein lokal geladenes Backend gleicher
+    Konfiguration ausgewichen.
+    """
+
+    def __init__(self, address, authkey, info, threads=None):
+        super().__init__(info["model_size"], threads)
+        self.name = info["backend"]
+        self.address = address
+        self.authkey = authkey
+        self._cache_id = info["cache_id"]
+        self._options = info["options"]
+        self._local = None
+
+    @property
+    def cache_id(self):
+        return self._cache_id
+
+    @property
+    def options(self):
+        return self._options
+
+    def load(self):
+        # Das Modell liegt im Server-Prozess
+        return None
+
+    def _local_backend(self):
+        if self._local is None:
+            self._local = create_backend(self.name, self.model_size, self.threads)
+        return self._local
+
+    def _send(self, request):
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(request)
+            return conn.recv()
+
+    def transcribe(self, samples, language=None, initial_prompt=None, word_timestamps=False):
+        request = {"command": "transcribe", "samples": samples, "language": language, "initial_prompt": initial_prompt,
+                   "word_timestamps": word_timestamps}
+        try:
+            response = self._send(request)
+        except (OSError, EOFError) as e:
+            print(f"Modell-Server nicht erreichbar ({e}), transkribiere lokal.")
+            return self._local_backend().transcribe(samples, language, initial_prompt, word_timestamps)
+        if not response["ok"]:
+            raise RuntimeError(f"Modell-Server: {response['error']}")
+        return response["result"]
+
+    def transcribe_batch(self, requests):
+        try:
+            response = self._send({"command": "transcribe_batch", "requests": list(requests)})
+        except (OSError, EOFError) as e:
+            print(f"Modell-Server nicht erreichbar ({e}), transkribiere lokal.")
+            return self._local_backend().transcribe_batch(requests)
+        if not response["ok"]:
+            raise RuntimeError(f"Modell-Server: {response['error']}")
+        return [item["result"] if item["ok"] else RuntimeError(f"Modell-Server: {item['error']}")
+                for item in response["result"]]
+
+
+def connect_model_server(backend=None, model_size=None, threads=None, address=None):
+    """Gibt ein RemoteBackend zurück, wenn ein passender Modell-Server läuft, sonst None.
+
+    Der Server wird nur verwendet, wenn Backend und Modellgröße mit der gewünschten
+    Konfiguration übereinstimmen (None akzeptiert jede).
+    """
+    address = address or default_address()
+    authkey = _read_authkey()
+    if authkey is None or (sys.platform != "win32" and not os.path.exists(address)):
+        return None
+    try:
+        with Client(address, authkey=authkey) as conn:
+            conn.send({"command": "info"})
+            info = conn.recv()["result"]
+    except (OSError, EOFError, KeyError) as e:
+        print(f"Modell-Server unter {address} nicht nutzbar: {e}")
+        return None
+    if (backend and info["backend"] != backend) or (model_size and info["model_size"] != model_size):
+        print(f"Modell-Server nutzt {info['cache_id']}, benötigt wird {backend}:{model_size} – transkribiere lokal.")
+        return None
+    return RemoteBackend(address, authkey, info, threads)
+
+
+def main(argv=None):
+    # Verwendung: python model_server.py [--backend faster-whisper] [--model-size base] [--threads 4]
+    parser = argparse.ArgumentParser(description="Gemeinsamer Modell-Server für GUI und Flask-Worker")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--model-size", choices=MODEL_SIZES, default=DEFAULT_MODEL_SIZE)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--address", default=None)
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="Anfragen pro Batch (1 = ohne Batch-Dekodierung)")
+    args = parser.parse_args(argv)
+    backend = create_backend(args.backend, args.model_size, args.threads, batch_size=args.batch_size)
+    ModelServer(backend, args.address, max_batch_size=args.batch_size).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import csv
+import glob
+import os
+import struct
+
+import numpy as np
+
+try:
+    from .audio_buffer import SEGMENT_FORMATS, WavSource, pcm_samples, wav_header, write_segment
+except ImportError:
+    from audio_buffer import SEGMENT_FORMATS, WavSource, pcm_samples, wav_header, write_segment
+
+# Alle Segmente einer Eingabedatei hintereinander in einer WAV-Datei ...
+PACK_FILENAME = "segments.pack.wav"
+# ... plus Index mit (Start-Frame, Anzahl Frames) je Segment als zwei uint64 (little-endian)
+INDEX_FILENAME = "segments.pack.idx"
+_INDEX_ENTRY = struct.Struct("<QQ")
+
+
+def segment_filename(number, segment_format="wav"):
+    """Dateiname des number-ten Segments (ab 1) im Ergebnisordner."""
+    return f"segment_{number:02d}{SEGMENT_FORMATS[segment_format][0]}"
+
+
+def pack_reference(number):
+    """Verweis auf das number-te Segment im Paket, wie er in CSV und Datensatz-Manifest steht."""
+    return f"{PACK_FILENAME}#{number}"
+
+
+def parse_reference(audio_file):
+    """Zerlegt einen audio_file-Eintrag in (Datei, Segmentnummer im Paket oder None)."""
+    name, _, number = audio_file.partition("#")
+    return name, int(number) if number else None
+
+
+def referenced_files(audio_files):
+    """Dateien, die für die gegebenen audio_file-Einträge nötig sind (jede einmal, Paket samt Index)."""
+    files = []
+    for audio_file in audio_files:
+        name, number = parse_reference(audio_file)
+        if name in files:
+            continue
+        files.append(name)
+        if number is not None:
+            files.append(INDEX_FILENAME)
+    return files
+
+
+class SegmentPackWriter:
+    """Schreibt die Segmente einer Eingabedatei in ein Paket statt in je eine eigene Datei.
+
+    Das Paket ist eine gewöhnliche WAV-Datei (Segmente ohne Lücke hintereinander),
+    der Index liegt daneben. Der WAV-Header wird beim Schließen vervollständigt.
+    Pakete bleiben immer PCM, damit jedes Segment ein einfacher Byte-Bereich ist;
+    FLAC/Opus gibt es erst beim Entpacken (expand_pack).
+    """
+
+    def __init__(self, result_dir, sample_rate, channels=1, sampwidth=2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sampwidth = sampwidth
+        self.n_frames = 0
+        self._audio = open(os.path.join(result_dir, PACK_FILENAME), "wb")
+        self._index = open(os.path.join(result_dir, INDEX_FILENAME), "wb")
+        self._audio.write(wav_header(0, sample_rate, channels, sampwidth))
+
+    def add(self, data):
+        """Hängt PCM-Daten eines Segments an und gibt seine Nummer (ab 1) zurück."""
+        frames = len(data) // (self.channels * self.sampwidth)
+        self._audio.write(data)
+        self._index.write(_INDEX_ENTRY.pack(self.n_frames, frames))
+        self.n_frames += frames
+        return self._index.tell() // _INDEX_ENTRY.size
+
+    def close(self):
+        if self._audio.closed:
+            return
+        self._audio.seek(0)
+        self._audio.write(wav_header(self.n_frames * self.channels * self.sampwidth,
+                                     self.sample_rate, self.channels, self.sampwidth))
+        self._audio.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SegmentPack:
+    """Liest einzelne Segmente aus einem Paket; jeder Zugriff ist ein Indexeintrag plus ein mmap-Bereich."""
+
+    def __init__(self, result_dir):
+        self.result_dir = result_dir
+        self.source = WavSource(os.path.join(result_dir, PACK_FILENAME))
+        index_path = os.path.join(result_dir, INDEX_FILENAME)
+        if os.path.getsize(index_path):
+            self._index = np.memmap(index_path, dtype="<u8", mode="r").reshape(-1, 2)
+        else:
+            self._index = np.zeros((0, 2), dtype="<u8")
+
+    def __len__(self):
+        return len(self._index)
+
+    def segment_bytes(self, number):
+        """PCM-Daten des number-ten Segments (ab 1) als memoryview, ohne Kopie."""
+        if not 1 <= number <= len(self._index):
+            raise IndexError(f"Segment {number} nicht im Paket ({len(self._index)} Segmente)")
+        start, frames = (int(value) for value in self._index[number - 1])
+        return self.source.frame_bytes(start, start + frames)
+
+    def read(self, number):
+        """Samples des number-ten Segments (bei Stereo verschachtelt).
+
+        Der Typ folgt der Sample-Breite im WAV-Header des Pakets (siehe pcm_samples),
+        bei den üblichen 16 Bit also int16.
+        """
+        return pcm_samples(self.segment_bytes(number), self.source.sampwidth)
+
+    def extract(self, number, output_path, segment_format="wav"):
+        """Schreibt das number-te Segment als eigenständige Datei (WAV, FLAC oder Opus)."""
+        with self.segment_bytes(number) as data:
+            write_segment(output_path, data, self.source.sample_rate, self.source.channels, self.source.sampwidth,
+                          segment_format)
+
+    def close(self):
+        self._index = None
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def expand_pack(result_dir, keep_pack=False, segment_format="wav"):
+    """Stellt das bisherige Layout wieder her: eine Datei pro Segment, CSV mit Dateinamen.
+
+    Gibt die Anzahl der geschriebenen Segmente zurück.
+    """
+    with SegmentPack(result_dir) as pack:
+        count = len(pack)
+        for number in range(1, count + 1):
+            pack.extract(number, os.path.join(result_dir, segment_filename(number, segment_format)), segment_format)
+    for csv_path in glob.glob(os.path.join(result_dir, "*_segments.csv")):
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        column = rows[0].index("audio_file")
+        for row in rows[1:]:
+            name, number = parse_reference(row[column])
+            if name == PACK_FILENAME and number is not None:
+                row[column] = segment_filename(number, segment_format)
+        temp_path = csv_path + ".tmp"
+        with open(temp_path, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+        os.replace(temp_path, csv_path)
+    if not keep_pack:
+        os.remove(os.path.join(result_dir, PACK_FILENAME))
+        os.remove(os.path.join(result_dir, INDEX_FILENAME))
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entpackt Segmentpakete in eine Datei pro Segment")
+    parser.add_argument("result_dirs", nargs="+", help="Ergebnisordner mit segments.pack.wav")
+    parser.add_argument("--keep-pack", action="store_true", help="Paket und Index nach dem Entpacken behalten")
+    parser.add_argument("--format", choices=sorted(SEGMENT_FORMATS), default="wav", help="Format der Segmentdateien")
+    args = parser.parse_args(argv)
+    for result_dir in args.result_dirs:
+        count = expand_pack(result_dir, keep_pack=args.keep_pack, segment_format=args.format)
+        print(f"{result_dir}: {count} Segmente entpackt")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+import re
+
+# Standard-Fensterlänge der zeitbasierten Segmentierung
+TIME_WINDOW_SECONDS = 30.0
+# Überlappung benachbarter Zeitfenster (0 = lückenlos aneinander)
+TIME_WINDOW_OVERLAP = 0.0
+
+_WORD_PATTERN = re.compile(r"\s*\S+")
+
+
+def split_words(seg):
+    """Zerlegt ein Whisper-Segment in (start, end, text)-Wörter.
+
+    Liegen Wort-Zeitstempel vor (word_timestamps=True), werden sie übernommen,
+    sonst wird die Segmentdauer anteilig zur Zeichenlänge auf die Wörter verteilt.
+    Der Text behält seine führenden Leerzeichen, damit er sich wieder zusammensetzen lässt.
+    """
+    if seg.get("words"):
+        return [(word["start"], word["end"], word["word"]) for word in seg["words"]]
+    pieces = _WORD_PATTERN.findall(seg["text"])
+    total = sum(len(piece) for piece in pieces)
+    if not total:
+        return []
+    words = []
+    position = seg["start"]
+    step = (seg["end"] - seg["start"]) / float(total)
+    for piece in pieces:
+        end = position + len(piece) * step
+        words.append((position, end, piece))
+        position = end
+    return words
+
+
+def _iter_words(whisper_segments):
+    for seg in whisper_segments:
+        for word in split_words(seg):
+            yield word
+
+
+def iter_time_windows(whisper_segments, duration, window_seconds=TIME_WINDOW_SECONDS, overlap_seconds=TIME_WINDOW_OVERLAP):
+    """Teilt die Aufnahme in feste Zeitfenster und ordnet jedem Fenster seine Wörter zu.
+
+    Die Whisper-Segmente müssen nach Startzeit sortiert sein und werden nur einmal
+    durchlaufen (zwei Zeiger: Fenster und Wörter), der Aufwand ist also linear in
+    Fenstern plus Wörtern. Ein Wort gehört zu jedem Fenster, in dem seine Mitte
+    liegt; Segmente werden an Wortgrenzen statt mitten im Text geteilt.
+    """
+    if window_seconds <= 0:
+        raise ValueError("window_seconds muss größer als 0 sein")
+    if not 0 <= overlap_seconds < window_seconds:
+        raise ValueError("overlap_seconds muss zwischen 0 und window_seconds liegen")
+    if duration <= 0:
+        return
+
+    step = window_seconds - overlap_seconds
+    words = _iter_words(whisper_segments)
+    pending = []
+    exhausted = False
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, duration)
+        # Wörter nachladen, bis das erste hinter dem Fensterende liegt
+        while not exhausted and (not pending or (pending[-1][0] + pending[-1][1]) / 2 < end):
+            word = next(words, None)
+            if word is None:
+                exhausted = True
+            else:
+                pending.append(word)
+        last = end >= duration
+        text = "".join(w[2] for w in pending if start <= (w[0] + w[1]) / 2 and ((w[0] + w[1]) / 2 < end or last))
+        yield {
+            "start_time": start,
+            "end_time": end,
+            "text": text.strip(),
+            "type": "time"
+        }
+        if last:
+            return
+        start += step
+        # Wörter vor dem nächsten Fenster werden nicht mehr gebraucht
+        pending = [w for w in pending if (w[0] + w[1]) / 2 >= start]
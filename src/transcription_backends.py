@@ -0,0 +1,215 @@
+import os
+import sys
+
+try:
+    from .metrics import span
+except ImportError:
+    from metrics import span
+
+DEFAULT_BACKEND = "whisper"
+DEFAULT_MODEL_SIZE = "base"
+# Anzahl der 30s-Fenster, die gemeinsam durch das Modell laufen
+DEFAULT_BATCH_SIZE = 8
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large-v3"]
+
+
+def default_worker_count():
+    """Standardanzahl der Transkriptions-Worker (halbe Kernzahl, höchstens 4)."""
+    return max(1, min(4, (os.cpu_count() or 2) // 2))
+
+
+def get_model_root():
+    """Bestimmt das Modellverzeichnis, abhängig davon, ob die App als .exe läuft."""
+    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+        # Die Anwendung wird als PyInstaller-Bundle ausgeführt.
+        # Das Modell liegt im temporären Ordner _MEIPASS in einem 'models'-Unterverzeichnis.
+        return os.path.join(sys._MEIPASS, "models")
+    # Die Anwendung wird als normales Python-Skript ausgeführt.
+    # Das Modell wird im 'models'-Unterverzeichnis des Skript-Verzeichnisses erwartet.
+    return os.path.join(os.path.dirname(__file__), "models")
+
+
+class TranscriptionBackend:
+    """Gemeinsame Schnittstelle aller Transkriptions-Backends.
+
+    transcribe() erhält 16kHz-Mono-Samples als float32 und liefert immer ein Dict
+    mit "text", "language" und "segments" (Whisper-Format mit start/end/text). Mit
+    word_timestamps=True trägt jedes Segment zusätzlich "words" (word/start/end/probability).
+    """
+
+    name = None
+
+    def __init__(self, model_size=DEFAULT_MODEL_SIZE, threads=None, model_root=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.model_size = model_size
+        self.threads = threads
+        self.model_root = model_root or get_model_root()
+        self.batch_size = batch_size
+        self.model = None
+
+    @property
+    def cache_id(self):
+        """Kennung für den Transkriptions-Cache; unterschiedliche Backends liefern unterschiedliche Texte."""
+        return f"{self.name}:{self.model_size}"
+
+    @property
+    def options(self):
+        """Dekodieroptionen, die in den Cache-Schlüssel eingehen."""
+        return {}
+
+    def load(self):
+        """Lädt das Modell einmal und gibt es zurück."""
+        if self.model is None:
+            print(f"Lade {self.name}-Modell ({self.model_size}) aus '{self.model_root}'... Dies kann einen Moment dauern.")
+            with span("model_load", backend=self.name, model_size=self.model_size):
+                self.model = self._load_model()
+            print(f"{self.name}-Modell geladen.")
+        return self.model
+
+    def _load_model(self):
+        raise NotImplementedError
+
+    def transcribe(self, samples, language=None, initial_prompt=None, word_timestamps=False):
+        raise NotImplementedError
+
+    def transcribe_batch(self, requests):
+        """Transkribiert mehrere Anfragen (Dicts mit samples, language, initial_prompt).
+
+        Gibt pro Anfrage ein Ergebnis oder die aufgetretene Ausnahme zurück, damit
+        ein fehlerhafter Eintrag die übrigen nicht verwirft.
+        """
+        results = []
+        for request in requests:
+            # word_timestamps nur übergeben, wenn angefordert, damit ältere Backends ohne den Parameter weiterlaufen
+            extra = {"word_timestamps": True} if request.get("word_timestamps") else {}
+            try:
+                results.append(self.transcribe(request["samples"], request.get("language"), request.get("initial_prompt"),
+                                               **extra))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class WhisperBackend(TranscriptionBackend):
+    """Original openai-whisper (PyTorch, fp32 auf der CPU)."""
+
+    name = "whisper"
+
+    @property
+    def options(self):
+        # fp16=False ist für die CPU-Nutzung erforderlich/stabiler
+        return {"fp16": False}
+
+    def _load_model(self):
+        import whisper
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        return whisper.load_model(self.model_size, download_root=self.model_root)
+
+    def transcribe(self, samples, language=None, initial_prompt=None, word_timestamps=False):
+        result = self.load().transcribe(samples, language=language, initial_prompt=initial_prompt,
+                                        word_timestamps=word_timestamps, **self.options)
+        return {
+            "text": result["text"],
+            "language": result["language"],
+            "segments": result["segments"]
+        }
+
+    def transcribe_batch(self, requests):
+        """Dekodiert die Anfragen in Batches von batch_size Fenstern (gleiche Ausgabe wie transcribe() bei Temperatur 0).
+
+        Anfragen mit Wort-Zeitstempeln laufen einzeln, da die Batch-Dekodierung keine liefert.
+        """
+        try:
+            from .whisper_batch import transcribe_batch
+        except ImportError:
+            from whisper_batch import transcribe_batch
+        if self.batch_size <= 1 or len(requests) <= 1 or any(r.get("word_timestamps") for r in requests):
+            return super().transcribe_batch(requests)
+        results = []
+        for start in range(0, len(requests), self.batch_size):
+            chunk = requests[start:start + self.batch_size]
+            try:
+                results.extend(transcribe_batch(self.load(), chunk))
+            except Exception as e:
+                # Einzeln wiederholen, damit eine fehlerhafte Anfrage nicht den ganzen Batch kostet
+                print(f"Batch-Dekodierung fehlgeschlagen ({e}), transkribiere einzeln.")
+                results.extend(super().transcribe_batch(chunk))
+        return results
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """faster-whisper (CTranslate2) mit int8-quantisierten Gewichten, deutlich schneller auf der CPU."""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size=DEFAULT_MODEL_SIZE, threads=None, model_root=None, batch_size=DEFAULT_BATCH_SIZE,
+                 compute_type="int8"):
+        super().__init__(model_size, threads, model_root, batch_size)
+        self.compute_type = compute_type
+
+    @property
+    def cache_id(self):
+        return f"{self.name}:{self.model_size}:{self.compute_type}"
+
+    @property
+    def options(self):
+        # Greedy-Dekodierung wie bei openai-whisper
+        return {"beam_size": 1}
+
+    def _load_model(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise ImportError("Für das Backend 'faster-whisper' muss das Paket faster-whisper installiert sein.")
+        return WhisperModel(
+            self.model_size,
+            device="cpu",
+            compute_type=self.compute_type,
+            cpu_threads=self.threads or 0,
+            download_root=self.model_root
+        )
+
+    def transcribe(self, samples, language=None, initial_prompt=None, word_timestamps=False):
+        options = dict(self.options, word_timestamps=True) if word_timestamps else self.options
+        segments, info = self.load().transcribe(samples, language=language, initial_prompt=initial_prompt, **options)
+        segments = list(segments)
+        result_segments = [{
+            "id": seg.id,
+            "seek": seg.seek,
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "tokens": list(seg.tokens),
+            "temperature": seg.temperature,
+            "avg_logprob": seg.avg_logprob,
+            "compression_ratio": seg.compression_ratio,
+            "no_speech_prob": seg.no_speech_prob
+        } for seg in segments]
+        if word_timestamps:
+            for result_segment, seg in zip(result_segments, segments):
+                result_segment["words"] = [{
+                    "word": word.word,
+                    "start": word.start,
+                    "end": word.end,
+                    "probability": word.probability
+                } for word in seg.words]
+        return {
+            "text": "".join(seg["text"] for seg in result_segments),
+            "language": info.language,
+            "segments": result_segments
+        }
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def create_backend(name=DEFAULT_BACKEND, model_size=DEFAULT_MODEL_SIZE, threads=None, model_root=None,
+                   batch_size=DEFAULT_BATCH_SIZE):
+    """Erzeugt ein Backend anhand seines Namens ("whisper" oder "faster-whisper")."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unbekanntes Transkriptions-Backend: {name}")
+    return BACKENDS[name](model_size=model_size, threads=threads, model_root=model_root, batch_size=batch_size)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    from .metrics import increment
+except ImportError:
+    from metrics import increment
+
+# Standardobergrenze für den Cache auf der Festplatte (256 MB)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_path():
+    """Pfad der Cache-Datenbank im Benutzerverzeichnis."""
+    return os.path.join(os.path.expanduser("~"), ".cache", "whatsapp_voice_processor", "transcriptions.db")
+
+
+def make_cache_key(samples, model_name, options):
+    """Erzeugt den Cache-Schlüssel aus dekodiertem Audio, Modellname und Dekodieroptionen."""
+    digest = hashlib.sha256()
+    digest.update(memoryview(samples).cast("B"))
+    digest.update(model_name.encode("utf-8"))
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """Persistenter Transkriptions-Cache (SQLite) mit Größenlimit und LRU-Verdrängung."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcriptions ("
+                "key TEXT PRIMARY KEY, model TEXT, value TEXT, size INTEGER, created REAL, last_access REAL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # Eine Verbindung pro Zugriff, damit Threads und Worker-Prozesse den Cache teilen können
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Gibt das zwischengespeicherte Ergebnis zurück oder None."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT value FROM transcriptions WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    increment("transcription_cache_misses")
+                    return None
+                conn.execute("UPDATE transcriptions SET last_access = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            # Ein defekter Cache darf die Transkription nicht verhindern
+            print(f"Transkriptions-Cache nicht lesbar: {e}")
+            return None
+        increment("transcription_cache_hits")
+        return json.loads(row[0])
+
+    def put(self, key, model_name, result):
+        """Speichert ein Ergebnis und verdrängt bei Bedarf die am längsten ungenutzten Einträge."""
+        value = json.dumps(result, ensure_ascii=False, default=float)
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcriptions VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model_name, value, len(value.encode("utf-8")), now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Transkriptions-Cache nicht beschreibbar: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcriptions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM transcriptions ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM transcriptions WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Gibt Anzahl, Gesamtgröße und Einträge pro Modell zurück."""
+        with self._connect() as conn:
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcriptions"
+            ).fetchone()
+            per_model = dict(conn.execute("SELECT model, COUNT(*) FROM transcriptions GROUP BY model").fetchall())
+        return {
+            "path": self.path,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            "models": per_model
+        }
+
+    def clear(self):
+        """Leert den Cache vollständig."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM transcriptions")
+        with self._connect() as conn:
+            conn.execute("VACUUM")
+
+
+_transcription_cache = None
+
+def get_transcription_cache():
+    """Gibt die gemeinsame Cache-Instanz zurück (wird beim ersten Zugriff angelegt)."""
+    global _transcription_cache
+    if _transcription_cache is None:
+        _transcription_cache = TranscriptionCache()
+    return _transcription_cache
+
+
+if __name__ == "__main__":
+    # Verwendung: python transcription_cache.py [stats|clear]
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_transcription_cache()
+    if command == "clear":
+        cache.clear()
+        print(f"Cache geleert: {cache.path}")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,143 @@
+import bisect
+
+import numpy as np
+
+# Rahmenlänge für die Energieanalyse in Millisekunden
+FRAME_MS = 30
+# Rahmen, die pro Schritt nach float32 gewandelt werden (begrenzt den Speicherbedarf)
+_FRAMES_PER_BLOCK = 2000
+# Sprache liegt mindestens so weit über dem Rauschboden (10. Perzentil der Rahmenenergie)
+SPEECH_MARGIN_DB = 12.0
+# Absolute Untergrenze, damit digitale Stille nie als Sprache gilt
+MIN_SPEECH_DB = -55.0
+
+
+def frame_energy_db(samples, sample_rate, frame_ms=FRAME_MS):
+    """Berechnet die RMS-Energie pro Rahmen in dB (vektorisiert, ohne Überlappung)."""
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    scale = 32768.0 if np.issubdtype(np.asarray(samples).dtype, np.integer) else 1.0
+    energies = np.empty(n_frames, dtype=np.float32)
+    block = _FRAMES_PER_BLOCK * frame_length
+    for start in range(0, n_frames * frame_length, block):
+        end = min(start + block, n_frames * frame_length)
+        frames = np.asarray(samples[start:end], dtype=np.float32).reshape(-1, frame_length) / scale
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        energies[start // frame_length:end // frame_length] = 20 * np.log10(np.maximum(rms, 1e-10))
+    return energies
+
+
+def detect_speech_regions(samples, sample_rate, min_speech=0.25, min_silence=0.5, padding=0.2, frame_ms=FRAME_MS):
+    """Energiebasierte Sprachaktivitätserkennung.
+
+    Die Schwelle passt sich dem Rauschboden der Aufnahme an. Pausen unter
+    min_silence werden überbrückt, Sprachstücke unter min_speech verworfen und
+    jede Region um padding Sekunden erweitert. Gibt eine Liste von
+    (start, end) in Sekunden zurück.
+    """
+    energies = frame_energy_db(samples, sample_rate, frame_ms)
+    if len(energies) == 0:
+        return []
+    threshold = max(float(np.percentile(energies, 10)) + SPEECH_MARGIN_DB, MIN_SPEECH_DB)
+    active = energies > threshold
+    if not np.any(active):
+        return []
+
+    frame_seconds = frame_ms / 1000.0
+    # Übergänge Stille->Sprache (+1) und Sprache->Stille (-1) finden
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1) * frame_seconds
+    ends = np.flatnonzero(edges == -1) * frame_seconds
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    duration = len(samples) / float(sample_rate)
+    padded = []
+    for start, end in regions:
+        if end - start < min_speech:
+            continue
+        start, end = max(0.0, start - padding), min(duration, end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((float(start), float(end)))
+    return padded
+
+
+class TimelineMap:
+    """Bildet Zeitpunkte im zusammengeschnittenen Sprach-Audio auf die Originalzeitachse ab."""
+
+    def __init__(self, regions):
+        self.regions = list(regions)
+        self._compact_starts = []
+        position = 0.0
+        for start, end in self.regions:
+            self._compact_starts.append(position)
+            position += end - start
+        self.compact_duration = position
+
+    def to_original(self, t, end=False):
+        """Zeitpunkt t im Sprach-Audio auf der Originalzeitachse.
+
+        Mit end=True ist t ein Ende: fällt es genau auf den Übergang zweier Regionen,
+        bleibt es am Ende der vorigen Region, statt hinter die entfernte Pause zu springen.
+        """
+        if not self.regions:
+            return t
+        find = bisect.bisect_left if end else bisect.bisect_right
+        index = max(0, find(self._compact_starts, t) - 1)
+        start, end = self.regions[index]
+        return min(end, start + (t - self._compact_starts[index]))
+
+
+def compact_speech(samples, sample_rate, regions):
+    """Schneidet die Sprachregionen aneinander und gibt (samples, TimelineMap) zurück."""
+    bounds = [(int(start * sample_rate), int(end * sample_rate)) for start, end in regions]
+    pieces = [samples[start:end] for start, end in bounds]
+    # Zeitachse aus den tatsächlich geschnittenen Samples, damit Rundung nicht driftet
+    exact = [(start / float(sample_rate), (start + len(piece)) / float(sample_rate))
+             for (start, _), piece in zip(bounds, pieces)]
+    return (np.concatenate(pieces) if pieces else samples[:0]), TimelineMap(exact)
+
+
+def pause_gaps(speech_regions, min_pause):
+    """Gibt die Sprechpausen (Lücken zwischen Sprachregionen) zurück, die mindestens min_pause lang sind."""
+    return [(speech_regions[i][1], speech_regions[i + 1][0])
+            for i in range(len(speech_regions) - 1)
+            if speech_regions[i + 1][0] - speech_regions[i][1] >= min_pause]
+
+
+def find_window_boundaries(samples, sample_rate, window_seconds=30.0, search_seconds=5.0, frame_ms=FRAME_MS):
+    """Teilt ein Signal in Fenster von höchstens window_seconds, geschnitten in der leisesten Stelle.
+
+    Für jedes Fenster wird nur der Suchbereich vor dem Fensterende analysiert,
+    damit auch sehr lange Aufnahmen mit konstantem Speicherbedarf geteilt werden.
+    Gibt eine Liste von (start_sample, end_sample) zurück.
+    """
+    total = len(samples)
+    window = int(window_seconds * sample_rate)
+    search = min(int(search_seconds * sample_rate), window // 2)
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+
+    boundaries = []
+    start = 0
+    while start < total:
+        end = start + window
+        if end >= total:
+            boundaries.append((start, total))
+            break
+        region_start = end - search
+        energies = frame_energy_db(samples[region_start:end], sample_rate, frame_ms)
+        if len(energies):
+            # Schnitt in der Mitte des leisesten Rahmens, damit kein Wort zerteilt wird
+            end = region_start + int(np.argmin(energies)) * frame_length + frame_length // 2
+        boundaries.append((start, end))
+        start = end
+    return boundaries
@@ -0,0 +1,253 @@
+# Batch-Dekodierung für openai-whisper über mehrere Dateien hinweg.
+#
+# Bildet die Schleife aus whisper.transcribe() (Standardoptionen, ohne Wort-Zeitstempel)
+# nach, verarbeitet aber die aktuellen 30s-Fenster aller Anfragen gemeinsam: der Encoder
+# läuft einmal über den ganzen Batch, der Decoder je Gruppe mit gleicher Sprache und
+# gleich langem Prompt. Bei Temperatur 0 entstehen dieselben Tokens, Segmente und
+# Zeitstempel wie beim Aufruf von transcribe() pro Datei; nur die Temperatur-Fallbacks
+# laufen einzeln.
+#
+# Ab dem zweiten Fenster ist der Prompt (der bisherige Text) je Datei verschieden.
+# whisper kennt nur einen Prompt pro decode()-Aufruf und keine Auffüllung, daher
+# bekommt jede Zeile ihre eigenen Start-Tokens (_row_prompt_task); das geht nur bei
+# gleicher Länge. Whisper kürzt den Prompt auf n_text_ctx // 2 - 1 Tokens, nach
+# wenigen Fenstern sind die Prompts aller längeren Aufnahmen also gleich lang und
+# laufen wieder gemeinsam. Bis dahin dekodieren Fenster mit unterschiedlich langem
+# Prompt in getrennten (oft einelementigen) Gruppen.
+
+from dataclasses import replace
+
+# Standardwerte von whisper.transcribe()
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+def _needs_fallback(result):
+    needs_fallback = (result.compression_ratio > COMPRESSION_RATIO_THRESHOLD
+                      or result.avg_logprob < LOGPROB_THRESHOLD)
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        needs_fallback = False  # Stille
+    return needs_fallback
+
+
+class _BatchItem:
+    """Zustand einer Anfrage über die Fenster hinweg (entspricht den lokalen Variablen in transcribe())."""
+
+    def __init__(self, model, samples, language, initial_prompt):
+        from whisper.audio import N_FRAMES, N_SAMPLES, log_mel_spectrogram
+
+        self.mel = log_mel_spectrogram(samples, model.dims.n_mels, padding=N_SAMPLES)
+        self.content_frames = self.mel.shape[-1] - N_FRAMES
+        self.language = language
+        self.initial_prompt = initial_prompt
+        self.seek = 0
+        self.all_tokens = []
+        self.all_segments = []
+        self.prompt_reset_since = 0
+        self.initial_prompt_tokens = []
+        self.tokenizer = None
+
+    @property
+    def active(self):
+        return self.seek < self.content_frames
+
+    def set_language(self, model, language):
+        from whisper.tokenizer import get_tokenizer
+
+        self.language = language
+        self.tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                       language=language, task="transcribe")
+        if self.initial_prompt:
+            self.initial_prompt_tokens = self.tokenizer.encode(" " + self.initial_prompt.strip())
+            self.all_tokens.extend(self.initial_prompt_tokens)
+
+    @property
+    def prompt(self):
+        return self.all_tokens[self.prompt_reset_since:]
+
+    def window(self):
+        """Mel-Fenster ab der aktuellen Position (auf 30s aufgefüllt) und dessen Länge in Frames."""
+        from whisper.audio import N_FRAMES, pad_or_trim
+
+        segment_size = min(N_FRAMES, self.content_frames - self.seek)
+        return pad_or_trim(self.mel[:, self.seek:self.seek + segment_size], N_FRAMES), segment_size
+
+    def apply(self, result, segment_size, input_stride):
+        """Übernimmt das Dekodierergebnis eines Fensters und rückt die Position weiter."""
+        from whisper.audio import HOP_LENGTH, SAMPLE_RATE
+
+        tokenizer = self.tokenizer
+        time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+        time_offset = float(self.seek * HOP_LENGTH / SAMPLE_RATE)
+        segment_duration = segment_size * HOP_LENGTH / SAMPLE_RATE
+        tokens = list(result.tokens)
+
+        should_skip = result.no_speech_prob > NO_SPEECH_THRESHOLD
+        if result.avg_logprob > LOGPROB_THRESHOLD:
+            should_skip = False
+        if should_skip:
+            self.seek += segment_size
+            return
+
+        def new_segment(start, end, segment_tokens):
+            text_tokens = [token for token in segment_tokens if token < tokenizer.eot]
+            return {
+                "seek": self.seek,
+                "start": start,
+                "end": end,
+                "text": tokenizer.decode(text_tokens),
+                "tokens": segment_tokens,
+                "temperature": result.temperature,
+                "avg_logprob": result.avg_logprob,
+                "compression_ratio": result.compression_ratio,
+                "no_speech_prob": result.no_speech_prob,
+            }
+
+        is_timestamp = [token >= tokenizer.timestamp_begin for token in tokens]
+        single_timestamp_ending = is_timestamp[-2:] == [False, True]
+        consecutive = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+
+        current_segments = []
+        if consecutive:
+            slices = consecutive + ([len(tokens)] if single_timestamp_ending else [])
+            last_slice = 0
+            for current_slice in slices:
+                sliced_tokens = tokens[last_slice:current_slice]
+                start_timestamp_pos = sliced_tokens[0] - tokenizer.timestamp_begin
+                end_timestamp_pos = sliced_tokens[-1] - tokenizer.timestamp_begin
+                current_segments.append(new_segment(
+                    time_offset + start_timestamp_pos * time_precision,
+                    time_offset + end_timestamp_pos * time_precision,
+                    sliced_tokens
+                ))
+                last_slice = current_slice
+            if single_timestamp_ending:
+                self.seek += segment_size
+            else:
+                # Unvollständiges letztes Segment verwerfen und am letzten Zeitstempel weitermachen
+                self.seek += (tokens[last_slice - 1] - tokenizer.timestamp_begin) * input_stride
+        else:
+            duration = segment_duration
+            timestamps = [token for token, flag in zip(tokens, is_timestamp) if flag]
+            if timestamps and timestamps[-1] != tokenizer.timestamp_begin:
+                duration = (timestamps[-1] - tokenizer.timestamp_begin) * time_precision
+            current_segments.append(new_segment(time_offset, time_offset + duration, tokens))
+            self.seek += segment_size
+
+        for segment in current_segments:
+            if segment["start"] == segment["end"] or segment["text"].strip() == "":
+                segment["text"] = ""
+                segment["tokens"] = []
+                segment["words"] = []
+        self.all_segments.extend(
+            {"id": i, **segment} for i, segment in enumerate(current_segments, start=len(self.all_segments))
+        )
+        self.all_tokens.extend(token for segment in current_segments for token in segment["tokens"])
+        if result.temperature > 0.5:
+            self.prompt_reset_since = len(self.all_tokens)
+
+    def result(self):
+        return {
+            "text": self.tokenizer.decode(self.all_tokens[len(self.initial_prompt_tokens):]),
+            "language": self.language,
+            "segments": self.all_segments,
+        }
+
+
+def _prompt_groups(items, n_text_ctx):
+    """Gruppiert die Indizes offener Anfragen nach Sprache und wirksamer Prompt-Länge.
+
+    Whisper verwendet höchstens die letzten n_text_ctx // 2 - 1 Prompt-Tokens; ein
+    leerer Prompt bildet eine eigene Gruppe (ohne sot_prev-Token).
+    """
+    max_prompt = n_text_ctx // 2 - 1
+    groups = {}
+    for index, item in enumerate(items):
+        groups.setdefault((item.language, min(len(item.prompt), max_prompt)), []).append(index)
+    return groups
+
+
+_row_prompt_task_class = None
+
+
+def _row_prompt_task():
+    """DecodingTask, bei dem jede Zeile des Batches ihren eigenen, gleich langen Prompt trägt.
+
+    Whisper baut die Start-Tokens aus options.prompt für alle Zeilen; hier werden sie
+    vor der Dekodierschleife zeilenweise ersetzt. Bei gleicher Länge bleiben
+    sample_begin und sot_index für alle Zeilen gültig.
+    """
+    global _row_prompt_task_class
+    if _row_prompt_task_class is None:
+        import torch
+        from whisper.decoding import DecodingTask
+
+        class RowPromptTask(DecodingTask):
+            def __init__(self, model, options, prompts):
+                super().__init__(model, replace(options, prompt=prompts[0]))
+                self.row_tokens = []
+                for prompt in prompts:
+                    self.options = replace(self.options, prompt=prompt)
+                    self.row_tokens.append(self._get_initial_tokens())
+
+            def _main_loop(self, audio_features, tokens):
+                rows = torch.tensor(self.row_tokens).repeat_interleave(self.n_group, dim=0).to(tokens.device)
+                return super()._main_loop(audio_features, rows)
+
+        _row_prompt_task_class = RowPromptTask
+    return _row_prompt_task_class
+
+
+def _decode_group(model, features, options, prompts):
+    if all(prompt == prompts[0] for prompt in prompts):
+        return model.decode(features, replace(options, prompt=list(prompts[0])))
+    import torch
+    with torch.no_grad():
+        return _row_prompt_task()(model, options, [list(prompt) for prompt in prompts]).run(features)
+
+
+def transcribe_batch(model, requests):
+    """Transkribiert mehrere Anfragen (Dicts mit samples, language, initial_prompt) gemeinsam."""
+    import torch
+    from whisper.audio import N_FRAMES, pad_or_trim
+    from whisper.decoding import DecodingOptions
+    from whisper.utils import exact_div
+
+    input_stride = exact_div(N_FRAMES, model.dims.n_audio_ctx)
+    items = [_BatchItem(model, request["samples"], request.get("language"), request.get("initial_prompt"))
+             for request in requests]
+
+    # Sprache wie in transcribe() aus den ersten 30s erkennen, für alle offenen Anfragen in einem Durchlauf
+    undetected = [item for item in items if item.language is None]
+    if undetected and model.is_multilingual:
+        mels = torch.stack([pad_or_trim(item.mel, N_FRAMES) for item in undetected]).to(model.device)
+        _, probs = model.detect_language(mels)
+        for item, item_probs in zip(undetected, probs):
+            item.set_language(model, max(item_probs, key=item_probs.get))
+    for item in items:
+        if item.tokenizer is None:
+            item.set_language(model, item.language or "en")
+
+    active = [item for item in items if item.active]
+    while active:
+        windows = [item.window() for item in active]
+        with torch.no_grad():
+            features = model.embed_audio(torch.stack([mel for mel, _ in windows]).to(model.device).to(torch.float32))
+
+        # Der Decoder teilt die Sprache über den Batch, Prompts müssen gleich lang sein
+        for (language, _), indices in _prompt_groups(active, model.dims.n_text_ctx).items():
+            options = DecodingOptions(language=language, temperature=0.0, fp16=False)
+            results = _decode_group(model, features[indices], options, [active[index].prompt for index in indices])
+            for index, result in zip(indices, results):
+                prompt = active[index].prompt
+                for temperature in TEMPERATURES[1:]:
+                    if not _needs_fallback(result):
+                        break
+                    options = DecodingOptions(language=language, prompt=list(prompt), temperature=temperature, fp16=False)
+                    result = model.decode(features[index], options)
+                active[index].apply(result, windows[index][1], input_stride)
+        active = [item for item in active if item.active]
+
+    return [item.result() for item in items]
@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+import zipfile
+
+try:
+    from .segment_pack import referenced_files
+except ImportError:
+    from segment_pack import referenced_files
+
+# Audio ist bereits komprimiert bzw. (WAV) kaum komprimierbar und wird unverändert gespeichert
+STORED_EXTENSIONS = {".wav", ".flac", ".ogg", ".opus", ".mp3", ".m4a", ".aac", ".wma", ".zip"}
+# Dateien werden in Blöcken dieser Größe ins Archiv kopiert; beim Streaming ist das die größte Portion im Speicher
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def compression_for(name):
+    """ZIP_STORED für Audiodateien, ZIP_DEFLATED für alles andere (CSV, JSON)."""
+    if os.path.splitext(name)[1].lower() in STORED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ChunkBuffer:
+    """Nicht seekbares Schreibziel, das die geschriebenen Bytes bis zum Abholen sammelt."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStreamWriter:
+    """Schreibt ein ZIP-Archiv fortlaufend, ohne es im Speicher aufzubauen oder Ordner zu durchsuchen.
+
+    Ohne fileobj landen die Bytes in einem Puffer, den iter_result() nach jedem
+    kopierten Block (COPY_BLOCK_SIZE) leert, z. B. für eine HTTP-Antwort; auch ein
+    großes Segmentpaket liegt so nie vollständig im Speicher. Das Ziel muss nicht
+    seekbar sein; zipfile schreibt die Größen dann hinter jede Datei. Dateien
+    werden nach und nach hinzugefügt, sobald ihr Ergebnis vorliegt.
+    """
+
+    def __init__(self, fileobj=None):
+        self._buffer = _ChunkBuffer() if fileobj is None else None
+        self._zip = zipfile.ZipFile(fileobj if fileobj is not None else self._buffer, "w")
+        self._names = set()
+
+    def _unique_name(self, arcname):
+        # Gleichnamige Eingabedateien (z. B. aus verschiedenen Uploads) nicht überschreiben
+        base, ext = os.path.splitext(arcname)
+        name, counter = arcname, 2
+        while name in self._names:
+            name = f"{base}_{counter}{ext}"
+            counter += 1
+        self._names.add(name)
+        return name
+
+    def add_file(self, path, arcname=None):
+        """Fügt eine Datei hinzu und gibt ihren Namen im Archiv zurück."""
+        arcname = self._unique_name(arcname or os.path.basename(path))
+        for _ in self._copy_file(path, arcname):
+            pass
+        return arcname
+
+    def _copy_file(self, path, arcname):
+        # Blockweise kopieren und nach jedem Block anhalten, damit der Puffer geleert werden kann
+        info = zipfile.ZipInfo.from_file(path, arcname)
+        info.compress_type = compression_for(arcname)
+        with open(path, "rb") as src, self._zip.open(info, "w") as dest:
+            for block in iter(lambda: src.read(COPY_BLOCK_SIZE), b""):
+                dest.write(block)
+                yield
+        yield
+
+    def add_bytes(self, arcname, data):
+        arcname = self._unique_name(arcname)
+        self._zip.writestr(arcname, data, compress_type=compression_for(arcname))
+        return arcname
+
+    def add_result(self, result):
+        """Fügt CSV, Segmentdateien und result.json eines erfolgreichen Ergebnisses hinzu.
+
+        Die Segmentdateien werden der CSV entnommen, der Ergebnisordner wird nicht durchsucht;
+        ein Segmentpaket wird samt Index einmal hinzugefügt.
+        """
+        for _ in self._add_result(result):
+            pass
+
+    def iter_result(self, result):
+        """Wie add_result(), liefert aber die geschriebenen Bytes nach jedem Block (nur ohne fileobj)."""
+        for _ in self._add_result(result):
+            chunk = self.read_chunk()
+            if chunk:
+                yield chunk
+
+    def _add_result(self, result):
+        result_dir, csv_path = result["result_dir"], result["csv_path"]
+        folder = self._unique_name(os.path.basename(result_dir))
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            audio_files = [row["audio_file"] for row in csv.DictReader(f)]
+        yield from self._copy_file(csv_path, self._unique_name(f"{folder}/{os.path.basename(csv_path)}"))
+        for audio_file in referenced_files(audio_files):
+            yield from self._copy_file(os.path.join(result_dir, audio_file), self._unique_name(f"{folder}/{audio_file}"))
+        summary = {key: value for key, value in result.items() if key not in ("result_dir", "csv_path")}
+        self.add_bytes(f"{folder}/result.json",
+                       json.dumps(summary, ensure_ascii=False, indent=2, default=float).encode("utf-8"))
+        yield
+
+    def read_chunk(self):
+        """Gibt die seit dem letzten Aufruf geschriebenen Bytes zurück (nur ohne fileobj)."""
+        return self._buffer.drain() if self._buffer is not None else b""
+
+    def close(self):
+        """Schreibt das Inhaltsverzeichnis; bei gepuffertem Schreiben danach read_chunk() aufrufen."""
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_zip_chunks(results):
+    """Erzeugt das ZIP-Archiv der Ergebnisse stückweise, während results noch geliefert werden.
+
+    Fehlerhafte Ergebnisse werden übersprungen. Geeignet als Body einer Streaming-Antwort.
+    """
+    writer = ZipStreamWriter()
+    for result in results:
+        if result.get("status") != "success":
+            continue
+        yield from writer.iter_result(result)
+    writer.close()
+    yield writer.read_chunk()
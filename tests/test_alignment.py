@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src.alignment import BoundaryAligner, iter_aligned_segments
+from src.audio_processor import AudioBuffer, save_segments_and_csv, segment_audio_intelligent
+
+
+def _tone_with_gaps(sr=16000):
+    # Ton 1.0-2.0s und 3.0-4.0s, dazwischen leises Rauschen
+    rng = np.random.default_rng(0)
+    samples = rng.standard_normal(sr * 5) * 20
+    t = np.arange(sr) / sr
+    samples[sr:2 * sr] += np.sin(2 * np.pi * 300 * t) * 8000
+    samples[3 * sr:4 * sr] += np.sin(2 * np.pi * 300 * t) * 8000
+    return samples.astype(np.int16)
+
+
+class TestAlignment(unittest.TestCase):
+    def test_refine_moves_cuts_into_silence(self):
+        aligner = BoundaryAligner(_tone_with_gaps(), 16000, search_seconds=0.3)
+        # Grob geschätzte Wortgrenzen schneiden 0.1s vom Ton ab
+        starts, ends = aligner.refine([1.1, 3.1], [1.9, 3.9])
+        self.assertTrue(0.8 <= starts[0] <= 1.0)
+        self.assertTrue(2.0 <= ends[0] <= 2.2)
+        self.assertTrue(2.8 <= starts[1] <= 3.0)
+        # Begrenzung durch das Nachbarsegment
+        starts, ends = aligner.refine([1.1], [1.9], upper=[1.95])
+        self.assertLessEqual(ends[0], 1.95)
+
+    def test_aligned_segments_do_not_overlap(self):
+        segments = [
+            {'start_time': 1.1, 'end_time': 2.6, 'text': 'a',
+             'words': [{'word': 'a', 'start': 1.1, 'end': 1.9}]},
+            {'start_time': 2.6, 'end_time': 3.9, 'text': 'b',
+             'words': [{'word': 'b', 'start': 2.05, 'end': 3.9}]},
+        ]
+        aligned = list(iter_aligned_segments(_tone_with_gaps(), 16000, iter(segments)))
+        self.assertLessEqual(aligned[0]['end_time'], 2.05)
+        self.assertGreaterEqual(aligned[1]['start_time'], aligned[0]['end_time'])
+        self.assertLessEqual(aligned[1]['end_time'], 5.0)
+
+    def test_segments_are_refined_per_window(self):
+        samples = np.tile(_tone_with_gaps(), 3)
+        segments = [{'start_time': t + 0.1, 'end_time': t + 0.9, 'text': str(i),
+                     'words': [{'word': str(i), 'start': t + 0.1, 'end': t + 0.9}]}
+                    for i, t in enumerate([1.0, 3.0, 6.0, 8.0, 11.0, 13.0])]
+        refine = BoundaryAligner.refine
+        with patch.object(BoundaryAligner, 'refine', autospec=True, side_effect=refine) as mock_refine:
+            aligned = list(iter_aligned_segments(samples, 16000, iter(segments), window=4))
+        # Sechs Segmente, Fenster zu vier: ein Aufruf pro Fenster statt pro Segment
+        self.assertEqual(mock_refine.call_count, 2)
+        self.assertEqual(len(aligned), 6)
+        for previous, seg in zip(aligned, aligned[1:]):
+            self.assertGreaterEqual(seg['start_time'], previous['end_time'])
+        for seg in aligned:
+            word = seg['words'][0]
+            self.assertTrue(word['start'] - 0.3 <= seg['start_time'] <= word['start'])
+            self.assertTrue(word['end'] <= seg['end_time'] <= word['end'] + 0.31)
+
+    def test_word_timings_in_segments_and_csv(self):
+        audio = AudioBuffer(_tone_with_gaps())
+        transcription = {'segments': [
+            {'start': 0.5, 'end': 2.5, 'text': ' Hallo Welt',
+             'words': [{'word': ' Hallo', 'start': 1.05, 'end': 1.5, 'probability': 0.9},
+                       {'word': ' Welt', 'start': 1.5, 'end': 1.9, 'probability': 0.8}]}
+        ]}
+        segments = segment_audio_intelligent(audio, transcription, 'sentence', align=True)
+        self.assertEqual([w['word'] for w in segments[0]['words']], ['Hallo', 'Welt'])
+        self.assertTrue(0.7 <= segments[0]['start_time'] <= 1.05)
+        self.assertTrue(1.9 <= segments[0]['end_time'] <= 2.25)
+        with tempfile.TemporaryDirectory() as output_root:
+            _, csv_path = save_segments_and_csv('memo.wav', audio, segments, output_root=output_root)
+            with open(csv_path, encoding='utf-8') as f:
+                row = next(csv.DictReader(f))
+        self.assertEqual(json.loads(row['words'])[1], {'word': 'Welt', 'start': 1.5, 'end': 1.9})
+        unaligned = segment_audio_intelligent(audio, transcription, 'sentence', align=False)
+        self.assertEqual(unaligned[0]['start_time'], 0.5)
+        self.assertTrue(os.path.basename(csv_path).endswith('_segments.csv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+
+from src.batch_manifest import BatchManifest, file_key
+from src.audio_processor import EXPORT_CONFIG, TRANSCRIPTION_CONFIG, PipelineConfig
+from src.batch_processor import process_file
+
+TRANSCRIPTION = {'text': 'Hallo Welt', 'language': 'de',
+                 'segments': [{'start': 0.0, 'end': 1.0, 'text': 'Hallo Welt'}]}
+SEGMENTS = [{'start_time': 0.0, 'end_time': 1.0, 'text': 'Hallo Welt', 'type': 'sentence'}]
+
+
+class TestBatchManifest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manifest = BatchManifest(os.path.join(self.temp_dir.name, 'manifest.db'))
+        self.output_root = os.path.join(self.temp_dir.name, 'out')
+        self.audio_path = os.path.join(self.temp_dir.name, 'memo.wav')
+        t = np.arange(16000) / 16000.0
+        sf.write(self.audio_path, 0.3 * np.sin(2 * np.pi * 440 * t), 16000, subtype='PCM_16')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_depends_on_content_and_segmentation(self):
+        key = file_key(self.audio_path, 'sentence')
+        self.assertNotEqual(key, file_key(self.audio_path, 'paragraph'))
+        copy_path = os.path.join(self.temp_dir.name, 'kopie.wav')
+        with open(self.audio_path, 'rb') as src, open(copy_path, 'wb') as dst:
+            dst.write(src.read())
+        self.assertEqual(key, file_key(copy_path, 'sentence'))
+
+    def test_record_merges_data_and_timings(self):
+        self.manifest.record('k', '/tmp/a.ogg', 'transcribed', 1.5, transcription=TRANSCRIPTION)
+        self.manifest.record('k', '/tmp/a.ogg', 'segmented', 0.25, segments=SEGMENTS)
+        entry = self.manifest.get('k')
+        self.assertEqual(entry['stage'], 'segmented')
+        self.assertEqual(entry['timings'], {'transcribed': 1.5, 'segmented': 0.25})
+        self.assertEqual(self.manifest.resume_state('k'), {'transcription': TRANSCRIPTION, 'segments': SEGMENTS})
+        self.assertIsNone(self.manifest.completed_result('k'))
+        self.assertEqual(self.manifest.stats(), {'segmented': 1})
+
+    def test_interrupted_file_resumes_and_finished_file_is_skipped(self):
+        with patch('src.audio_processor.transcribe_audio', return_value=TRANSCRIPTION) as transcribe, \
+             patch('src.audio_processor.segment_audio_intelligent', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                process_file(self.audio_path, output_root=self.output_root, manifest=self.manifest)
+        self.assertEqual(transcribe.call_count, 1)
+
+        # Zweiter Lauf: die gespeicherte Transkription wird übernommen
+        stages = []
+        with patch('src.audio_processor.transcribe_audio') as transcribe, \
+             patch('src.audio_processor.segment_audio_intelligent', return_value=SEGMENTS):
+            result = process_file(self.audio_path, output_root=self.output_root, manifest=self.manifest,
+                                  on_stage=lambda stage, **info: stages.append((stage, info.get('resumed'))))
+        transcribe.assert_not_called()
+        self.assertIn(('transcribed', True), stages)
+        self.assertEqual(result['transcription'], TRANSCRIPTION)
+        self.assertTrue(os.path.exists(result['csv_path']))
+
+        # Dritter Lauf: die Datei ist fertig und wird übersprungen
+        stages = []
+        with patch('src.audio_processor.load_audio') as load:
+            skipped = process_file(self.audio_path, output_root=self.output_root, manifest=self.manifest,
+                                   on_stage=lambda stage, **info: stages.append(stage))
+        load.assert_not_called()
+        self.assertEqual(stages, ['skipped'])
+        self.assertTrue(skipped['skipped'])
+        self.assertEqual(skipped['csv_path'], result['csv_path'])
+
+        # Fehlt die CSV, wird die Datei erneut exportiert
+        key = file_key(self.audio_path, 'sentence', PipelineConfig().fingerprint())
+        self.assertIsNotNone(self.manifest.completed_result(key))
+        os.remove(result['csv_path'])
+        self.assertIsNone(self.manifest.completed_result(key))
+
+    def test_other_settings_or_output_root_are_not_skipped(self):
+        with patch('src.audio_processor.transcribe_audio', return_value=TRANSCRIPTION), \
+             patch('src.audio_processor.segment_audio_intelligent', return_value=SEGMENTS):
+            result = process_file(self.audio_path, output_root=self.output_root, manifest=self.manifest)
+        self.assertNotEqual(PipelineConfig().fingerprint(), PipelineConfig(model_size='large').fingerprint())
+        self.assertEqual(PipelineConfig().fingerprint(), PipelineConfig(threads=8, export_sample_rate=0).fingerprint())
+
+        def run(output_root):
+            with patch('src.audio_processor.transcribe_audio', return_value=TRANSCRIPTION) as transcribe, \
+                 patch('src.audio_processor.segment_audio_intelligent', return_value=SEGMENTS):
+                rerun = process_file(self.audio_path, output_root=output_root, manifest=self.manifest)
+            return rerun, transcribe.call_count
+
+        # Ergebnis liegt in einem anderen Ordner: neu exportieren, nicht fremde Pfade zurückgeben
+        other_root = os.path.join(self.temp_dir.name, 'anderswo')
+        rerun, calls = run(other_root)
+        self.assertFalse(rerun.get('skipped'))
+        self.assertTrue(rerun['csv_path'].startswith(other_root))
+        # Anderes Segmentformat: neu transkribieren statt das alte Ergebnis zu melden
+        with patch.dict(TRANSCRIPTION_CONFIG), patch.dict(EXPORT_CONFIG, {'format': 'flac'}):
+            rerun, calls = run(self.output_root)
+        self.assertFalse(rerun.get('skipped'))
+        self.assertEqual(calls, 1)
+        self.assertEqual(rerun['segment_format'], 'flac')
+        # Der Eintrag zeigt jetzt auf den letzten Lauf mit diesen Einstellungen
+        self.assertTrue(run(other_root)[0]['skipped'])
+        self.assertEqual(result['segment_format'], 'wav')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+
+from src import batch_processor
+from src.audio_processor import TRANSCRIPTION_CONFIG
+from src.batch_processor import BatchProcessor
+from src.transcription_backends import BACKENDS, TranscriptionBackend
+from src.transcription_cache import TranscriptionCache
+
+
+class FakeBackend(TranscriptionBackend):
+    """Backend ohne Modell: ein Satz pro Aufnahme, lange Aufnahmen dauern länger, Stille schlägt fehl.
+
+    Eine Aufnahme von genau 0,75s beendet den Worker-Prozess hart (Absturz). Ist
+    FAKE_BACKEND_GATE gesetzt, wartet jede Transkription, bis diese Datei existiert.
+    """
+
+    name = "fake"
+
+    def _load_model(self):
+        return object()
+
+    def transcribe(self, samples, language=None, initial_prompt=None, word_timestamps=False, **kwargs):
+        gate = os.environ.get("FAKE_BACKEND_GATE")
+        deadline = time.monotonic() + 30
+        while gate and not os.path.exists(gate) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if not np.any(samples):
+            raise RuntimeError("kein Signal")
+        duration = len(samples) / 16000.0
+        if len(samples) == 12000:
+            os._exit(1)
+        if duration > 1.5:
+            time.sleep(1.0)
+        return {"text": " Hallo Welt.", "language": "de",
+                "segments": [{"start": 0.0, "end": duration, "text": " Hallo Welt."}]}
+
+    def transcribe_batch(self, requests):
+        # Die Batchgröße landet im Text, damit der Test sie im Hauptprozess sieht
+        results = super().transcribe_batch(requests)
+        for result in results:
+            if not isinstance(result, Exception):
+                result["text"] = f" Batch {len(requests)}."
+        return results
+
+
+class TestBatchProcessor(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        # Die Worker entstehen per fork und übernehmen Backend-Registrierung, Konfiguration und Cache
+        for patcher in (patch.dict(BACKENDS, {"fake": FakeBackend}),
+                        patch.dict(TRANSCRIPTION_CONFIG, {"model_server": False}),
+                        patch("src.transcription_cache._transcription_cache",
+                              TranscriptionCache(os.path.join(self.temp_dir.name, "cache.db")))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _write(self, name, seconds, silent=False, frequency=440):
+        path = os.path.join(self.temp_dir.name, name)
+        t = np.arange(int(16000 * seconds)) / 16000.0
+        signal = np.zeros_like(t) if silent else 0.3 * np.sin(2 * np.pi * frequency * t)
+        sf.write(path, signal, 16000, subtype="PCM_16")
+        return path
+
+    def _run(self, processor, files, while_running=None):
+        results = []
+        thread = threading.Thread(target=lambda: results.extend(processor.iter_results(files)), daemon=True)
+        thread.start()
+        if while_running is not None:
+            while_running()
+        thread.join(timeout=120)
+        self.assertFalse(thread.is_alive(), "Stapellauf hängt")
+        return results
+
+    def test_results_stream_in_completion_order_with_errors(self):
+        files = [self._write("lang.wav", 2.0)]
+        files += [self._write(f"kurz_{i}.wav", 0.5) for i in range(4)]
+        files.append(self._write("still.wav", 0.5, silent=True))
+        broken = os.path.join(self.temp_dir.name, "kaputt.ogg")
+        with open(broken, "wb") as f:
+            f.write(b"kein Audio")
+        files.append(broken)
+
+        processor = BatchProcessor(workers=2, prefetch=1, backend="fake", vad=False,
+                                   output_root=os.path.join(self.temp_dir.name, "out"))
+        gate = os.path.join(self.temp_dir.name, "gate")
+        started = []
+        prepare_file = batch_processor._prepare_file
+
+        def counting_prepare(file_path, *args, **kwargs):
+            started.append(file_path)
+            return prepare_file(file_path, *args, **kwargs)
+
+        def open_gate():
+            # Solange keine Transkription fertig wird, dekodiert der Hauptprozess nur Worker plus Vorlauf Dateien
+            time.sleep(0.5)
+            self.assertEqual(len(started), processor.workers + processor.prefetch)
+            open(gate, "w").close()
+
+        with patch("src.batch_processor._prepare_file", side_effect=counting_prepare), \
+                patch.dict(os.environ, {"FAKE_BACKEND_GATE": gate}):
+            results = self._run(processor, files, open_gate)
+
+        by_name = {result["original_filename"]: result for result in results}
+        self.assertEqual(len(results), len(files))
+        self.assertEqual(set(by_name), {os.path.basename(path) for path in files})
+        self.assertEqual(by_name["kaputt.ogg"]["status"], "error")
+        self.assertEqual(by_name["still.wav"]["status"], "error")
+        for name in ["lang.wav"] + [f"kurz_{i}.wav" for i in range(4)]:
+            self.assertEqual(by_name[name]["status"], "success")
+            self.assertTrue(os.path.exists(by_name[name]["csv_path"]))
+        # Die lange Aufnahme kam zuerst, wird aber nicht zuerst fertig
+        self.assertNotEqual(results[0]["original_filename"], "lang.wav")
+
+    def test_crashed_worker_yields_error_result(self):
+        files = [self._write("absturz.wav", 0.75)] + [self._write(f"kurz_{i}.wav", 0.5) for i in range(3)]
+        processor = BatchProcessor(workers=2, backend="fake", vad=False,
+                                   output_root=os.path.join(self.temp_dir.name, "out"))
+        results = self._run(processor, files)
+        # Ein abgestürzter Worker legt den Pool lahm; jede Datei bekommt trotzdem genau ein Ergebnis
+        self.assertEqual(sorted(result["original_filename"] for result in results),
+                         sorted(os.path.basename(path) for path in files))
+        crashed = next(result for result in results if result["original_filename"] == "absturz.wav")
+        self.assertEqual(crashed["status"], "error")
+
+
+    def test_batch_mode_transcribes_files_together(self):
+        # Verschiedene Töne, damit keine Datei aus dem Transkriptions-Cache kommt
+        files = [self._write(f"kurz_{i}.wav", 0.5, frequency=300 + 100 * i) for i in range(5)]
+        broken = os.path.join(self.temp_dir.name, "kaputt.ogg")
+        with open(broken, "wb") as f:
+            f.write(b"kein Audio")
+        files.insert(2, broken)
+        processor = BatchProcessor(workers=2, backend="fake", vad=False, batch_size=3,
+                                   output_root=os.path.join(self.temp_dir.name, "out"))
+        results = self._run(processor, files)
+        self.assertEqual(len(results), len(files))
+        by_name = {result["original_filename"]: result for result in results}
+        self.assertEqual(by_name.pop("kaputt.ogg")["status"], "error")
+        self.assertTrue(all(result["status"] == "success" for result in by_name.values()))
+        # Fünf dekodierbare Dateien: ein voller Batch und der Rest, sobald alle vorbereitet sind
+        self.assertEqual(sorted(result["transcription"]["text"] for result in by_name.values()),
+                         [" Batch 2."] * 2 + [" Batch 3."] * 3)
+        self.assertTrue(all(os.path.exists(result["csv_path"]) for result in by_name.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
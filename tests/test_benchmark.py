@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_run_benchmark_times_every_stage(self):
+        with tempfile.TemporaryDirectory() as corpus_dir, \
+                patch.dict(benchmark.CORPUS_SIZES, {'short': 3}):
+            files = benchmark.build_corpus(corpus_dir, sizes=['short'], formats=['wav'])
+            self.assertEqual([os.path.basename(f) for f in files], ['short.wav'])
+            results = benchmark.run_benchmark(files, transcribe=False)
+        result = results['files'][0]
+        self.assertEqual(set(result['stages']), set(benchmark.STAGES))
+        self.assertAlmostEqual(result['audio_seconds'], 3.0, places=2)
+        self.assertEqual(result['segments'], 1)
+        self.assertGreater(results['summary']['throughput_audio_seconds_per_second'], 0)
+
+    def test_compare_results_reports_regressions(self):
+        baseline = {'files': [{'file': 'a.wav', 'stages': {'convert': 1.0, 'export': 0.01}, 'peak_rss_mb': 100}]}
+        current = {'files': [{'file': 'a.wav', 'stages': {'convert': 1.5, 'export': 0.03}, 'peak_rss_mb': 110},
+                             {'file': 'neu.wav', 'stages': {'convert': 9.0}, 'peak_rss_mb': 500}]}
+        # export ist zwar 3x langsamer, aber unter der Mindestdifferenz
+        self.assertEqual(benchmark.compare_results(current, baseline), ['a.wav convert: 1.000s -> 1.500s'])
+        self.assertEqual(benchmark.compare_results(current, baseline, tolerance=1.0), [])
+
+    def test_main_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch.dict(benchmark.CORPUS_SIZES, {'short': 2}):
+            output = os.path.join(temp_dir, 'bench.json')
+            argv = ['--corpus-dir', temp_dir, '--sizes', 'short', '--formats', 'wav', '--fake-transcription']
+            self.assertEqual(benchmark.main(argv + ['--output', output]), 0)
+            with open(output, encoding='utf-8') as f:
+                baseline = json.load(f)
+            for stage in baseline['files'][0]['stages']:
+                baseline['files'][0]['stages'][stage] = 0.0
+            baseline['files'][0]['stages']['convert'] = -1.0
+            with open(output, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            self.assertEqual(benchmark.main(argv + ['--baseline', output]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import soundfile as sf
+
+from src.batch_processor import process_file
+from src.dataset_manifest import DatasetManifest, read_dataset_manifest
+
+TRANSCRIPTION = {'text': 'Hallo Welt. Zweiter Satz.', 'language': 'de',
+                 'segments': [{'start': 0.0, 'end': 1.0, 'text': 'Hallo Welt. Zweiter Satz.'}]}
+SEGMENTS = [
+    {'start_time': 0.0, 'end_time': 0.5, 'text': 'Hallo Welt.', 'type': 'sentence',
+     'words': [{'word': 'Hallo', 'start': 0.0, 'end': 0.2}, {'word': 'Welt.', 'start': 0.25, 'end': 0.5}]},
+    {'start_time': 0.5, 'end_time': 1.0, 'text': 'Zweiter Satz.', 'type': 'sentence'},
+]
+
+
+class TestDatasetManifest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        audio_path = os.path.join(self.temp_dir.name, 'memo.wav')
+        sf.write(audio_path, 0.3 * np.sin(2 * np.pi * 440 * np.arange(16000) / 16000.0), 16000, subtype='PCM_16')
+        with patch('src.audio_processor.transcribe_audio', return_value=TRANSCRIPTION), \
+             patch('src.audio_processor.segment_audio_intelligent', return_value=SEGMENTS):
+            self.result = process_file(audio_path, output_root=os.path.join(self.temp_dir.name, 'out'))
+
+    def _write(self, name):
+        path = os.path.join(self.temp_dir.name, name)
+        with DatasetManifest(path) as manifest:
+            self.assertEqual(manifest.add_result(self.result), 2)
+            self.assertEqual(manifest.add_result({'original_filename': 'kaputt.ogg', 'status': 'error'}), 0)
+            manifest.add_result(self.result)
+        return path, read_dataset_manifest(path)
+
+    def test_jsonl_rows_point_to_segment_files(self):
+        path, rows = self._write('dataset.jsonl')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['original_filename'], 'memo.wav')
+        self.assertEqual(rows[1]['segment_number'], 2)
+        self.assertEqual(rows[0]['language'], 'de')
+        self.assertEqual(rows[0]['words'][1]['word'], 'Welt.')
+        self.assertIsNone(rows[1]['words'])
+        self.assertAlmostEqual(rows[1]['duration'], 0.5)
+        self.assertTrue(os.path.exists(os.path.join(os.path.dirname(path), rows[1]['audio_file'])))
+
+    def test_parquet_has_typed_and_dictionary_encoded_columns(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow nicht installiert')
+        path, rows = self._write('dataset.parquet')
+        self.assertEqual(rows, read_dataset_manifest(self._write('dataset.jsonl')[0]))
+        schema = pq.read_schema(path)
+        self.assertTrue(pa.types.is_dictionary(schema.field('original_filename').type))
+        self.assertTrue(pa.types.is_dictionary(schema.field('error').type))
+        self.assertEqual(schema.field('start_time').type, pa.float64())
+        self.assertEqual(schema.field('segment_number').type, pa.int32())
+
+    def test_unknown_extension_is_rejected(self):
+        with self.assertRaises(ValueError):
+            DatasetManifest(os.path.join(self.temp_dir.name, 'dataset.csv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
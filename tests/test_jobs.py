@@ -0,0 +1,103 @@
+import os
+import shutil
+import threading
+import unittest
+from unittest.mock import patch
+
+from src.jobs import JobManager
+
+
+def _fake_process_file(file_path, segmentation_type="sentence", output_root=None, on_stage=None, manifest=None):
+    for stage in ("decoded", "quality_assessed", "transcribed", "segmented", "exported"):
+        on_stage(stage, duration=1.0)
+    return {"original_filename": os.path.basename(file_path), "status": "success"}
+
+
+class TestJobManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = JobManager()
+
+    def _job_dir(self):
+        job_dir = self.manager.create_job_dir()
+        self.addCleanup(shutil.rmtree, job_dir, True)
+        return job_dir
+
+    def _wait(self, job):
+        for _ in range(200):
+            if job.finished is not None:
+                return
+            threading.Event().wait(0.01)
+        self.fail("Job wurde nicht beendet")
+
+    def test_job_reports_results_and_progress(self):
+        job_dir = self._job_dir()
+        with patch('src.jobs.process_file', side_effect=_fake_process_file):
+            job = self.manager.submit(job_dir, ['/tmp/a.ogg', '/tmp/b.ogg'])
+            self._wait(job)
+
+        status = job.to_dict()
+        self.assertEqual(status['status'], 'completed')
+        self.assertEqual(status['files_done'], 2)
+        self.assertAlmostEqual(status['progress'], 1.0)
+        self.assertEqual([f['status'] for f in status['files']], ['success', 'success'])
+        self.assertEqual(len(job.results_since(1)), 1)
+
+    def test_events_carry_stages_and_timings(self):
+        job_dir = self._job_dir()
+        with patch('src.jobs.process_file', side_effect=_fake_process_file):
+            job = self.manager.submit(job_dir, ['/tmp/a.ogg'])
+            self._wait(job)
+
+        events = job.wait_events(0, timeout=1)
+        self.assertEqual([e['type'] for e in events], [
+            'job_started', 'file_started', 'decoded', 'quality_assessed', 'transcribed',
+            'segmented', 'exported', 'file_finished', 'job_finished'
+        ])
+        self.assertEqual([e['seq'] for e in events], list(range(len(events))))
+        self.assertTrue(all('elapsed' in e for e in events[2:7]))
+        self.assertEqual(events[7]['result']['status'], 'success')
+        self.assertEqual(set(job.files[0]['timings']), {'decoded', 'quality_assessed', 'transcribed', 'segmented', 'exported'})
+        # Nach dem Ende kehrt wait_events ohne Wartezeit mit einer leeren Liste zurück
+        self.assertEqual(job.wait_events(len(events), timeout=5), [])
+
+    def test_failed_file_does_not_stop_job(self):
+        job_dir = self._job_dir()
+
+        def failing(file_path, *args, **kwargs):
+            if file_path.endswith('a.ogg'):
+                raise ValueError('defekt')
+            return _fake_process_file(file_path, *args, **kwargs)
+
+        with patch('src.jobs.process_file', side_effect=failing):
+            job = self.manager.submit(job_dir, ['/tmp/a.ogg', '/tmp/b.ogg'])
+            self._wait(job)
+
+        self.assertEqual([r['status'] for r in job.results], ['error', 'success'])
+        self.assertEqual(job.status, 'completed')
+
+    def test_cancel_stops_at_next_stage(self):
+        job_dir = self._job_dir()
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking(file_path, segmentation_type="sentence", output_root=None, on_stage=None, manifest=None):
+            on_stage("decoded", duration=1.0)
+            started.set()
+            release.wait(5)
+            on_stage("quality_assessed")
+            return {"status": "success"}
+
+        with patch('src.jobs.process_file', side_effect=blocking):
+            job = self.manager.submit(job_dir, ['/tmp/a.ogg', '/tmp/b.ogg'])
+            self.assertTrue(started.wait(5))
+            self.manager.cancel(job.id)
+            release.set()
+            self._wait(job)
+
+        self.assertEqual(job.status, 'cancelled')
+        self.assertEqual(job.results, [])
+        self.assertEqual([f['status'] for f in job.to_dict()['files']], ['cancelled', 'cancelled'])
+
+
+if __name__ == '__main__':
+    unittest.main()
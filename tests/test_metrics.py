@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src import metrics
+from src.audio_processor import AudioBuffer, assess_audio_quality
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.get_registry().reset()
+        self.addCleanup(metrics.configure_metrics, enabled=False, json_log="")
+        self.addCleanup(metrics.get_registry().reset)
+
+    def test_disabled_spans_record_nothing(self):
+        metrics.configure_metrics(enabled=False)
+        with metrics.span("decode") as s:
+            s.add(audio_seconds=3.0)
+        metrics.increment("transcription_cache_hits")
+        self.assertIs(metrics.span("decode"), metrics.span("export"))
+        self.assertEqual(metrics.get_registry().snapshot(), {"stages": {}, "counters": {}})
+
+    def test_spans_and_counters_in_prometheus_format(self):
+        metrics.configure_metrics(enabled=True)
+        with metrics.span("decode", format="ogg") as s:
+            s.add(audio_seconds=2.5, bytes_read=1000)
+        with self.assertRaises(ValueError):
+            with metrics.span("decode", format="ogg"):
+                raise ValueError("kaputt")
+        metrics.increment("transcription_cache_hits")
+        text = metrics.render_prometheus()
+        self.assertIn('voice_processor_stage_calls_total{format="ogg",stage="decode"} 2', text)
+        self.assertIn('voice_processor_stage_errors_total{format="ogg",stage="decode"} 1', text)
+        self.assertIn('voice_processor_stage_duration_seconds_bucket{format="ogg",stage="decode",le="+Inf"} 2', text)
+        self.assertIn('voice_processor_stage_audio_seconds_total{format="ogg",stage="decode"} 2.5', text)
+        self.assertIn('voice_processor_transcription_cache_hits_total 1', text)
+        self.assertIn('# TYPE voice_processor_stage_duration_seconds histogram', text)
+
+    def test_json_log_and_pipeline_stage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_path = os.path.join(temp_dir, "spans.jsonl")
+            metrics.configure_metrics(enabled=True, json_log=log_path)
+            audio = AudioBuffer((np.sin(np.arange(32000) / 5.0) * 5000).astype(np.int16))
+            assess_audio_quality(audio)
+            metrics.configure_metrics(json_log="")
+            with open(log_path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f]
+        self.assertEqual([entry["stage"] for entry in entries], ["assess"])
+        self.assertEqual(entries[0]["audio_seconds"], 2.0)
+        self.assertFalse(entries[0]["error"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src.model_server import ModelServer, connect_model_server
+from src.transcription_backends import TranscriptionBackend
+
+
+class FakeBackend(TranscriptionBackend):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__("tiny", model_root="/nonexistent")
+        self.batches = []
+
+    def _load_model(self):
+        return object()
+
+    def transcribe_batch(self, requests):
+        self.batches.append(len(requests))
+        return super().transcribe_batch(requests)
+
+    def transcribe(self, samples, language=None, initial_prompt=None):
+        if len(samples) == 0:
+            raise ValueError("leer")
+        return {"text": f"{len(samples)} Samples", "language": language or "de",
+                "segments": [{"start": 0.0, "end": len(samples) / 16000.0, "text": "x"}]}
+
+
+@unittest.skipIf(sys.platform == "win32", "Test nutzt einen Unix-Socket")
+class TestModelServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.state_patch = patch('src.model_server._state_dir', return_value=cls.temp_dir.name)
+        cls.state_patch.start()
+        cls.address = os.path.join(cls.temp_dir.name, 'model.sock')
+        cls.backend = FakeBackend()
+        cls.server = ModelServer(cls.backend, cls.address, batch_wait=0.2)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        for _ in range(100):
+            if os.path.exists(cls.address):
+                break
+            time.sleep(0.02)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.thread.join(5)
+        cls.state_patch.stop()
+        cls.temp_dir.cleanup()
+
+    def test_remote_backend_matches_server_config(self):
+        remote = connect_model_server("fake", "tiny", address=self.address)
+        self.assertIsNotNone(remote)
+        self.assertEqual(remote.cache_id, "fake:tiny")
+        self.assertIsNone(connect_model_server("fake", "large-v3", address=self.address))
+
+    def test_transcribe_roundtrip_and_errors(self):
+        remote = connect_model_server(address=self.address)
+        result = remote.transcribe(np.zeros(1600, dtype=np.float32), language="en")
+        self.assertEqual(result["text"], "1600 Samples")
+        self.assertEqual(result["language"], "en")
+        with self.assertRaises(RuntimeError):
+            remote.transcribe(np.zeros(0, dtype=np.float32))
+
+    def test_concurrent_requests_are_batched(self):
+        remote = connect_model_server(address=self.address)
+        self.backend.batches.clear()
+        results = [None] * 4
+
+        def run(i):
+            results[i] = remote.transcribe(np.zeros(100 * (i + 1), dtype=np.float32))
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual([r["text"] for r in results], [f"{100 * (i + 1)} Samples" for i in range(4)])
+        self.assertEqual(sum(self.backend.batches), 4)
+        self.assertLess(len(self.backend.batches), 4)
+
+    def test_batch_is_sent_in_one_message(self):
+        remote = connect_model_server(address=self.address)
+        self.backend.batches.clear()
+        requests = [{"samples": np.zeros(100 * (i + 1), dtype=np.float32), "language": "en"} for i in range(3)]
+        requests.append({"samples": np.zeros(0, dtype=np.float32)})
+        results = remote.transcribe_batch(requests)
+        # Ein Aufruf, ein Batch: der Server dekodiert alle Anfragen gemeinsam
+        self.assertEqual(self.backend.batches, [4])
+        self.assertEqual([r["text"] for r in results[:3]], ["100 Samples", "200 Samples", "300 Samples"])
+        self.assertIsInstance(results[3], RuntimeError)
+
+    def test_batch_falls_back_to_local_backend(self):
+        remote = connect_model_server(address=self.address)
+        remote.address = os.path.join(self.temp_dir.name, 'missing.sock')
+        local = FakeBackend()
+        with patch('src.model_server.create_backend', return_value=local):
+            results = remote.transcribe_batch([{"samples": np.zeros(160, dtype=np.float32)}])
+        self.assertEqual(local.batches, [1])
+        self.assertEqual(results[0]["text"], "160 Samples")
+
+    def test_no_server_returns_none(self):
+        self.assertIsNone(connect_model_server(address=os.path.join(self.temp_dir.name, 'missing.sock')))
+
+
+if __name__ == '__main__':
+    unittest.main()
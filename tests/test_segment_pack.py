@@ -0,0 +1,99 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+import numpy as np
+import soundfile as sf
+
+from src.audio_processor import save_segments_and_csv
+from src.segment_pack import INDEX_FILENAME, PACK_FILENAME, SegmentPack, SegmentPackWriter, expand_pack, main
+from src.zip_stream import ZipStreamWriter
+
+SEGMENTS = [{'start_time': 0.0, 'end_time': 0.25, 'text': 'eins'},
+            {'start_time': 0.25, 'end_time': 0.75, 'text': 'zwei'},
+            {'start_time': 0.5, 'end_time': 1.0, 'text': 'drei'}]
+
+
+def _read_csv(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+class TestSegmentPack(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.audio_path = os.path.join(self.temp_dir.name, 'memo.wav')
+        rng = np.random.default_rng(0)
+        sf.write(self.audio_path, rng.integers(-3000, 3000, 16000).astype(np.int16), 16000, subtype='PCM_16')
+
+    def _export(self, name, packed):
+        return save_segments_and_csv(self.audio_path, self.audio_path, SEGMENTS,
+                                     output_root=os.path.join(self.temp_dir.name, name), packed=packed)
+
+    def test_packed_export_reads_segments_through_index(self):
+        result_dir, csv_path = self._export('packed', True)
+        self.assertEqual(sorted(os.listdir(result_dir)), sorted([PACK_FILENAME, INDEX_FILENAME, 'memo_segments.csv']))
+        rows = _read_csv(csv_path)
+        self.assertEqual([row['audio_file'] for row in rows], [f'{PACK_FILENAME}#{i}' for i in (1, 2, 3)])
+        samples, _ = sf.read(self.audio_path, dtype='int16')
+        with SegmentPack(result_dir) as pack:
+            self.assertEqual(len(pack), 3)
+            # Überlappende Segmente liegen jeweils vollständig im Paket
+            np.testing.assert_array_equal(pack.read(3), samples[8000:16000])
+            np.testing.assert_array_equal(pack.read(1), samples[:4000])
+            with self.assertRaises(IndexError):
+                pack.segment_bytes(4)
+        # Das Paket selbst ist eine abspielbare WAV-Datei mit allen Segmenten
+        self.assertEqual(sf.info(os.path.join(result_dir, PACK_FILENAME)).frames, 4000 + 8000 + 8000)
+
+    def test_read_uses_sample_width_of_pack(self):
+        expected = {1: np.array([0, 128, 255], dtype=np.uint8),
+                    3: np.array([-8388608, -1, 0, 1, 8388607], dtype=np.int32),
+                    4: np.array([-2 ** 31, -1, 0, 2 ** 31 - 1], dtype=np.int32)}
+        for sampwidth, samples in expected.items():
+            result_dir = os.path.join(self.temp_dir.name, f'pack_{sampwidth}')
+            os.makedirs(result_dir)
+            if sampwidth == 3:
+                data = b''.join(int(value).to_bytes(3, 'little', signed=True) for value in samples)
+            else:
+                data = samples.astype(samples.dtype.newbyteorder('<')).tobytes()
+            with SegmentPackWriter(result_dir, 48000, sampwidth=sampwidth) as writer:
+                writer.add(b'\0' * sampwidth)
+                writer.add(data)
+            with SegmentPack(result_dir) as pack:
+                np.testing.assert_array_equal(pack.read(2), samples)
+                self.assertEqual(len(pack.read(1)), 1)
+
+    def test_expand_restores_per_segment_layout(self):
+        plain_dir, plain_csv = self._export('plain', False)
+        packed_dir, packed_csv = self._export('packed', True)
+        self.assertEqual(main([packed_dir]), 0)
+        self.assertFalse(os.path.exists(os.path.join(packed_dir, PACK_FILENAME)))
+        self.assertEqual(_read_csv(packed_csv), _read_csv(plain_csv))
+        for name in ('segment_01.wav', 'segment_02.wav', 'segment_03.wav'):
+            with open(os.path.join(plain_dir, name), 'rb') as a, open(os.path.join(packed_dir, name), 'rb') as b:
+                self.assertEqual(a.read(), b.read())
+        kept_dir = self._export('kept', True)[0]
+        self.assertEqual(expand_pack(kept_dir, keep_pack=True, segment_format='flac'), 3)
+        self.assertTrue(os.path.exists(os.path.join(kept_dir, PACK_FILENAME)))
+        flac, _ = sf.read(os.path.join(kept_dir, 'segment_02.flac'), dtype='int16')
+        wav, _ = sf.read(os.path.join(plain_dir, 'segment_02.wav'), dtype='int16')
+        np.testing.assert_array_equal(flac, wav)
+
+    def test_zip_contains_pack_once(self):
+        result_dir, csv_path = self._export('packed', True)
+        buffer = io.BytesIO()
+        with ZipStreamWriter(buffer) as archive:
+            archive.add_result({'original_filename': 'memo.wav', 'status': 'success',
+                                'result_dir': result_dir, 'csv_path': csv_path})
+        names = zipfile.ZipFile(buffer).namelist()
+        self.assertEqual(sorted(names), sorted(['memo/memo_segments.csv', f'memo/{PACK_FILENAME}',
+                                                f'memo/{INDEX_FILENAME}', 'memo/result.json']))
+
+
+if __name__ == '__main__':
+    unittest.main()
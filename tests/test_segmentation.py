@@ -0,0 +1,43 @@
+import unittest
+
+from src.segmentation import iter_time_windows, split_words
+
+
+class TestSegmentation(unittest.TestCase):
+    def test_split_words_interpolates_without_word_timestamps(self):
+        words = split_words({'start': 10.0, 'end': 12.0, 'text': ' ab cd'})
+        self.assertEqual([w[2] for w in words], [' ab', ' cd'])
+        self.assertEqual(words[0][0], 10.0)
+        self.assertAlmostEqual(words[0][1], 11.0)
+        self.assertAlmostEqual(words[1][1], 12.0)
+
+    def test_split_words_uses_word_timestamps(self):
+        seg = {'start': 0.0, 'end': 2.0, 'text': ' Hallo Welt',
+               'words': [{'start': 0.0, 'end': 0.4, 'word': ' Hallo'}, {'start': 1.5, 'end': 2.0, 'word': ' Welt'}]}
+        self.assertEqual(split_words(seg), [(0.0, 0.4, ' Hallo'), (1.5, 2.0, ' Welt')])
+
+    def test_windows_split_segments_at_words(self):
+        # Ein Segment über die Fenstergrenze wird an Wortgrenzen aufgeteilt statt doppelt gezählt
+        segments = [{'start': 25.0, 'end': 35.0, 'text': ' eins zwei drei vier',
+                     'words': [{'start': 25.0, 'end': 27.0, 'word': ' eins'},
+                               {'start': 28.0, 'end': 29.5, 'word': ' zwei'},
+                               {'start': 30.5, 'end': 32.0, 'word': ' drei'},
+                               {'start': 33.0, 'end': 35.0, 'word': ' vier'}]},
+                    {'start': 61.0, 'end': 62.0, 'text': ' Ende'}]
+        windows = list(iter_time_windows(iter(segments), 62.5))
+        self.assertEqual([w['text'] for w in windows], ['eins zwei', 'drei vier', 'Ende'])
+        self.assertEqual(windows[-1]['end_time'], 62.5)
+
+    def test_windows_with_overlap(self):
+        segments = [{'start': float(t), 'end': t + 1.0, 'text': f' w{t}'} for t in range(0, 20, 2)]
+        windows = list(iter_time_windows(segments, 20.0, window_seconds=10, overlap_seconds=4))
+        self.assertEqual([(w['start_time'], w['end_time']) for w in windows], [(0.0, 10.0), (6.0, 16.0), (12.0, 20.0)])
+        self.assertEqual(windows[1]['text'], 'w6 w8 w10 w12 w14')
+        self.assertTrue(windows[2]['text'].startswith('w12'))
+        with self.assertRaises(ValueError):
+            list(iter_time_windows(segments, 20.0, window_seconds=10, overlap_seconds=10))
+        self.assertEqual(list(iter_time_windows(segments, 0.0)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
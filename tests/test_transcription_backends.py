@@ -0,0 +1,133 @@
+import os
+import sys
+import types
+import unittest
+from collections import namedtuple
+from unittest.mock import Mock, patch
+
+import numpy as np
+
+from src.transcription_backends import FasterWhisperBackend, WhisperBackend, create_backend, get_model_root
+
+Segment = namedtuple('Segment', 'id seek start end text tokens temperature avg_logprob compression_ratio no_speech_prob')
+
+
+class TestTranscriptionBackends(unittest.TestCase):
+    def test_create_backend(self):
+        backend = create_backend('faster-whisper', 'small', threads=2)
+        self.assertIsInstance(backend, FasterWhisperBackend)
+        self.assertEqual(backend.cache_id, 'faster-whisper:small:int8')
+        self.assertIsInstance(create_backend(), WhisperBackend)
+        with self.assertRaises(ValueError):
+            create_backend('unbekannt')
+
+    def test_faster_whisper_returns_whisper_contract(self):
+        model = Mock()
+        model.transcribe.return_value = (
+            iter([Segment(0, 0, 0.0, 1.2, ' Hallo', [1, 2], 0.0, -0.1, 1.0, 0.01),
+                  Segment(1, 0, 1.5, 2.0, ' Welt', [3], 0.0, -0.2, 1.0, 0.02)]),
+            Mock(language='de')
+        )
+        fake_module = Mock()
+        fake_module.WhisperModel.return_value = model
+        with patch.dict(sys.modules, {'faster_whisper': fake_module}):
+            backend = FasterWhisperBackend('base', threads=4, model_root='/tmp/models')
+            result = backend.transcribe([0.0] * 16000)
+        fake_module.WhisperModel.assert_called_once_with(
+            'base', device='cpu', compute_type='int8', cpu_threads=4, download_root='/tmp/models')
+        self.assertEqual(result['text'], ' Hallo Welt')
+        self.assertEqual(result['language'], 'de')
+        self.assertEqual([s['start'] for s in result['segments']], [0.0, 1.5])
+        self.assertEqual(result['segments'][0]['tokens'], [1, 2])
+
+
+    def test_whisper_batch_is_split_by_batch_size(self):
+        backend = WhisperBackend('base', batch_size=2)
+        requests = [{'samples': np.zeros(16000, dtype=np.float32)} for _ in range(5)]
+        sizes = []
+
+        def fake_batch(model, chunk):
+            sizes.append(len(chunk))
+            return [{'text': '', 'language': 'de', 'segments': []} for _ in chunk]
+
+        with patch.object(backend, 'load', return_value=Mock()), \
+                patch('src.whisper_batch.transcribe_batch', side_effect=fake_batch):
+            results = backend.transcribe_batch(requests)
+        self.assertEqual(sizes, [2, 2, 1])
+        self.assertEqual(len(results), 5)
+
+    def test_whisper_batch_failure_falls_back_to_single_requests(self):
+        backend = WhisperBackend('base', batch_size=4)
+        requests = [{'samples': np.zeros(16000, dtype=np.float32)}, {'samples': np.zeros(0, dtype=np.float32)}]
+
+        def single(samples, language=None, initial_prompt=None):
+            if len(samples) == 0:
+                raise ValueError('leer')
+            return {'text': 'ok', 'language': 'de', 'segments': []}
+
+        with patch.object(backend, 'load', return_value=Mock()), \
+                patch.object(backend, 'transcribe', side_effect=single), \
+                patch('src.whisper_batch.transcribe_batch', side_effect=RuntimeError('oom')):
+            results = backend.transcribe_batch(requests)
+        self.assertEqual(results[0]['text'], 'ok')
+        self.assertIsInstance(results[1], ValueError)
+
+
+def _whisper_available():
+    """Echtes openai-whisper (nicht das Mock aus den anderen Tests) und ein lokales tiny-Modell."""
+    try:
+        import whisper
+    except ImportError:
+        return False
+    return isinstance(whisper, types.ModuleType) and os.path.exists(os.path.join(get_model_root(), 'tiny.pt'))
+
+
+class TestWhisperBatchGrouping(unittest.TestCase):
+    def test_windows_with_equally_long_prompts_share_a_decoder_batch(self):
+        from src.whisper_batch import _prompt_groups
+        Item = namedtuple('Item', 'language prompt')
+        items = [Item('de', []), Item('de', [1, 2, 3]), Item('de', [7, 8, 9]), Item('en', [4, 5, 6]),
+                 Item('de', list(range(300))), Item('de', list(range(500))), Item('de', [])]
+        groups = _prompt_groups(items, n_text_ctx=448)
+        # Unterschiedliche Prompts gleicher Länge laufen gemeinsam, über 223 Tokens kürzt whisper ohnehin
+        self.assertEqual(groups, {('de', 0): [0, 6], ('de', 3): [1, 2], ('en', 3): [3], ('de', 223): [4, 5]})
+
+
+def _speech_like(seconds, seed):
+    """Stimmhafte Silben (Grundton mit Formanten, 4 Silben/s) mit Pausen, damit der Decoder nicht nur Stille sieht."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(16000 * seconds)) / 16000.0
+    pitch = 110 + 30 * np.sin(2 * np.pi * 0.3 * t + seed)
+    phase = 2 * np.pi * np.cumsum(pitch) / 16000.0
+    voice = sum(np.sin(k * phase) * np.exp(-((k * pitch - formant) / 150.0) ** 2)
+                for k in range(1, 30) for formant in (700, 1200, 2500))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.25 * t) > -0.3)
+    signal = voice * syllables + 0.01 * rng.standard_normal(len(t))
+    return (0.3 * signal / np.abs(signal).max()).astype(np.float32)
+
+
+@unittest.skipUnless(_whisper_available(), 'Integrationstest: benötigt openai-whisper und das tiny-Modell in src/models')
+class TestWhisperBatchIntegration(unittest.TestCase):
+    """Vergleicht die Batch-Dekodierung mit whisper.transcribe() pro Datei am echten Modell.
+
+    Läuft nur mit installiertem openai-whisper; WHISPER_TEST_AUDIO kann auf eine
+    Sprachaufnahme zeigen, die zusätzlich zu den synthetischen Silben verwendet wird.
+    """
+
+    def test_batched_output_matches_transcribe(self):
+        from src.audio_buffer import load_audio
+        from src.whisper_batch import transcribe_batch
+        backend = WhisperBackend('tiny')
+        clips = [_speech_like(seconds, seed) for seed, seconds in enumerate((3, 12, 41, 65))]
+        if os.environ.get('WHISPER_TEST_AUDIO'):
+            clips.append(load_audio(os.environ['WHISPER_TEST_AUDIO']).as_float32())
+        # Mit und ohne Startprompt, damit Zeilen mit eigenem Prompt gemeinsam dekodiert werden
+        requests = [{'samples': clip, 'language': None, 'initial_prompt': 'Hallo.' if index % 2 else None}
+                    for index, clip in enumerate(clips)]
+        batched = transcribe_batch(backend.load(), requests)
+        for request, result in zip(requests, batched):
+            self.assertEqual(result, backend.transcribe(request['samples'], initial_prompt=request['initial_prompt']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.transcription_cache import TranscriptionCache, make_cache_key
+
+
+class TestTranscriptionCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'cache.db')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_depends_on_audio_model_and_options(self):
+        samples = np.arange(100, dtype=np.int16)
+        key = make_cache_key(samples, 'base', {'fp16': False})
+        self.assertEqual(key, make_cache_key(samples.copy(), 'base', {'fp16': False}))
+        self.assertNotEqual(key, make_cache_key(samples[::-1].copy(), 'base', {'fp16': False}))
+        self.assertNotEqual(key, make_cache_key(samples, 'small', {'fp16': False}))
+        self.assertNotEqual(key, make_cache_key(samples, 'base', {'fp16': True}))
+
+    def test_put_get_roundtrip(self):
+        cache = TranscriptionCache(self.cache_path)
+        result = {'text': 'Hallo Welt', 'language': 'de', 'segments': [{'start': 0.0, 'end': 1.0, 'text': 'Hallo Welt'}]}
+        cache.put('abc', 'base', result)
+        self.assertEqual(cache.get('abc'), result)
+        self.assertIsNone(cache.get('missing'))
+
+    def test_lru_eviction_and_clear(self):
+        cache = TranscriptionCache(self.cache_path, max_bytes=250)
+        payload = {'text': 'x' * 80}
+        cache.put('a', 'base', payload)
+        cache.put('b', 'base', payload)
+        cache.get('a')  # 'a' ist jetzt zuletzt benutzt
+        cache.put('c', 'base', payload)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['entries'], 2)
+        cache.clear()
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
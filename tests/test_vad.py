@@ -0,0 +1,58 @@
+import unittest
+
+import numpy as np
+
+from src.vad import TimelineMap, compact_speech, detect_speech_regions, find_window_boundaries, frame_energy_db
+
+
+class TestVad(unittest.TestCase):
+    def test_frame_energy_db_separates_silence_and_tone(self):
+        sr = 16000
+        tone = (np.sin(2 * np.pi * 440 * np.arange(sr) / sr) * 10000).astype(np.int16)
+        samples = np.concatenate([np.zeros(sr, dtype=np.int16), tone])
+        energies = frame_energy_db(samples, sr)
+        self.assertLess(energies[:30].max(), -100)
+        self.assertGreater(energies[-30:].min(), -20)
+
+    def test_window_boundaries_cut_in_pause(self):
+        sr = 16000
+        rng = np.random.default_rng(0)
+        samples = (rng.standard_normal(sr * 40) * 3000).astype(np.int16)
+        # Pause bei 27-28s, also im Suchbereich vor dem 30s-Fensterende
+        samples[27 * sr:28 * sr] = 0
+        boundaries = find_window_boundaries(samples, sr, window_seconds=30, search_seconds=5)
+        self.assertEqual(boundaries[0][0], 0)
+        self.assertTrue(27 * sr <= boundaries[0][1] <= 28 * sr)
+        self.assertEqual(boundaries[1][0], boundaries[0][1])
+        self.assertEqual(boundaries[-1][1], len(samples))
+
+    def test_detect_speech_regions_with_padding(self):
+        sr = 16000
+        rng = np.random.default_rng(1)
+        samples = (rng.standard_normal(sr * 10) * 20).astype(np.int16)
+        samples[2 * sr:4 * sr] += (np.sin(2 * np.pi * 200 * np.arange(2 * sr) / sr) * 8000).astype(np.int16)
+        # Kurzer Knacks wird verworfen
+        samples[7 * sr:7 * sr + 800] = 12000
+        regions = detect_speech_regions(samples, sr, padding=0.2)
+        self.assertEqual(len(regions), 1)
+        self.assertAlmostEqual(regions[0][0], 1.8, delta=0.05)
+        self.assertAlmostEqual(regions[0][1], 4.2, delta=0.05)
+        self.assertEqual(detect_speech_regions(np.zeros(sr * 3, dtype=np.int16), sr), [])
+
+    def test_compact_speech_timeline(self):
+        sr = 100
+        samples = np.arange(1000, dtype=np.int16)
+        speech, timeline = compact_speech(samples, sr, [(1.0, 2.0), (5.0, 5.5)])
+        self.assertEqual(len(speech), 150)
+        self.assertEqual(speech[100], 500)
+        self.assertAlmostEqual(timeline.to_original(0.5), 1.5)
+        self.assertAlmostEqual(timeline.to_original(1.2), 5.2)
+        self.assertAlmostEqual(TimelineMap([]).to_original(3.0), 3.0)
+        # Genau am Übergang: ein Anfang gehört zur nächsten Region, ein Ende zur vorigen
+        self.assertAlmostEqual(timeline.to_original(1.0), 5.0)
+        self.assertAlmostEqual(timeline.to_original(1.0, end=True), 2.0)
+        self.assertAlmostEqual(timeline.to_original(0.0, end=True), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
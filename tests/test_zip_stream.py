@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+
+from src.zip_stream import COPY_BLOCK_SIZE, ZipStreamWriter, compression_for, iter_zip_chunks
+
+
+def _write_result(root, name, segments=2):
+    result_dir = os.path.join(root, name)
+    os.makedirs(result_dir)
+    csv_path = os.path.join(result_dir, f"{name}_segments.csv")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write("original_filename,segment_number,audio_file,transcript,start_time,end_time,duration,error\n")
+        for i in range(1, segments + 1):
+            f.write(f"{name},{i},segment_{i:02d}.wav,Text {i},0.0,1.0,1.0,\n")
+            with open(os.path.join(result_dir, f"segment_{i:02d}.wav"), "wb") as wav:
+                wav.write(os.urandom(2000))
+    # Nicht in der CSV aufgeführte Dateien gehören nicht ins Archiv
+    with open(os.path.join(result_dir, "notiz.txt"), "w") as f:
+        f.write("x")
+    return {"original_filename": f"{name}.ogg", "status": "success", "transcription": {"text": "Text"},
+            "result_dir": result_dir, "csv_path": csv_path}
+
+
+class TestZipStream(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_compression_policy(self):
+        self.assertEqual(compression_for("a/segment_01.WAV"), zipfile.ZIP_STORED)
+        self.assertEqual(compression_for("a/a_segments.csv"), zipfile.ZIP_DEFLATED)
+        self.assertEqual(compression_for("a/result.json"), zipfile.ZIP_DEFLATED)
+
+    def test_chunks_arrive_per_result_and_form_valid_zip(self):
+        first = _write_result(self.temp_dir.name, "memo")
+        second = _write_result(os.path.join(self.temp_dir.name, "job2"), "memo", segments=1)
+        delivered = []
+
+        def results():
+            yield first
+            delivered.append("first")
+            yield {"original_filename": "kaputt.ogg", "status": "error", "error": "defekt"}
+            yield second
+
+        chunks = []
+        for chunk in iter_zip_chunks(results()):
+            # Der erste Teil des Archivs liegt vor, bevor das nächste Ergebnis angefordert wird
+            if not chunks:
+                self.assertEqual(delivered, [])
+            chunks.append(chunk)
+        self.assertGreater(len(chunks), 2)
+
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertIsNone(archive.testzip())
+            infos = {info.filename: info for info in archive.infolist()}
+            self.assertEqual(sorted(infos), [
+                "memo/memo_segments.csv", "memo/result.json", "memo/segment_01.wav", "memo/segment_02.wav",
+                "memo_2/memo_segments.csv", "memo_2/result.json", "memo_2/segment_01.wav",
+            ])
+            self.assertEqual(infos["memo/segment_01.wav"].compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(infos["memo/memo_segments.csv"].compress_type, zipfile.ZIP_DEFLATED)
+            summary = json.loads(archive.read("memo/result.json"))
+            self.assertEqual(summary["transcription"], {"text": "Text"})
+            self.assertNotIn("result_dir", summary)
+
+    def test_writes_to_file(self):
+        result = _write_result(self.temp_dir.name, "memo")
+        zip_path = os.path.join(self.temp_dir.name, "out.zip")
+        with open(zip_path, "wb") as f, ZipStreamWriter(f) as archive:
+            archive.add_result(result)
+        with zipfile.ZipFile(zip_path) as archive:
+            self.assertEqual(len(archive.namelist()), 4)
+
+    def test_large_files_are_streamed_in_blocks(self):
+        result = _write_result(self.temp_dir.name, "lang", segments=1)
+        segment_path = os.path.join(result["result_dir"], "segment_01.wav")
+        payload = os.urandom(5 * COPY_BLOCK_SIZE + 123)
+        with open(segment_path, "wb") as f:
+            f.write(payload)
+        chunks = list(iter_zip_chunks([result]))
+        # Nie mehr als ein Block (plus Kopf) auf einmal im Speicher
+        self.assertGreaterEqual(len(chunks), 6)
+        self.assertLess(max(len(chunk) for chunk in chunks), COPY_BLOCK_SIZE + 4096)
+        with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+            self.assertEqual(archive.read("lang/segment_01.wav"), payload)
+
+
+if __name__ == "__main__":
+    unittest.main()